@@ -0,0 +1,218 @@
+import sys
+import startup
+import theme
+import database
+from collections import namedtuple
+import audit
+from table_model import RecordTableModel, SortFilterProxyModel, selected_row
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout,
+    QHBoxLayout, QLabel, QPushButton, QTableView,
+    QMessageBox, QLineEdit, QDateEdit,
+    QHeaderView, QDialog, QFormLayout, QComboBox, QTextEdit
+)
+from PyQt6.QtCore import Qt, QDate
+
+
+# Строка журнала аудита; old_data и new_data не отображаются в таблице
+AuditRow = namedtuple(
+    'AuditRow', 'id changed_at table_name row_pk action username changes old_data new_data')
+
+
+class AuditLogApp(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Журнал изменений")
+        self.setGeometry(100, 100, 1100, 700)
+
+        # Общая тема применяется один раз на уровне приложения
+        theme.apply()
+
+        self.conn = None
+        self.cursor = None
+        self.setup_ui()
+
+        # Окно показывается сразу пустым, подключение к БД и загрузка
+        # данных выполняются после его первой отрисовки
+        self.centralWidget().setEnabled(False)
+        self.statusBar().showMessage("Загрузка данных...")
+        startup.after_first_paint(self, self.start)
+
+    def start(self):
+        """Подключение к БД и первоначальная загрузка данных"""
+        if not self.connect_to_db():
+            return
+        startup.mark("подключение")
+        self.load_data()
+        startup.mark("загрузка")
+
+        self.centralWidget().setEnabled(True)
+        self.statusBar().clearMessage()
+        startup.report(self.windowTitle())
+
+    def connect_to_db(self):
+        """Подключение к базе данных"""
+        try:
+            # set_session есть только у соединений psycopg2
+            self.conn = database.connect(driver='psycopg2')
+            self.conn.set_session(readonly=True, autocommit=True)
+            self.cursor = self.conn.cursor()
+            database.check_schema(self.cursor)
+            return True
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка подключения к БД: {str(e)}")
+            QApplication.exit(1)
+            return False
+
+    def setup_ui(self):
+        """Настройка пользовательского интерфейса"""
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        # Заголовок
+        title_label = QLabel("Журнал изменений данных")
+        title_label.setObjectName("title")
+        layout.addWidget(title_label)
+
+        # Навигация по дням
+        btn_layout = QHBoxLayout()
+        btn_layout.setSpacing(10)
+
+        self.prev_btn = QPushButton("← Предыдущий день")
+        self.next_btn = QPushButton("Следующий день →")
+        self.refresh_btn = QPushButton("Обновить")
+        self.details_btn = QPushButton("Подробнее")
+
+        for btn in [self.prev_btn, self.next_btn, self.refresh_btn, self.details_btn]:
+            btn.setCursor(Qt.CursorShape.PointingHandCursor)
+
+        self.day_input = QDateEdit(QDate.currentDate())
+        self.day_input.setCalendarPopup(True)
+        self.day_input.setDisplayFormat("dd.MM.yyyy")
+        self.day_input.dateChanged.connect(self.load_data)
+
+        self.table_combo = QComboBox()
+        self.table_combo.addItem("Все таблицы", None)
+        for table in audit.TABLES:
+            self.table_combo.addItem(table, table)
+        self.table_combo.currentIndexChanged.connect(self.load_data)
+
+        self.prev_btn.clicked.connect(lambda: self.day_input.setDate(self.day_input.date().addDays(-1)))
+        self.next_btn.clicked.connect(lambda: self.day_input.setDate(self.day_input.date().addDays(1)))
+        self.refresh_btn.clicked.connect(self.load_data)
+        self.details_btn.clicked.connect(self.show_details)
+
+        btn_layout.addWidget(self.prev_btn)
+        btn_layout.addWidget(self.day_input)
+        btn_layout.addWidget(self.next_btn)
+        btn_layout.addWidget(self.table_combo)
+        btn_layout.addWidget(self.refresh_btn)
+        btn_layout.addWidget(self.details_btn)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Фильтр...")
+        btn_layout.addWidget(self.filter_input)
+
+        # Таблица с данными
+        self.model = RecordTableModel(
+            ["ID", "Время", "Таблица", "Запись", "Действие", "Пользователь", "Изменения"],
+            sort_column=1, descending=True,
+            formatters={
+                1: lambda value: value.strftime("%d.%m.%Y %H:%M:%S") if value is not None else "",
+                4: lambda value: audit.ACTIONS.get(value, value or ""),
+            },
+            key_types={0: 'int', 2: 'text', 3: 'text', 4: 'text', 5: 'text', 6: 'text'},
+            parent=self)
+
+        # Сортировка по заголовку и фильтр выполняются на клиенте
+        self.proxy = SortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_input.textChanged.connect(self.proxy.set_filter_text)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setColumnHidden(0, True)  # Скрываем столбец ID
+        self.table.doubleClicked.connect(lambda index: self.show_details())
+
+        # Настройка размеров столбцов
+        header = self.table.horizontalHeader()
+        header.setDefaultSectionSize(150)
+        header.setMinimumSectionSize(100)
+        for col_idx in range(1, 6):
+            header.setSectionResizeMode(col_idx, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(6, QHeaderView.ResizeMode.Stretch)  # Изменения
+
+        theme.setup_table(self.table)
+
+        # Сортировка по щелчку на заголовке, начальный порядок как в запросе
+        header.setSortIndicator(1, Qt.SortOrder.DescendingOrder)
+        self.table.setSortingEnabled(True)
+
+        layout.addLayout(btn_layout)
+        layout.addWidget(self.table)
+
+    def load_data(self):
+        """Загрузка записей журнала за выбранный день"""
+        if not hasattr(self, 'cursor') or not self.cursor:
+            print("Курсор не инициализирован")
+            return
+
+        try:
+            start, end = audit.day_bounds(self.day_input.date().toPyDate())
+            data = audit.fetch_period(self.cursor, start, end, self.table_combo.currentData())
+            self.model.set_rows(
+                AuditRow(row_id, changed_at, table, pk, action, user,
+                         audit.describe_changes(action, old_data, new_data), old_data, new_data)
+                for row_id, changed_at, table, pk, action, user, old_data, new_data in data)
+
+            print(f"Загружено {len(data)} записей")
+
+        except Exception as e:
+            print(f"Ошибка при загрузке данных: {e}")
+            QMessageBox.critical(
+                self,
+                "Ошибка загрузки",
+                f"Не удалось загрузить данные из базы:\n{str(e)}"
+            )
+
+    def show_details(self):
+        """Просмотр строки до и после изменения"""
+        row = selected_row(self.table)
+        if row is None:
+            QMessageBox.warning(self, "Ошибка", "Выберите запись журнала")
+            return
+
+        record = self.model.row(row)
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"{record.table_name} #{record.row_pk}")
+        dialog.resize(700, 500)
+
+        layout = QFormLayout(dialog)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        for title, data in [("До изменения:", record.old_data), ("После изменения:", record.new_data)]:
+            text = QTextEdit()
+            text.setReadOnly(True)
+            text.setPlainText(audit.format_json(data))
+            layout.addRow(title, text)
+
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(dialog.close)
+        layout.addRow(close_btn)
+
+        dialog.exec()
+
+
+if __name__ == "__main__":
+    startup.mark("импорт")
+    app = QApplication(sys.argv)
+    theme.apply(app)
+    window = AuditLogApp()
+    window.show()
+    startup.mark("окно")
+    sys.exit(app.exec())
@@ -1,13 +1,55 @@
 import sys
-import psycopg2
+import time
+import startup
+import theme
+import database
+from collections import namedtuple
+import archive
+import history
+import refresh
+import locations
+import inventory
+import replicas
+from table_model import RecordTableModel, SortFilterProxyModel, selected_row, selected_rows
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
-    QHBoxLayout, QLabel, QPushButton, QTableWidget,
-    QTableWidgetItem, QMessageBox, QLineEdit,
-    QHeaderView, QDialog, QFormLayout
+    QHBoxLayout, QLabel, QPushButton, QTableView,
+    QMessageBox, QLineEdit, QCheckBox, QComboBox, QDateEdit,
+    QHeaderView, QDialog, QFormLayout, QTreeWidget, QTreeWidgetItem, QFileDialog
 )
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QColor, QPalette, QIcon
+from PyQt6.QtCore import Qt, QDate
+from PyQt6.QtGui import QIcon
+
+
+# Строка таблицы оборудования с исходными типами из БД; locationid не отображается
+EquipmentRow = namedtuple(
+    'EquipmentRow', 'equipmentid name status risk_score inventory_number locationid',
+    defaults=(None,))
+
+# Оборудование со статусом по ремонтам и списаниям; {where} - дополнительное
+# условие для перечитывания отдельных строк при автообновлении
+EQUIPMENT_SQL = """
+    SELECT e.equipmentid, e.name, 
+           CASE 
+               WHEN EXISTS (
+                   SELECT 1 FROM writeoffact w 
+                   WHERE w.equipmentid = e.equipmentid
+               ) THEN 'Списано'
+               WHEN EXISTS (
+                   SELECT 1 FROM repair r 
+                   JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+                   WHERE r.equipmentid = e.equipmentid 
+                   AND rs.statusname = 'В процессе'
+                   AND r.deleted_at IS NULL
+               ) THEN 'На ремонте'
+               ELSE 'Исправен'
+           END as status,
+           sc.risk_score, e.inventory_number, e.locationid
+    FROM equipment e
+    LEFT JOIN equipment_score sc ON sc.equipmentid = e.equipmentid
+    WHERE e.deleted_at IS NULL {where}
+    ORDER BY e.equipmentid
+"""
 
 
 class EquipmentApp(QMainWindow):
@@ -16,91 +58,51 @@ class EquipmentApp(QMainWindow):
         self.setWindowTitle("Система учета оборудования на производстве")
         self.setGeometry(100, 100, 900, 650)
 
-        # Цветовая схема для промышленного приложения
-        self.industrial_blue = QColor(0, 90, 141)  # Основной синий цвет
-        self.industrial_light = QColor(240, 244, 248)  # Светлый фон
-        self.industrial_white = QColor(255, 255, 255)  # Белый
-        self.industrial_red = QColor(200, 16, 46)  # Для предупреждений
-        self.industrial_green = QColor(0, 128, 0)  # Для статуса "работает"
-        self.industrial_gray = QColor(128, 128, 128)  # Для статуса "Списано"
-
-        # Установка стиля приложения
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: {self.industrial_light.name()};
-            }}
-            QTableWidget {{
-                background-color: {self.industrial_white.name()};
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                gridline-color: #d1d8e0;
-                font-size: 14px;
-            }}
-            QTableWidget::item {{
-                padding: 8px;
-            }}
-            QHeaderView::section {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                padding: 8px;
-                border: none;
-                font-weight: bold;
-            }}
-            QPushButton {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                border: none;
-                border-radius: 5px;
-                padding: 10px 15px;
-                font-size: 14px;
-                min-width: 100px;
-            }}
-            QPushButton:hover {{
-                background-color: {self.industrial_blue.darker(110).name()};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.industrial_blue.darker(120).name()};
-            }}
-            QPushButton:disabled {{
-                background-color: #cccccc;
-            }}
-            QLineEdit {{
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                padding: 8px;
-                font-size: 14px;
-            }}
-            QDialog {{
-                background-color: {self.industrial_light.name()};
-            }}
-        """)
-
-        # Настройка цветовой палитры
-        palette = self.palette()
-        palette.setColor(QPalette.ColorRole.Window, self.industrial_light)
-        palette.setColor(QPalette.ColorRole.Base, self.industrial_white)
-        palette.setColor(QPalette.ColorRole.Highlight, self.industrial_blue)
-        self.setPalette(palette)
+        # Общая тема применяется один раз на уровне приложения
+        theme.apply()
 
         self.conn = None
         self.cursor = None
-        self.connect_to_db()
+        self.reads = None
+        # Поддерево иерархии, с которым работает оператор
+        self.scope = locations.saved_scope()
+        self.location_rows = []
+        # Инвентарные номера всего оборудования для поиска по сканеру
+        self.tags = inventory.TagIndex()
         self.setup_ui()
+
+        # Окно показывается сразу пустым, подключение к БД и загрузка
+        # данных выполняются после его первой отрисовки
+        self.centralWidget().setEnabled(False)
+        self.statusBar().showMessage("Загрузка данных...")
+        startup.after_first_paint(self, self.start)
+
+    def start(self):
+        """Подключение к БД и первоначальная загрузка данных"""
+        if not self.connect_to_db():
+            return
+        startup.mark("подключение")
         self.load_data()
+        self.load_tags()
+        startup.mark("загрузка")
+
+        self.centralWidget().setEnabled(True)
+        self.statusBar().clearMessage()
+        startup.report(self.windowTitle())
 
     def connect_to_db(self):
         """Подключение к базе данных"""
         try:
-            self.conn = psycopg2.connect(
-                dbname='kurs',
-                user='postgres',
-                password='123',
-                host='localhost'
-            )
+            self.conn = database.connect()
             self.cursor = self.conn.cursor()
+            database.check_schema(self.cursor)
+            self.conn.commit()
+            self.reads = replicas.ReadRouter(self.cursor)
+            return True
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка подключения к БД: {str(e)}")
-            sys.exit(1)
+            QApplication.exit(1)
+            return False
 
     def setup_ui(self):
         """Настройка пользовательского интерфейса"""
@@ -112,14 +114,7 @@ class EquipmentApp(QMainWindow):
 
         # Заголовок
         title_label = QLabel("Учет оборудования на производстве")
-        title_label.setStyleSheet(f"""
-            QLabel {{
-                font-size: 18px;
-                font-weight: bold;
-                color: {self.industrial_blue.name()};
-                padding: 10px;
-            }}
-        """)
+        title_label.setObjectName("title")
         layout.addWidget(title_label)
 
         # Кнопки управления
@@ -130,64 +125,110 @@ class EquipmentApp(QMainWindow):
         self.edit_btn = QPushButton("Редактировать")
         self.delete_btn = QPushButton("Удалить")
         self.refresh_btn = QPushButton("Обновить")
+        self.labels_btn = QPushButton("Этикетки")
+        self.weekly_btn = QPushButton("По неделям")
 
-        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn]:
+        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn, self.labels_btn,
+                    self.weekly_btn]:
             btn.setCursor(Qt.CursorShape.PointingHandCursor)
 
         self.add_btn.clicked.connect(self.show_add_dialog)
         self.edit_btn.clicked.connect(self.show_edit_dialog)
         self.delete_btn.clicked.connect(self.delete_equipment)
         self.refresh_btn.clicked.connect(self.load_data)
+        self.labels_btn.clicked.connect(self.print_labels)
+        self.weekly_btn.clicked.connect(lambda: history.WeeklyDialog(self).exec())
 
         btn_layout.addWidget(self.add_btn)
         btn_layout.addWidget(self.edit_btn)
         btn_layout.addWidget(self.delete_btn)
         btn_layout.addWidget(self.refresh_btn)
+        btn_layout.addWidget(self.labels_btn)
+        btn_layout.addWidget(self.weekly_btn)
+
+        self.auto_refresh_check = QCheckBox("Автообновление")
+        self.auto_refresh_check.setChecked(True)
+        btn_layout.addWidget(self.auto_refresh_check)
+
+        # Статусы на прошедшую дату по истории статусов (только просмотр)
+        self.at_check = QCheckBox("На дату:")
+        self.at_input = QDateEdit(QDate.currentDate())
+        self.at_input.setCalendarPopup(True)
+        self.at_input.setDisplayFormat("dd.MM.yyyy")
+        self.at_input.setEnabled(False)
+        self.at_check.toggled.connect(self.at_input.setEnabled)
+        self.at_check.toggled.connect(self.toggle_point_in_time)
+        self.at_input.dateChanged.connect(self.load_data)
+        btn_layout.addWidget(self.at_check)
+        btn_layout.addWidget(self.at_input)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Фильтр...")
+        btn_layout.addWidget(self.filter_input)
+
+        # Сканер меток работает как клавиатура: вводит номер и нажимает Enter
+        self.scan_input = QLineEdit()
+        self.scan_input.setPlaceholderText("Сканировать метку...")
+        self.scan_input.setFixedWidth(180)
+        self.scan_input.returnPressed.connect(self.scan)
+        btn_layout.addWidget(self.scan_input)
 
         # Таблица с данными
-        self.table = QTableWidget()
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["ID", "Название оборудования", "Статус"])
+        self.model = RecordTableModel(
+            ["ID", "Название оборудования", "Статус", "Риск отказа", "Инв. номер"],
+            sort_column=0,
+            formatters={3: lambda value: f"{value:.1f}" if value is not None else ""},
+            key_types={0: 'int', 1: 'text', 2: 'text', 3: 'float', 4: 'text'},
+            parent=self)
+
+        # Сортировка по заголовку и фильтр выполняются на клиенте
+        self.proxy = SortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_input.textChanged.connect(self.proxy.set_filter_text)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
         self.table.setColumnHidden(0, True)  # Скрываем столбец ID
 
-        # Настройка внешнего вида таблицы
-        self.table.setStyleSheet("""
-            QTableWidget {
-                border: 1px solid #c0c0c0;
-                gridline-color: #c0c0c0;
-            }
-            QHeaderView::section {
-                background-color: #005A8D;
-                color: white;
-                padding: 8px;
-                border: 1px solid #c0c0c0;
-                font-weight: bold;
-            }
-            QTableWidget::item {
-                border-right: 1px solid #c0c0c0;
-                border-bottom: 1px solid #c0c0c0;
-                padding: 8px;
-            }
-        """)
-
         # Настройка размеров столбцов
         header = self.table.horizontalHeader()
         header.setDefaultSectionSize(200)
         header.setMinimumSectionSize(150)
         header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
         header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(4, QHeaderView.ResizeMode.ResizeToContents)
+
+        theme.setup_table(self.table)
 
-        self.table.verticalHeader().setVisible(False)
-        self.table.setShowGrid(True)
-        self.table.setAlternatingRowColors(True)
-        self.table.setStyleSheet("""
-            QTableWidget {
-                alternate-background-color: #f5f5f5;
-            }
-        """)
+        # Навигатор по иерархии: завод - цех - линия с числом оборудования
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.setFixedWidth(260)
+        self.tree.itemSelectionChanged.connect(self.select_scope)
+
+        # Цвет статуса рисует делегат по таблице кистей
+        self.status_delegate = theme.StatusDelegate(
+            foreground=theme.EQUIPMENT_STATUS_FOREGROUND, parent=self.table)
+        self.table.setItemDelegateForColumn(2, self.status_delegate)
+
+        # Сортировка по щелчку на заголовке (например, по риску отказа)
+        header.setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+
+        content_layout = QHBoxLayout()
+        content_layout.setSpacing(10)
+        content_layout.addWidget(self.tree)
+        content_layout.addWidget(self.table)
 
         layout.addLayout(btn_layout)
-        layout.addWidget(self.table)
+        layout.addLayout(content_layout)
+
+        # Статус и риск зависят от ремонтов, списаний и оценок
+        self.refresher = refresh.AutoRefresh(
+            self, ['equipment', 'repair', 'writeoffact', 'equipment_score'],
+            self.apply_changes, model=self.model)
+        self.auto_refresh_check.toggled.connect(self.refresher.set_enabled)
 
     def load_data(self):
         """Загрузка данных из таблицы equipment с учетом статусов ремонтов и списаний"""
@@ -196,45 +237,20 @@ class EquipmentApp(QMainWindow):
             return
 
         try:
-            self.cursor.execute("""
-                SELECT e.equipmentid, e.name, 
-                       CASE 
-                           WHEN EXISTS (
-                               SELECT 1 FROM writeoffact w 
-                               WHERE w.equipmentid = e.equipmentid
-                           ) THEN 'Списано'
-                           WHEN EXISTS (
-                               SELECT 1 FROM repair r 
-                               JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
-                               WHERE r.equipmentid = e.equipmentid 
-                               AND rs.statusname = 'В процессе'
-                           ) THEN 'На ремонте'
-                           ELSE 'Исправен'
-                       END as status
-                FROM equipment e
-                ORDER BY e.equipmentid
-            """)
-            data = self.cursor.fetchall()
-
-            self.table.setRowCount(len(data))
-            for row_idx, row in enumerate(data):
-                for col_idx, value in enumerate(row):
-                    item = QTableWidgetItem(str(value))
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-
-                    # Подсветка статуса цветом
-                    if col_idx == 2:  # Столбец статуса
-                        if value == "Исправен":
-                            item.setForeground(self.industrial_green)
-                        elif value == "На ремонте":
-                            item.setForeground(self.industrial_red)
-                        elif value == "Списано":
-                            item.setForeground(self.industrial_gray)
-                        else:
-                            item.setForeground(QColor(53, 59, 72))
-
-                    self.table.setItem(row_idx, col_idx, item)
-
+            self.load_tree()
+            where, params = locations.scope_filter("e.equipmentid", self.scope)
+            cursor = self.reads.cursor()
+            self.refresher.sync(cursor)
+            if self.at_check.isChecked():
+                data = history.fetch_at(cursor, self.at_input.date().toPyDate(), self.scope)
+            else:
+                cursor.execute(EQUIPMENT_SQL.format(where=where), params)
+                data = cursor.fetchall()
+            self.conn.commit()
+
+            self.model.set_rows(map(EquipmentRow._make, data))
+            # Индекс строк по коду строится сразу, чтобы первое сканирование не ждало
+            self.model.key_numbers()
             print(f"Загружено {len(data)} записей")
 
         except Exception as e:
@@ -245,11 +261,166 @@ class EquipmentApp(QMainWindow):
                 f"Не удалось загрузить данные из базы:\n{str(e)}"
             )
 
+    def toggle_point_in_time(self, checked):
+        """Переключение между текущими статусами и статусами на дату"""
+        for btn in [self.add_btn, self.edit_btn, self.delete_btn]:
+            btn.setEnabled(not checked)
+        self.load_data()
+
+    def load_tags(self):
+        """Загрузка словаря инвентарных номеров"""
+        try:
+            self.tags.load(self.reads.cursor())
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Ошибка при загрузке инвентарных номеров: {e}")
+
+    def load_tree(self):
+        """Заполнение навигатора; счетчики берутся из узлов, без обхода поддеревьев"""
+        self.location_rows = locations.fetch_tree(self.reads.cursor())
+
+        self.tree.blockSignals(True)
+        self.tree.clear()
+        root = QTreeWidgetItem(self.tree, ["Все участки"])
+        root.setData(0, Qt.ItemDataRole.UserRole, None)
+        items = {}
+        selected = root
+        for locationid, parentid, name, kind, path, count in self.location_rows:
+            item = QTreeWidgetItem(items.get(parentid, root), [f"{name} ({count})"])
+            item.setData(0, Qt.ItemDataRole.UserRole, path)
+            item.setToolTip(0, locations.KINDS[kind])
+            items[locationid] = item
+            if path == self.scope:
+                selected = item
+        self.tree.expandAll()
+        self.tree.setCurrentItem(selected)
+        self.tree.blockSignals(False)
+
+        # Сохраненный узел мог быть удален
+        self.scope = selected.data(0, Qt.ItemDataRole.UserRole)
+
+    def select_scope(self):
+        """Переход к поддереву, выбранному в навигаторе"""
+        item = self.tree.currentItem()
+        if item is None:
+            return
+        self.scope = item.data(0, Qt.ItemDataRole.UserRole)
+        locations.save_scope(self.scope)
+        self.load_data()
+
+    def scope_location(self):
+        """Код выбранного узла для нового оборудования"""
+        for locationid, _, _, _, path, _ in self.location_rows:
+            if path == self.scope:
+                return locationid
+        return None
+
+    def in_scope(self, locationid):
+        """Попадает ли узел в выбранное поддерево"""
+        if self.scope is None:
+            return True
+        for node_id, _, _, _, path, _ in self.location_rows:
+            if node_id == locationid:
+                return path == self.scope or path.startswith(self.scope + ".")
+        return False
+
+    def location_combo(self, locationid):
+        """Список узлов для выбора размещения оборудования"""
+        combo = QComboBox()
+        combo.addItem("Не указано", None)
+        for node_id, _, name, _, path, _ in self.location_rows:
+            combo.addItem(f"{'    ' * path.count('.')}{name}", node_id)
+            if node_id == locationid:
+                combo.setCurrentIndex(combo.count() - 1)
+        return combo
+
+    def apply_changes(self, changes):
+        """Перечитывание только оборудования, затронутого изменениями"""
+        # Ремонт или акт задним числом меняет статусы на прошедшую дату
+        if self.at_check.isChecked() or None in changes.values():
+            self.load_data()
+            self.tags.load(self.reads.cursor())
+            return
+
+        cursor = self.reads.cursor()
+        self.tags.update(cursor, changes.get('equipment', refresh.NO_CHANGES).keys)
+
+        ids = set()
+        for table_changes in changes.values():
+            ids |= table_changes.equipment
+        if not ids:
+            return
+
+        where, params = locations.scope_filter("e.equipmentid", self.scope)
+        cursor.execute(
+            EQUIPMENT_SQL.format(where=where + " AND e.equipmentid = ANY(%s)"), params + (sorted(ids),))
+        rows = list(map(EquipmentRow._make, cursor.fetchall()))
+        self.model.merge_rows(rows, removed=ids - {row.equipmentid for row in rows})
+
+    def scan(self):
+        """Переход к оборудованию по считанной метке без запроса к БД"""
+        started = time.perf_counter()
+        text = self.scan_input.text()
+        self.scan_input.clear()
+        if not text.strip():
+            return
+
+        tag = self.tags.lookup(text)
+        if tag is None:
+            self.statusBar().showMessage(f"Метка {inventory.normalize(text)} не найдена", 5000)
+            return
+
+        row = self.model.find(tag.equipmentid)
+        if row is None and self.filter_input.text():
+            self.filter_input.clear()
+            row = self.model.find(tag.equipmentid)
+        if row is None:
+            QMessageBox.information(
+                self, "Сканирование",
+                f"Оборудование '{tag.name}' ({tag.inventory_number}) вне выбранного участка")
+            return
+
+        index = self.proxy.mapFromSource(self.model.index(row, 1))
+        self.table.selectRow(index.row())
+        self.table.scrollTo(index, QTableView.ScrollHint.PositionAtCenter)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.statusBar().showMessage(f"{tag.inventory_number}: {tag.name} ({elapsed:.0f} мс)", 5000)
+
+    def print_labels(self):
+        """Печать этикеток с QR-кодами для выбранного оборудования"""
+        import documents
+
+        records = [self.model.row(row) for row in selected_rows(self.table)]
+        if not records:
+            QMessageBox.warning(self, "Ошибка", "Выберите оборудование для печати этикеток")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Сохранить этикетки", "etiketki.pdf", "PDF (*.pdf)")
+        if not path:
+            return
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            count = documents.render_labels(
+                [(record.inventory_number, record.name) for record in records], path)
+        except ImportError:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.warning(self, "Ошибка", "Для печати QR-кодов установите пакет qrcode")
+            return
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сформировать этикетки:\n{str(e)}")
+            return
+        QApplication.restoreOverrideCursor()
+
+        QMessageBox.information(self, "Готово", f"Сформировано этикеток: {count}")
+
     def show_add_dialog(self):
         """Диалог добавления нового оборудования"""
         dialog = QDialog(self)
         dialog.setWindowTitle("Добавить оборудование")
-        dialog.setFixedSize(400, 250)
+        dialog.setFixedSize(450, 300)
 
         layout = QFormLayout(dialog)
         layout.setContentsMargins(20, 20, 20, 20)
@@ -262,6 +433,9 @@ class EquipmentApp(QMainWindow):
         status_input.setPlaceholderText("Введите статус (например, работает, ремонт)")
         status_input.setVisible(False)  # Скрываем поле статуса, так как он определяется автоматически
 
+        # По умолчанию оборудование размещается в выбранном узле навигатора
+        location_input = self.location_combo(self.scope_location())
+
         btn_box = QHBoxLayout()
         btn_box.setSpacing(10)
 
@@ -272,10 +446,12 @@ class EquipmentApp(QMainWindow):
         btn_box.addWidget(cancel_btn)
 
         layout.addRow("Название оборудования:", name_input)
+        layout.addRow("Размещение:", location_input)
         layout.addRow(btn_box)
 
         def add_equipment():
             name = name_input.text().strip()
+            locationid = location_input.currentData()
 
             if not name:
                 QMessageBox.warning(dialog, "Ошибка", "Введите название оборудования")
@@ -283,24 +459,19 @@ class EquipmentApp(QMainWindow):
 
             try:
                 self.cursor.execute(
-                    "INSERT INTO equipment (name) VALUES (%s) RETURNING equipmentid",
-                    (name,))
-                new_id = self.cursor.fetchone()[0]
+                    "INSERT INTO equipment (name, locationid) VALUES (%s, %s) "
+                    "RETURNING equipmentid, inventory_number",
+                    (name, locationid))
+                new_id, number = self.cursor.fetchone()
                 self.conn.commit()
-
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
-
-                # Добавляем данные в таблицу
-                for col_idx, value in enumerate([new_id, name, "Исправен"]):
-                    item = QTableWidgetItem(str(value))
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-
-                    if col_idx == 2:  # Подсветка статуса
-                        item.setForeground(self.industrial_green)
-
-                    self.table.setItem(row_pos, col_idx, item)
-
+                self.reads.wrote()
+                self.tags.put(inventory.Tag(number, new_id, name))
+
+                # Строка встает на свое место по текущей сортировке; оборудование
+                # вне выбранного поддерева появится при переходе к своему узлу
+                if self.in_scope(locationid):
+                    self.model.insert_row(EquipmentRow(new_id, name, "Исправен", None, number, locationid))
+                self.load_tree()
                 dialog.close()
 
             except Exception as e:
@@ -314,15 +485,13 @@ class EquipmentApp(QMainWindow):
 
     def show_edit_dialog(self):
         """Диалог редактирования оборудования"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите оборудование для редактирования")
             return
 
-        row = selected_items[0].row()
-        equip_id = int(self.table.item(row, 0).text())
-        current_name = self.table.item(row, 1).text()
-        current_status = self.table.item(row, 2).text()
+        record = self.model.row(row)
+        equip_id, current_name, current_status = record.equipmentid, record.name, record.status
 
         # Запрещаем редактирование списанного оборудования
         if current_status == "Списано":
@@ -331,13 +500,16 @@ class EquipmentApp(QMainWindow):
 
         dialog = QDialog(self)
         dialog.setWindowTitle("Редактировать оборудование")
-        dialog.setFixedSize(400, 250)
+        dialog.setFixedSize(450, 300)
 
         layout = QFormLayout(dialog)
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(15)
 
         name_input = QLineEdit(current_name)
+        number_input = QLineEdit(record.inventory_number or "")
+        number_input.setPlaceholderText("Пусто - присвоить автоматически")
+        location_input = self.location_combo(record.locationid)
 
         btn_box = QHBoxLayout()
         btn_box.setSpacing(10)
@@ -349,23 +521,38 @@ class EquipmentApp(QMainWindow):
         btn_box.addWidget(cancel_btn)
 
         layout.addRow("Название оборудования:", name_input)
+        layout.addRow("Инвентарный номер:", number_input)
+        layout.addRow("Размещение:", location_input)
         layout.addRow(btn_box)
 
         def update_equipment():
             new_name = name_input.text().strip()
+            number = inventory.normalize(number_input.text()) or None
+            locationid = location_input.currentData()
 
             if not new_name:
                 QMessageBox.warning(dialog, "Ошибка", "Введите название оборудования")
                 return
 
             try:
+                # Номер нормализует триггер; занятый номер отклоняет уникальный индекс
                 self.cursor.execute(
-                    "UPDATE equipment SET name = %s WHERE equipmentid = %s",
-                    (new_name, equip_id))
+                    "UPDATE equipment SET name = %s, inventory_number = %s, locationid = %s "
+                    "WHERE equipmentid = %s RETURNING inventory_number",
+                    (new_name, number, locationid, equip_id))
+                number = self.cursor.fetchone()[0]
                 self.conn.commit()
-
-                # Обновляем таблицу
-                self.table.item(row, 1).setText(new_name)
+                self.reads.wrote()
+                self.tags.put(inventory.Tag(number, equip_id, new_name))
+
+                # Обновляем таблицу; перенесенное из поддерева оборудование убирается
+                if self.in_scope(locationid):
+                    self.model.update_row(row, record._replace(
+                        name=new_name, inventory_number=number, locationid=locationid))
+                else:
+                    self.model.remove_row(row)
+                if locationid != record.locationid:
+                    self.load_tree()
                 dialog.close()
 
             except Exception as e:
@@ -379,15 +566,13 @@ class EquipmentApp(QMainWindow):
 
     def delete_equipment(self):
         """Удаление выбранного оборудования"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите оборудование для удаления")
             return
 
-        row = selected_items[0].row()
-        equip_id = int(self.table.item(row, 0).text())
-        equip_name = self.table.item(row, 1).text()
-        equip_status = self.table.item(row, 2).text()
+        record = self.model.row(row)
+        equip_id, equip_name, equip_status = record.equipmentid, record.name, record.status
 
         # Запрещаем удаление списанного оборудования через это приложение
         if equip_status == "Списано":
@@ -401,23 +586,23 @@ class EquipmentApp(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             try:
-                # Сначала удаляем связанные записи о ремонтах
-                self.cursor.execute(
-                    "DELETE FROM repair WHERE equipmentid = %s",
-                    (equip_id,))
-
-                # Затем удаляем само оборудование
-                self.cursor.execute(
-                    "DELETE FROM equipment WHERE equipmentid = %s",
-                    (equip_id,))
+                # Оборудование и его ремонты только помечаются удаленными,
+                # в архивные таблицы их переносит archive.py
+                archive.soft_delete_equipment(self.cursor, equip_id)
                 self.conn.commit()
-                self.table.removeRow(row)
+                self.reads.wrote()
+                self.tags.drop(equip_id)
+                self.model.remove_row(row)
+                self.load_tree()
             except Exception as e:
                 self.conn.rollback()
                 QMessageBox.critical(self, "Ошибка", f"Не удалось удалить оборудование:\n{str(e)}")
 
     def closeEvent(self, event):
         """Обработчик закрытия окна"""
+        self.refresher.set_enabled(False)
+        if self.reads:
+            self.reads.close()
         if self.cursor:
             self.cursor.close()
         if self.conn:
@@ -426,8 +611,10 @@ class EquipmentApp(QMainWindow):
 
 
 if __name__ == "__main__":
+    startup.mark("импорт")
     app = QApplication(sys.argv)
-    app.setStyle("Fusion")
+    theme.apply(app)
     window = EquipmentApp()
     window.show()
+    startup.mark("окно")
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,165 @@
+import sys
+import startup
+import theme
+import federation
+from table_model import RecordTableModel, SortFilterProxyModel, format_date, format_money
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout,
+    QHBoxLayout, QLabel, QPushButton, QTableView,
+    QMessageBox, QLineEdit, QHeaderView, QTabWidget
+)
+from PyQt6.QtCore import Qt
+
+
+class PlantsSummaryApp(QMainWindow):
+    """Сводка оборудования и ремонтов всех заводов (только просмотр)"""
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Сводка по заводам")
+        self.setGeometry(100, 100, 1100, 700)
+
+        # Общая тема применяется один раз на уровне приложения
+        theme.apply()
+
+        self.setup_ui()
+
+        # Окно показывается сразу пустым, запросы к заводам выполняются
+        # после его первой отрисовки
+        self.centralWidget().setEnabled(False)
+        self.statusBar().showMessage("Загрузка данных...")
+        startup.after_first_paint(self, self.start)
+
+    def start(self):
+        """Первоначальная загрузка сводки"""
+        self.centralWidget().setEnabled(True)
+        self.statusBar().clearMessage()
+        if not federation.plants():
+            QMessageBox.information(
+                self, "Сводка по заводам",
+                "Заводы не заданы.\nДобавьте базы заводов командой\n"
+                "python federation.py add <название> <строка подключения>")
+            return
+        self.load_data()
+        startup.mark("загрузка")
+        startup.report(self.windowTitle())
+
+    def setup_ui(self):
+        """Настройка пользовательского интерфейса"""
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        # Заголовок
+        title_label = QLabel("Оборудование и ремонты всех заводов")
+        title_label.setObjectName("title")
+        layout.addWidget(title_label)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.setSpacing(10)
+
+        self.refresh_btn = QPushButton("Обновить")
+        self.refresh_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.refresh_btn.clicked.connect(self.load_data)
+        btn_layout.addWidget(self.refresh_btn)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Фильтр...")
+        btn_layout.addWidget(self.filter_input)
+
+        # Первый столбец обеих таблиц - завод, с которого пришла строка
+        self.equipment_model = RecordTableModel(
+            ["Завод", "ID", "Инв. номер", "Название", "Статус"],
+            key_types={0: 'text', 1: 'int', 2: 'text', 3: 'text', 4: 'text'},
+            parent=self)
+        self.repair_model = RecordTableModel(
+            ["Завод", "ID", "Оборудование", "Дата ремонта", "Стоимость", "Статус"],
+            sort_column=3, descending=True,
+            formatters={3: format_date, 4: format_money},
+            key_types={0: 'text', 1: 'int', 2: 'text', 3: 'date', 4: 'money', 5: 'text'},
+            parent=self)
+
+        self.tabs = QTabWidget()
+        self.equipment_table = self.create_table(self.equipment_model, stretch_column=3)
+        self.equipment_delegate = theme.StatusDelegate(
+            foreground=theme.EQUIPMENT_STATUS_FOREGROUND, parent=self.equipment_table)
+        self.equipment_table.setItemDelegateForColumn(4, self.equipment_delegate)
+        self.repair_table = self.create_table(self.repair_model, stretch_column=2)
+        self.repair_delegate = theme.StatusDelegate(
+            background=theme.REPAIR_STATUS_BACKGROUND, parent=self.repair_table)
+        self.repair_table.setItemDelegateForColumn(5, self.repair_delegate)
+        # Начальный порядок ремонтов как в запросе - по дате, новые сверху
+        self.repair_table.horizontalHeader().setSortIndicator(3, Qt.SortOrder.DescendingOrder)
+        self.tabs.addTab(self.equipment_table, "Оборудование")
+        self.tabs.addTab(self.repair_table, "Ремонты")
+
+        # Вкладка загружается при первом открытии
+        self.sources = [('equipment', self.equipment_model), ('repairs', self.repair_model)]
+        self.loaded = set()
+        self.tabs.currentChanged.connect(lambda index: self.load_tab())
+
+        layout.addLayout(btn_layout)
+        layout.addWidget(self.tabs)
+
+    def create_table(self, model, stretch_column):
+        """Таблица сводки с сортировкой и фильтром на клиенте"""
+        proxy = SortFilterProxyModel(self)
+        proxy.setSourceModel(model)
+        self.filter_input.textChanged.connect(proxy.set_filter_text)
+
+        table = QTableView()
+        table.setModel(proxy)
+        table.setColumnHidden(1, True)  # Скрываем столбец ID: коды на заводах пересекаются
+
+        header = table.horizontalHeader()
+        header.setDefaultSectionSize(150)
+        header.setMinimumSectionSize(100)
+        for col_idx in range(model.columnCount()):
+            header.setSectionResizeMode(col_idx, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(stretch_column, QHeaderView.ResizeMode.Stretch)
+
+        theme.setup_table(table)
+        table.setSortingEnabled(True)
+        return table
+
+    def load_data(self):
+        """Загрузка сводки открытой вкладки заново"""
+        self.loaded.clear()
+        self.load_tab()
+
+    def load_tab(self):
+        """Загрузка сводки открытой вкладки: запросы ко всем заводам
+        выполняются одновременно, строки сливаются в порядке запроса"""
+        key, model = self.sources[self.tabs.currentIndex()]
+        if key in self.loaded:
+            return
+        stats = {}
+        try:
+            model.set_rows(federation.merged(federation.plants(), federation.QUERIES[key], stats))
+        except Exception as e:
+            print(f"Ошибка при загрузке данных: {e}")
+            QMessageBox.critical(self, "Ошибка загрузки", f"Не удалось загрузить сводку:\n{str(e)}")
+            return
+        self.loaded.add(key)
+
+        summary = federation.describe(stats)
+        print(f"{federation.QUERIES[key].title}: {summary}")
+        self.statusBar().showMessage(summary)
+
+        failed = [f"{item.plant}: {item.error}" for item in stats.values() if item.error]
+        if failed:
+            QMessageBox.warning(
+                self, "Сводка неполная",
+                "Данные части заводов не получены:\n" + "\n".join(failed))
+
+
+if __name__ == "__main__":
+    startup.mark("импорт")
+    app = QApplication(sys.argv)
+    theme.apply(app)
+    window = PlantsSummaryApp()
+    window.show()
+    startup.mark("окно")
+    sys.exit(app.exec())
@@ -1,13 +1,43 @@
 import sys
-import psycopg2
+import startup
+import theme
+import database
+from collections import namedtuple
+from decimal import Decimal
+import partitions
+import parts
+import overdue
+import preventive
+import refresh
+import locations
+import inventory
+import repairs
+import replicas
+from table_model import RecordTableModel, SortFilterProxyModel, format_date, format_money, selected_row
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
-    QHBoxLayout, QLabel, QPushButton, QTableWidget,
-    QTableWidgetItem, QMessageBox, QLineEdit, QDateEdit,
-    QHeaderView, QDialog, QFormLayout, QComboBox, QDoubleSpinBox
+    QHBoxLayout, QLabel, QPushButton, QTableView,
+    QMessageBox, QLineEdit, QDateEdit,
+    QHeaderView, QDialog, QFormLayout, QComboBox, QDoubleSpinBox, QCheckBox
 )
 from PyQt6.QtCore import Qt, QDate
-from PyQt6.QtGui import QColor, QPalette, QIcon
+from PyQt6.QtGui import QIcon
+
+
+# Строка таблицы ремонтов с исходными типами из БД (date, Decimal)
+RepairRow = namedtuple('RepairRow', 'repairid equipmentid equipment repairdate repairprice status')
+
+# Ремонты с названием оборудования и статусом; {where} - условия по периоду
+# и по отдельным строкам для автообновления
+REPAIR_SQL = """
+    SELECT r.repairid, r.equipmentid, e.name, 
+           r.repairdate, r.repairprice, rs.statusname
+    FROM repair r
+    LEFT JOIN equipment e ON r.equipmentid = e.equipmentid
+    LEFT JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+    WHERE r.deleted_at IS NULL {where}
+    ORDER BY r.repairdate DESC
+"""
 
 
 class RepairApp(QMainWindow):
@@ -16,131 +46,84 @@ class RepairApp(QMainWindow):
         self.setWindowTitle("Система учета ремонтов оборудования")
         self.setGeometry(100, 100, 1000, 700)
 
-        # Промышленная цветовая схема
-        self.industrial_blue = QColor(0, 90, 141)
-        self.industrial_light = QColor(240, 244, 248)
-        self.industrial_white = QColor(255, 255, 255)
-        self.industrial_green = QColor(0, 128, 0)
-
-        # Установка стиля приложения
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: {self.industrial_light.name()};
-            }}
-            QTableWidget {{
-                background-color: {self.industrial_white.name()};
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                gridline-color: #d1d8e0;
-                font-size: 14px;
-            }}
-            QTableWidget::item {{
-                padding: 8px;
-            }}
-            QHeaderView::section {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                padding: 8px;
-                border: none;
-                font-weight: bold;
-            }}
-            QPushButton {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                border: none;
-                border-radius: 5px;
-                padding: 10px 15px;
-                font-size: 14px;
-                min-width: 100px;
-            }}
-            QPushButton:hover {{
-                background-color: {self.industrial_blue.darker(110).name()};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.industrial_blue.darker(120).name()};
-            }}
-            QPushButton:disabled {{
-                background-color: #cccccc;
-            }}
-            QLineEdit, QComboBox, QDateEdit, QDoubleSpinBox {{
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                padding: 8px;
-                font-size: 14px;
-            }}
-            QDialog {{
-                background-color: {self.industrial_light.name()};
-            }}
-        """)
-
-        palette = self.palette()
-        palette.setColor(QPalette.ColorRole.Window, self.industrial_light)
-        palette.setColor(QPalette.ColorRole.Base, self.industrial_white)
-        palette.setColor(QPalette.ColorRole.Highlight, self.industrial_blue)
-        self.setPalette(palette)
+        # Общая тема применяется один раз на уровне приложения
+        theme.apply()
 
         self.conn = None
         self.cursor = None
-        self.connect_to_db()
+        self.reads = None
+        # Инвентарные номера для открытия ремонта по метке оборудования
+        self.tags = inventory.TagIndex()
         self.setup_ui()
+        # Оповещения о сроках ремонтов (свое соединение для LISTEN)
+        self.overdue = overdue.OverdueMonitor(self)
+
+        # Окно показывается сразу пустым, подключение к БД и загрузка
+        # данных выполняются после его первой отрисовки
+        self.centralWidget().setEnabled(False)
+        self.statusBar().showMessage("Загрузка данных...")
+        startup.after_first_paint(self, self.start)
+
+    def start(self):
+        """Подключение к БД и первоначальная загрузка данных"""
+        if not self.connect_to_db():
+            return
+        startup.mark("подключение")
+        self.scope_combo.load(self.reads.cursor())
         self.load_equipment()
         self.load_repair_statuses()
         self.load_data()
+        self.load_tags()
+        startup.mark("загрузка")
+        self.overdue.start()
+
+        self.centralWidget().setEnabled(True)
+        self.statusBar().clearMessage()
+        startup.report(self.windowTitle())
 
     def connect_to_db(self):
         """Подключение к базе данных"""
         try:
-            self.conn = psycopg2.connect(
-                dbname='kurs',
-                user='postgres',
-                password='123',
-                host='localhost'
-            )
+            self.conn = database.connect()
             self.conn.autocommit = True  # Включаем autocommit для избежания проблем с транзакциями
             self.cursor = self.conn.cursor()
+            database.check_schema(self.cursor)
+            self.reads = replicas.ReadRouter(self.cursor)
+            return True
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка подключения к БД: {str(e)}")
-            sys.exit(1)
+            QApplication.exit(1)
+            return False
 
     def load_equipment(self):
         """Загрузка списка оборудования для комбобокса"""
         try:
-            self.cursor.execute("SELECT equipmentid, name FROM equipment ORDER BY name")
-            self.equipment_list = self.cursor.fetchall()
+            where, params = locations.scope_filter("e.equipmentid", self.scope_combo.path())
+            cursor = self.reads.cursor()
+            cursor.execute(
+                f"SELECT e.equipmentid, e.name FROM equipment e WHERE e.deleted_at IS NULL {where} ORDER BY e.name",
+                params)
+            self.equipment_list = cursor.fetchall()
         except Exception as e:
             print(f"Ошибка при загрузке оборудования: {e}")
             self.equipment_list = []
 
-    def load_repair_statuses(self):
-        """Загрузка списка статусов ремонта из таблицы repairstatus"""
+    def load_tags(self):
+        """Загрузка словаря инвентарных номеров"""
         try:
-            self.cursor.execute("SELECT statusname FROM repairstatus ORDER BY reparstatusid")
-            self.repair_statuses = [status[0] for status in self.cursor.fetchall()]
+            self.tags.load(self.reads.cursor())
         except Exception as e:
-            print(f"Ошибка при загрузке статусов ремонта: {e}")
-            self.repair_statuses = ["Завершён", "В процессе", "Отменён"]
+            print(f"Ошибка при загрузке инвентарных номеров: {e}")
 
-    def update_equipment_status(self, equipment_id, repair_status):
-        """Обновляет статус оборудования в зависимости от статуса ремонта"""
+    def load_repair_statuses(self):
+        """Загрузка списка статусов ремонта из таблицы repairstatus"""
         try:
-            if repair_status == "В процессе":
-                new_status = "На ремонте"
-            else:
-                self.cursor.execute(
-                    """SELECT COUNT(*) FROM repair r 
-                    JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
-                    WHERE r.equipmentid = %s AND rs.statusname = 'В процессе'""",
-                    (equipment_id,))
-                active_repairs = self.cursor.fetchone()[0]
-                new_status = "На ремонте" if active_repairs > 0 else "Исправен"
-
-            self.cursor.execute(
-                "UPDATE equipment SET status = %s WHERE equipmentid = %s",
-                (new_status, equipment_id))
-            return True
+            cursor = self.reads.cursor()
+            cursor.execute("SELECT statusname FROM repairstatus ORDER BY repairstatusid")
+            self.repair_statuses = [status[0] for status in cursor.fetchall()]
         except Exception as e:
-            print(f"Ошибка при обновлении статуса оборудования: {e}")
-            return False
+            print(f"Ошибка при загрузке статусов ремонта: {e}")
+            self.repair_statuses = ["Завершён", "В процессе", "Отменён", "Запланирован"]
 
     def setup_ui(self):
         """Настройка пользовательского интерфейса"""
@@ -151,14 +134,7 @@ class RepairApp(QMainWindow):
         layout.setSpacing(15)
 
         title_label = QLabel("Учет ремонтов оборудования")
-        title_label.setStyleSheet(f"""
-            QLabel {{
-                font-size: 18px;
-                font-weight: bold;
-                color: {self.industrial_blue.name()};
-                padding: 10px;
-            }}
-        """)
+        title_label.setObjectName("title")
         layout.addWidget(title_label)
 
         btn_layout = QHBoxLayout()
@@ -168,46 +144,77 @@ class RepairApp(QMainWindow):
         self.edit_btn = QPushButton("Редактировать")
         self.delete_btn = QPushButton("Удалить")
         self.refresh_btn = QPushButton("Обновить")
+        self.parts_btn = QPushButton("Запчасти")
+        self.calendar_btn = QPushButton("Календарь ТО")
 
-        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn]:
+        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn, self.parts_btn,
+                    self.calendar_btn]:
             btn.setCursor(Qt.CursorShape.PointingHandCursor)
 
-        self.add_btn.clicked.connect(self.show_add_dialog)
+        self.add_btn.clicked.connect(lambda: self.show_add_dialog())
         self.edit_btn.clicked.connect(self.show_edit_dialog)
         self.delete_btn.clicked.connect(self.delete_repair)
         self.refresh_btn.clicked.connect(self.load_data)
+        self.parts_btn.clicked.connect(self.show_parts_dialog)
+        self.calendar_btn.clicked.connect(lambda: preventive.CalendarDialog(self).exec())
 
         btn_layout.addWidget(self.add_btn)
         btn_layout.addWidget(self.edit_btn)
         btn_layout.addWidget(self.delete_btn)
         btn_layout.addWidget(self.refresh_btn)
-
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(
-            ["ID", "ID оборудования", "Оборудование", "Дата ремонта", "Стоимость ремонта", "Статус"])
+        btn_layout.addWidget(self.parts_btn)
+        btn_layout.addWidget(self.calendar_btn)
+
+        self.auto_refresh_check = QCheckBox("Автообновление")
+        self.auto_refresh_check.setChecked(True)
+        btn_layout.addWidget(self.auto_refresh_check)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Фильтр...")
+        btn_layout.addWidget(self.filter_input)
+
+        # Метка оборудования со сканера сразу открывает новый ремонт
+        self.scan_input = QLineEdit()
+        self.scan_input.setPlaceholderText("Сканировать метку...")
+        self.scan_input.setFixedWidth(160)
+        self.scan_input.returnPressed.connect(self.scan)
+        btn_layout.addWidget(self.scan_input)
+
+        # Период отображения: запросы с границей по дате читают только нужные секции
+        self.period_combo = QComboBox()
+        self.period_combo.addItem("За все время", None)
+        self.period_combo.addItem("За 3 месяца", 3)
+        self.period_combo.addItem("За год", 12)
+        self.period_combo.addItem("За 3 года", 36)
+        self.period_combo.currentIndexChanged.connect(self.load_data)
+
+        # Участок: показываются только ремонты оборудования из поддерева
+        self.scope_combo = locations.ScopeCombo()
+        self.scope_combo.currentIndexChanged.connect(self.change_scope)
+
+        btn_layout.addStretch()
+        btn_layout.addWidget(QLabel("Участок:"))
+        btn_layout.addWidget(self.scope_combo)
+        btn_layout.addWidget(QLabel("Период:"))
+        btn_layout.addWidget(self.period_combo)
+
+        self.model = RecordTableModel(
+            ["ID", "ID оборудования", "Оборудование", "Дата ремонта", "Стоимость ремонта", "Статус"],
+            sort_column=3, descending=True,
+            formatters={3: format_date, 4: format_money},
+            key_types={0: 'int', 1: 'int', 2: 'text', 3: 'date', 4: 'money', 5: 'text'},
+            parent=self)
+
+        # Сортировка по заголовку и фильтр выполняются на клиенте
+        self.proxy = SortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_input.textChanged.connect(self.proxy.set_filter_text)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
         self.table.setColumnHidden(0, True)
         self.table.setColumnHidden(1, True)
 
-        self.table.setStyleSheet("""
-            QTableWidget {
-                border: 1px solid #c0c0c0;
-                gridline-color: #c0c0c0;
-            }
-            QHeaderView::section {
-                background-color: #005A8D;
-                color: white;
-                padding: 8px;
-                border: 1px solid #c0c0c0;
-                font-weight: bold;
-            }
-            QTableWidget::item {
-                border-right: 1px solid #c0c0c0;
-                border-bottom: 1px solid #c0c0c0;
-                padding: 8px;
-            }
-        """)
-
         header = self.table.horizontalHeader()
         header.setDefaultSectionSize(150)
         header.setMinimumSectionSize(100)
@@ -216,47 +223,47 @@ class RepairApp(QMainWindow):
         header.setSectionResizeMode(4, QHeaderView.ResizeMode.Interactive)
         header.setSectionResizeMode(5, QHeaderView.ResizeMode.ResizeToContents)
 
-        self.table.verticalHeader().setVisible(False)
-        self.table.setShowGrid(True)
-        self.table.setAlternatingRowColors(True)
-        self.table.setStyleSheet("""
-            QTableWidget {
-                alternate-background-color: #f5f5f5;
-            }
-        """)
+        theme.setup_table(self.table)
+
+        # Фон статуса рисует делегат по таблице кистей
+        self.status_delegate = theme.StatusDelegate(
+            background=theme.REPAIR_STATUS_BACKGROUND, parent=self.table)
+        self.table.setItemDelegateForColumn(5, self.status_delegate)
+
+        # Сортировка по щелчку на заголовке, начальный порядок как в запросе
+        header.setSortIndicator(3, Qt.SortOrder.DescendingOrder)
+        self.table.setSortingEnabled(True)
 
         layout.addLayout(btn_layout)
         layout.addWidget(self.table)
 
+        # Название оборудования в строке ремонта меняется вместе с equipment
+        self.refresher = refresh.AutoRefresh(
+            self, ['repair', 'equipment'], self.apply_changes, model=self.model)
+        self.auto_refresh_check.toggled.connect(self.refresher.set_enabled)
+
+    def load_filter(self):
+        """Условия по выбранным участку и периоду и их параметры"""
+        where, params = locations.scope_filter("r.equipmentid", self.scope_combo.path())
+        months = self.period_combo.currentData()
+        if months is None:
+            return where, params
+        return where + " AND r.repairdate >= %s", params + (partitions.period_start(months),)
+
+    def change_scope(self):
+        """Переход к другому поддереву иерархии"""
+        self.load_equipment()
+        self.load_data()
+
     def load_data(self):
         """Загрузка данных о ремонтах с объединением таблиц"""
         try:
-            query = """
-                SELECT r.repairid, r.equipmentid, e.name, 
-                       r.repairdate, r.repairprice, rs.statusname
-                FROM repair r
-                LEFT JOIN equipment e ON r.equipmentid = e.equipmentid
-                LEFT JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
-                ORDER BY r.repairdate DESC
-            """
-            self.cursor.execute(query)
-            data = self.cursor.fetchall()
-
-            self.table.setRowCount(len(data))
-            for row_idx, row in enumerate(data):
-                for col_idx, value in enumerate(row):
-                    item = QTableWidgetItem(str(value) if value is not None else "")
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-
-                    if col_idx == 5:
-                        if value == "Завершён":
-                            item.setBackground(QColor(144, 238, 144))
-                        elif value == "В процессе":
-                            item.setBackground(QColor(255, 255, 153))
-                        elif value == "Отменён":
-                            item.setBackground(QColor(255, 182, 193))
-
-                    self.table.setItem(row_idx, col_idx, item)
+            where, params = self.load_filter()
+            cursor = self.reads.cursor()
+            self.refresher.sync(cursor)
+            cursor.execute(REPAIR_SQL.format(where=where), params)
+            data = cursor.fetchall()
+            self.model.set_rows(map(RepairRow._make, data))
 
         except Exception as e:
             QMessageBox.critical(
@@ -265,8 +272,52 @@ class RepairApp(QMainWindow):
                 f"Не удалось загрузить данные из базы:\n{str(e)}"
             )
 
-    def show_add_dialog(self):
-        """Диалог добавления нового ремонта"""
+    def apply_changes(self, changes):
+        """Перечитывание только измененных ремонтов и ремонтов переименованного оборудования"""
+        if None in changes.values():
+            self.load_data()
+            self.tags.load(self.reads.cursor())
+            return
+
+        cursor = self.reads.cursor()
+        repair_ids = changes.get('repair', refresh.NO_CHANGES).keys
+        equipment_ids = changes.get('equipment', refresh.NO_CHANGES).keys
+        self.tags.update(cursor, equipment_ids)
+        if not repair_ids and not equipment_ids:
+            return
+
+        where, params = self.load_filter()
+        cursor.execute(
+            REPAIR_SQL.format(where=where + " AND (r.repairid = ANY(%s) OR r.equipmentid = ANY(%s))"),
+            params + (sorted(repair_ids), sorted(equipment_ids)))
+        rows = list(map(RepairRow._make, cursor.fetchall()))
+        # Не найденные ремонты удалены или вышли за период или участок
+        # (в том числе вместе с перенесенным оборудованием)
+        if equipment_ids:
+            repair_ids = repair_ids | {record.repairid for record in self.model.records
+                                       if record.equipmentid in equipment_ids}
+        self.model.merge_rows(rows, removed=repair_ids - {row.repairid for row in rows})
+
+    def scan(self):
+        """Новый ремонт оборудования по считанной метке"""
+        text = self.scan_input.text()
+        self.scan_input.clear()
+        if not text.strip():
+            return
+
+        tag = self.tags.lookup(text)
+        if tag is None:
+            self.statusBar().showMessage(f"Метка {inventory.normalize(text)} не найдена", 5000)
+            return
+        if not any(equip_id == tag.equipmentid for equip_id, _ in self.equipment_list):
+            QMessageBox.information(
+                self, "Сканирование",
+                f"Оборудование '{tag.name}' ({tag.inventory_number}) вне выбранного участка")
+            return
+        self.show_add_dialog(tag.equipmentid)
+
+    def show_add_dialog(self, equipment_id=None):
+        """Диалог добавления нового ремонта (equipment_id - выбранное заранее оборудование)"""
         dialog = QDialog(self)
         dialog.setWindowTitle("Добавить запись о ремонте")
         dialog.setFixedSize(500, 400)
@@ -278,6 +329,8 @@ class RepairApp(QMainWindow):
         equipment_combo = QComboBox()
         for equip_id, equip_name in self.equipment_list:
             equipment_combo.addItem(equip_name, equip_id)
+        if equipment_id is not None:
+            equipment_combo.setCurrentIndex(equipment_combo.findData(equipment_id))
 
         date_input = QDateEdit()
         date_input.setCalendarPopup(True)
@@ -310,8 +363,8 @@ class RepairApp(QMainWindow):
 
         def add_repair():
             equip_id = equipment_combo.currentData()
-            date = date_input.date().toString("yyyy-MM-dd")
-            price = price_input.value()
+            date = date_input.date().toPyDate()
+            price = Decimal(f"{price_input.value():.2f}")
             status = status_combo.currentText()
 
             if not all([equip_id, date, status]):
@@ -319,45 +372,13 @@ class RepairApp(QMainWindow):
                 return
 
             try:
-                self.cursor.execute(
-                    "SELECT repairstatusid FROM repairstatus WHERE statusname = %s",
-                    (status,))
-                status_id = self.cursor.fetchone()[0]
-
-                self.cursor.execute(
-                    """INSERT INTO repair 
-                    (equipmentid, repairdate, repairprice, repairstatusid) 
-                    VALUES (%s, %s, %s, %s) 
-                    RETURNING repairid""",
-                    (equip_id, date, price, status_id))
-
-                new_id = self.cursor.fetchone()[0]
-                self.update_equipment_status(equip_id, status)
-
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
+                # Ремонт и статус оборудования сохраняются одной транзакцией
+                new_id = repairs.add(self.conn, equip_id, date, price, status)
+                self.reads.wrote()
 
+                # Строка встает на свое место по дате ремонта
                 equip_name = equipment_combo.currentText()
-                columns = [
-                    str(new_id), str(equip_id), equip_name,
-                    date_input.date().toString("dd.MM.yyyy"),
-                    f"{price:.2f} ₽",
-                    status
-                ]
-
-                for col_idx, value in enumerate(columns):
-                    item = QTableWidgetItem(value)
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-
-                    if col_idx == 5:
-                        if value == "Завершён":
-                            item.setBackground(QColor(144, 238, 144))
-                        elif value == "В процессе":
-                            item.setBackground(QColor(255, 255, 153))
-                        elif value == "Отменён":
-                            item.setBackground(QColor(255, 182, 193))
-
-                    self.table.setItem(row_pos, col_idx, item)
+                self.model.insert_row(RepairRow(new_id, equip_id, equip_name, date, price, status))
 
                 dialog.close()
 
@@ -371,18 +392,15 @@ class RepairApp(QMainWindow):
 
     def show_edit_dialog(self):
         """Диалог редактирования записи о ремонте"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите запись о ремонте для редактирования")
             return
 
-        row = selected_items[0].row()
-        repair_id = int(self.table.item(row, 0).text())
-        equip_id = int(self.table.item(row, 1).text())
-        current_equip_name = self.table.item(row, 2).text()
-        current_date = QDate.fromString(self.table.item(row, 3).text(), "dd.MM.yyyy")
-        current_price = float(self.table.item(row, 4).text().split()[0])
-        current_status = self.table.item(row, 5).text()
+        record = self.model.row(row)
+        repair_id, equip_id, current_status = record.repairid, record.equipmentid, record.status
+        current_date = QDate(record.repairdate) if record.repairdate is not None else QDate.currentDate()
+        current_price = float(record.repairprice) if record.repairprice is not None else 0.0
 
         dialog = QDialog(self)
         dialog.setWindowTitle("Редактировать запись о ремонте")
@@ -431,8 +449,8 @@ class RepairApp(QMainWindow):
 
         def update_repair():
             new_equip_id = equipment_combo.currentData()
-            new_date = date_input.date().toString("yyyy-MM-dd")
-            new_price = price_input.value()
+            new_date = date_input.date().toPyDate()
+            new_price = Decimal(f"{price_input.value():.2f}")
             new_status = status_combo.currentText()
 
             if not all([new_equip_id, new_date, new_status]):
@@ -440,47 +458,14 @@ class RepairApp(QMainWindow):
                 return
 
             try:
-                self.cursor.execute(
-                    "SELECT repairstatusid FROM repairstatus WHERE statusname = %s",
-                    (new_status,))
-                new_status_id = self.cursor.fetchone()[0]
-
-                self.cursor.execute(
-                    """SELECT rs.statusname 
-                    FROM repair r
-                    JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
-                    WHERE r.repairid = %s""",
-                    (repair_id,))
-                old_status = self.cursor.fetchone()[0]
-
-                self.cursor.execute(
-                    """UPDATE repair SET 
-                    equipmentid = %s, 
-                    repairdate = %s, 
-                    repairprice = %s,
-                    repairstatusid = %s
-                    WHERE repairid = %s""",
-                    (new_equip_id, new_date, new_price, new_status_id, repair_id))
-
-                if old_status != new_status:
-                    self.update_equipment_status(new_equip_id, new_status)
+                # Стоимость возвращается с пересчитанными запчастями
+                new_price = repairs.update(self.conn, repair_id, new_equip_id, new_date, new_price,
+                                           new_status, old_equipment_id=equip_id)
+                self.reads.wrote()
 
                 new_equip_name = equipment_combo.currentText()
-
-                self.table.item(row, 1).setText(str(new_equip_id))
-                self.table.item(row, 2).setText(new_equip_name)
-                self.table.item(row, 3).setText(date_input.date().toString("dd.MM.yyyy"))
-                self.table.item(row, 4).setText(f"{new_price:.2f} ₽")
-
-                status_item = self.table.item(row, 5)
-                status_item.setText(new_status)
-
-                if new_status == "Завершён":
-                    status_item.setBackground(QColor(144, 238, 144))
-                elif new_status == "В процессе":
-                    status_item.setBackground(QColor(255, 255, 153))
-                elif new_status == "Отменён":
-                    status_item.setBackground(QColor(255, 182, 193))
+                self.model.update_row(row, RepairRow(
+                    repair_id, new_equip_id, new_equip_name, new_date, new_price, new_status))
 
                 dialog.close()
 
@@ -492,18 +477,24 @@ class RepairApp(QMainWindow):
 
         dialog.exec()
 
+    def show_parts_dialog(self):
+        """Запчасти выбранного ремонта"""
+        row = selected_row(self.table)
+        if row is None:
+            QMessageBox.warning(self, "Ошибка", "Выберите запись о ремонте")
+            return
+        parts.PartsDialog(self, row).exec()
+
     def delete_repair(self):
         """Удаление выбранной записи о ремонте"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите запись о ремонте для удаления")
             return
 
-        row = selected_items[0].row()
-        repair_id = int(self.table.item(row, 0).text())
-        equip_id = int(self.table.item(row, 1).text())
-        equip_name = self.table.item(row, 2).text()
-        date = self.table.item(row, 3).text()
+        record = self.model.row(row)
+        repair_id, equip_id, equip_name = record.repairid, record.equipmentid, record.equipment
+        date = format_date(record.repairdate)
 
         reply = QMessageBox.question(
             self, "Подтверждение",
@@ -512,27 +503,19 @@ class RepairApp(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             try:
-                self.cursor.execute(
-                    """SELECT rs.statusname 
-                    FROM repair r
-                    JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
-                    WHERE r.repairid = %s""",
-                    (repair_id,))
-                status = self.cursor.fetchone()[0]
-
-                self.cursor.execute(
-                    "DELETE FROM repair WHERE repairid = %s",
-                    (repair_id,))
-
-                if status == "В процессе":
-                    self.update_equipment_status(equip_id, "Завершён")
-
-                self.table.removeRow(row)
+                # Запись только помечается удаленной, история ремонтов сохраняется
+                repairs.delete(self.conn, repair_id, equip_id)
+                self.reads.wrote()
+                self.model.remove_row(row)
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось удалить запись о ремонте:\n{str(e)}")
 
     def closeEvent(self, event):
         """Обработчик закрытия окна"""
+        self.refresher.set_enabled(False)
+        self.overdue.stop()
+        if self.reads:
+            self.reads.close()
         if self.cursor:
             self.cursor.close()
         if self.conn:
@@ -541,8 +524,10 @@ class RepairApp(QMainWindow):
 
 
 if __name__ == "__main__":
+    startup.mark("импорт")
     app = QApplication(sys.argv)
-    app.setStyle("Fusion")
+    theme.apply(app)
     window = RepairApp()
     window.show()
+    startup.mark("окно")
     sys.exit(app.exec())
\ No newline at end of file
@@ -1,13 +1,25 @@
 import sys
-import psycopg2
+import startup
+import theme
+import database
+from collections import namedtuple
+import scorecard
+import replicas
+from table_model import RecordTableModel, SortFilterProxyModel, format_money, selected_row
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
-    QHBoxLayout, QLabel, QPushButton, QTableWidget,
-    QTableWidgetItem, QMessageBox, QLineEdit,
+    QHBoxLayout, QLabel, QPushButton, QTableView,
+    QMessageBox, QLineEdit,
     QHeaderView, QDialog, QFormLayout
 )
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QColor, QPalette, QIcon
+from PyQt6.QtGui import QIcon
+
+
+# Строка таблицы поставщиков с показателями из сводки
+SupplierRow = namedtuple(
+    'SupplierRow', 'supplierid name assets_delivered repair_count repair_cost writeoff_rate',
+    defaults=(None, None, None, None))
 
 
 class SuppliersApp(QMainWindow):
@@ -16,89 +28,45 @@ class SuppliersApp(QMainWindow):
         self.setWindowTitle("Система учета поставщиков оборудования")
         self.setGeometry(100, 100, 800, 600)
 
-        # Промышленная цветовая схема
-        self.industrial_blue = QColor(0, 90, 141)  # Основной синий цвет
-        self.industrial_light = QColor(240, 244, 248)  # Светлый фон
-        self.industrial_white = QColor(255, 255, 255)  # Белый
-        self.industrial_green = QColor(0, 128, 0)  # Для успешных операций
-
-        # Установка стиля приложения
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: {self.industrial_light.name()};
-            }}
-            QTableWidget {{
-                background-color: {self.industrial_white.name()};
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                gridline-color: #d1d8e0;
-                font-size: 14px;
-            }}
-            QTableWidget::item {{
-                padding: 8px;
-            }}
-            QHeaderView::section {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                padding: 8px;
-                border: none;
-                font-weight: bold;
-            }}
-            QPushButton {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                border: none;
-                border-radius: 5px;
-                padding: 10px 15px;
-                font-size: 14px;
-                min-width: 100px;
-            }}
-            QPushButton:hover {{
-                background-color: {self.industrial_blue.darker(110).name()};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.industrial_blue.darker(120).name()};
-            }}
-            QPushButton:disabled {{
-                background-color: #cccccc;
-            }}
-            QLineEdit {{
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                padding: 8px;
-                font-size: 14px;
-            }}
-            QDialog {{
-                background-color: {self.industrial_light.name()};
-            }}
-        """)
-
-        # Настройка цветовой палитры
-        palette = self.palette()
-        palette.setColor(QPalette.ColorRole.Window, self.industrial_light)
-        palette.setColor(QPalette.ColorRole.Base, self.industrial_white)
-        palette.setColor(QPalette.ColorRole.Highlight, self.industrial_blue)
-        self.setPalette(palette)
+        # Общая тема применяется один раз на уровне приложения
+        theme.apply()
 
         self.conn = None
         self.cursor = None
-        self.connect_to_db()
+        self.reads = None
         self.setup_ui()
+
+        # Окно показывается сразу пустым, подключение к БД и загрузка
+        # данных выполняются после его первой отрисовки
+        self.centralWidget().setEnabled(False)
+        self.statusBar().showMessage("Загрузка данных...")
+        startup.after_first_paint(self, self.start)
+
+    def start(self):
+        """Подключение к БД и первоначальная загрузка данных"""
+        if not self.connect_to_db():
+            return
+        startup.mark("подключение")
         self.load_data()
+        startup.mark("загрузка")
+
+        self.centralWidget().setEnabled(True)
+        self.statusBar().clearMessage()
+        startup.report(self.windowTitle())
 
     def connect_to_db(self):
         """Подключение к базе данных"""
         try:
-            self.conn = psycopg2.connect(
-                dbname='kurs',
-                user='postgres',
-                password='123',
-                host='localhost'
-            )
+            self.conn = database.connect()
             self.cursor = self.conn.cursor()
+            database.check_schema(self.cursor)
+            self.conn.commit()
+            self.reads = replicas.ReadRouter(self.cursor)
+            return True
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка подключения к БД: {str(e)}")
-            sys.exit(1)
+            QApplication.exit(1)
+            return False
 
     def setup_ui(self):
         """Настройка пользовательского интерфейса"""
@@ -110,14 +78,7 @@ class SuppliersApp(QMainWindow):
 
         # Заголовок
         title_label = QLabel("Учет поставщиков оборудования")
-        title_label.setStyleSheet(f"""
-            QLabel {{
-                font-size: 18px;
-                font-weight: bold;
-                color: {self.industrial_blue.name()};
-                padding: 10px;
-            }}
-        """)
+        title_label.setObjectName("title")
         layout.addWidget(title_label)
 
         # Кнопки управления
@@ -128,60 +89,63 @@ class SuppliersApp(QMainWindow):
         self.edit_btn = QPushButton("Редактировать")
         self.delete_btn = QPushButton("Удалить")
         self.refresh_btn = QPushButton("Обновить")
+        self.scorecard_btn = QPushButton("Пересчитать показатели")
 
-        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn]:
+        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn, self.scorecard_btn]:
             btn.setCursor(Qt.CursorShape.PointingHandCursor)
 
         self.add_btn.clicked.connect(self.show_add_dialog)
         self.edit_btn.clicked.connect(self.show_edit_dialog)
         self.delete_btn.clicked.connect(self.delete_supplier)
         self.refresh_btn.clicked.connect(self.load_data)
+        self.scorecard_btn.clicked.connect(self.refresh_scorecard)
 
         btn_layout.addWidget(self.add_btn)
         btn_layout.addWidget(self.edit_btn)
         btn_layout.addWidget(self.delete_btn)
         btn_layout.addWidget(self.refresh_btn)
+        btn_layout.addWidget(self.scorecard_btn)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Фильтр...")
+        btn_layout.addWidget(self.filter_input)
 
         # Таблица с данными
-        self.table = QTableWidget()
-        self.table.setColumnCount(2)
-        self.table.setHorizontalHeaderLabels(["ID", "Название поставщика"])
+        self.model = RecordTableModel(
+            ["ID", "Название поставщика", "Поставлено", "Ремонтов", "Стоимость ремонтов", "Доля списаний"],
+            sort_column=1,
+            formatters={
+                4: format_money,
+                5: lambda value: f"{value * 100:.1f} %" if value is not None else "",
+            },
+            key_types={0: 'int', 1: 'text', 2: 'int', 3: 'int', 4: 'money', 5: 'float'},
+            parent=self)
+        # Показатели выравниваются по правому краю
+        self.model.roles[Qt.ItemDataRole.TextAlignmentRole] = lambda row, column: (
+            Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter) if column >= 2 else None
+
+        # Сортировка по заголовку и фильтр выполняются на клиенте
+        self.proxy = SortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_input.textChanged.connect(self.proxy.set_filter_text)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
         self.table.setColumnHidden(0, True)  # Скрываем столбец ID
 
-        # Настройка внешнего вида таблицы
-        self.table.setStyleSheet("""
-            QTableWidget {
-                border: 1px solid #c0c0c0;
-                gridline-color: #c0c0c0;
-            }
-            QHeaderView::section {
-                background-color: #005A8D;
-                color: white;
-                padding: 8px;
-                border: 1px solid #c0c0c0;
-                font-weight: bold;
-            }
-            QTableWidget::item {
-                border-right: 1px solid #c0c0c0;
-                border-bottom: 1px solid #c0c0c0;
-                padding: 8px;
-            }
-        """)
-
         # Настройка размеров столбцов
         header = self.table.horizontalHeader()
         header.setDefaultSectionSize(200)
         header.setMinimumSectionSize(150)
         header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)  # Название поставщика
+        for col_idx in range(2, 6):  # Показатели поставщика
+            header.setSectionResizeMode(col_idx, QHeaderView.ResizeMode.ResizeToContents)
+
+        theme.setup_table(self.table)
 
-        self.table.verticalHeader().setVisible(False)
-        self.table.setShowGrid(True)
-        self.table.setAlternatingRowColors(True)
-        self.table.setStyleSheet("""
-            QTableWidget {
-                alternate-background-color: #f5f5f5;
-            }
-        """)
+        # Сортировка по щелчку на заголовке, начальный порядок как в запросе
+        header.setSortIndicator(1, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
 
         layout.addLayout(btn_layout)
         layout.addWidget(self.table)
@@ -193,15 +157,18 @@ class SuppliersApp(QMainWindow):
             return
 
         try:
-            self.cursor.execute("SELECT supplierid, suppliername FROM supplier ORDER BY suppliername")
-            data = self.cursor.fetchall()
-
-            self.table.setRowCount(len(data))
-            for row_idx, row in enumerate(data):
-                for col_idx, value in enumerate(row):
-                    item = QTableWidgetItem(str(value) if value is not None else "")
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                    self.table.setItem(row_idx, col_idx, item)
+            cursor = self.reads.cursor()
+            cursor.execute("""
+                SELECT s.supplierid, s.suppliername,
+                       sc.assets_delivered, sc.repair_count,
+                       sc.repair_cost, sc.writeoff_rate
+                FROM supplier s
+                LEFT JOIN supplier_scorecard sc ON sc.supplierid = s.supplierid
+                ORDER BY s.suppliername
+            """)
+            data = cursor.fetchall()
+            self.conn.commit()
+            self.model.set_rows(map(SupplierRow._make, data))
 
             print(f"Загружено {len(data)} записей")
 
@@ -213,6 +180,18 @@ class SuppliersApp(QMainWindow):
                 f"Не удалось загрузить данные из базы:\n{str(e)}"
             )
 
+    def refresh_scorecard(self):
+        """Пересчет сводных показателей поставщиков"""
+        try:
+            count = scorecard.refresh(self.cursor)
+            self.conn.commit()
+            self.reads.wrote()
+            print(f"Показатели пересчитаны для {count} поставщиков")
+            self.load_data()
+        except Exception as e:
+            self.conn.rollback()
+            QMessageBox.critical(self, "Ошибка", f"Не удалось пересчитать показатели:\n{str(e)}")
+
     def show_add_dialog(self):
         """Диалог добавления нового поставщика"""
         dialog = QDialog(self)
@@ -225,43 +204,14 @@ class SuppliersApp(QMainWindow):
 
         name_input = QLineEdit()
         name_input.setPlaceholderText("Введите название поставщика")
-        name_input.setStyleSheet("""
-            QLineEdit {
-                border: 2px solid #d1d8e0;
-                border-radius: 5px;
-                padding: 10px;
-                font-size: 14px;
-            }
-            QLineEdit:focus {
-                border-color: #4b7bec;
-            }
-        """)
 
         btn_box = QHBoxLayout()
         btn_box.setSpacing(10)
 
         ok_btn = QPushButton("Добавить")
-        ok_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {self.industrial_blue.darker(110).name()};
-            }}
-        """)
 
         cancel_btn = QPushButton("Отмена")
-        cancel_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: #cccccc;
-                color: black;
-            }}
-            QPushButton:hover {{
-                background-color: #bbbbbb;
-            }}
-        """)
+        cancel_btn.setObjectName("secondary")
 
         btn_box.addWidget(ok_btn)
         btn_box.addWidget(cancel_btn)
@@ -281,17 +231,10 @@ class SuppliersApp(QMainWindow):
                     (name,))
                 new_id = self.cursor.fetchone()[0]
                 self.conn.commit()
+                self.reads.wrote()
 
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
-
-                id_item = QTableWidgetItem(str(new_id))
-                id_item.setFlags(id_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                self.table.setItem(row_pos, 0, id_item)
-
-                name_item = QTableWidgetItem(name)
-                name_item.setFlags(name_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                self.table.setItem(row_pos, 1, name_item)
+                # Новый поставщик встает на свое место по названию
+                self.model.insert_row(SupplierRow(new_id, name))
 
                 dialog.close()
 
@@ -306,14 +249,13 @@ class SuppliersApp(QMainWindow):
 
     def show_edit_dialog(self):
         """Диалог редактирования поставщика"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите поставщика для редактирования")
             return
 
-        row = selected_items[0].row()
-        supplier_id = int(self.table.item(row, 0).text())
-        current_name = self.table.item(row, 1).text()
+        record = self.model.row(row)
+        supplier_id, current_name = record.supplierid, record.name
 
         dialog = QDialog(self)
         dialog.setWindowTitle("Редактировать поставщика")
@@ -324,43 +266,14 @@ class SuppliersApp(QMainWindow):
         layout.setSpacing(15)
 
         name_input = QLineEdit(current_name)
-        name_input.setStyleSheet("""
-            QLineEdit {
-                border: 2px solid #d1d8e0;
-                border-radius: 5px;
-                padding: 10px;
-                font-size: 14px;
-            }
-            QLineEdit:focus {
-                border-color: #4b7bec;
-            }
-        """)
 
         btn_box = QHBoxLayout()
         btn_box.setSpacing(10)
 
         ok_btn = QPushButton("Сохранить")
-        ok_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {self.industrial_blue.darker(110).name()};
-            }}
-        """)
 
         cancel_btn = QPushButton("Отмена")
-        cancel_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: #cccccc;
-                color: black;
-            }}
-            QPushButton:hover {{
-                background-color: #bbbbbb;
-            }}
-        """)
+        cancel_btn.setObjectName("secondary")
 
         btn_box.addWidget(ok_btn)
         btn_box.addWidget(cancel_btn)
@@ -383,9 +296,10 @@ class SuppliersApp(QMainWindow):
                     "UPDATE supplier SET suppliername = %s WHERE supplierid = %s",
                     (new_name, supplier_id))
                 self.conn.commit()
+                self.reads.wrote()
 
                 # Обновляем таблицу
-                self.table.item(row, 1).setText(new_name)
+                self.model.update_row(row, record._replace(name=new_name))
                 dialog.close()
 
             except Exception as e:
@@ -399,14 +313,13 @@ class SuppliersApp(QMainWindow):
 
     def delete_supplier(self):
         """Удаление выбранного поставщика"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите поставщика для удаления")
             return
 
-        row = selected_items[0].row()
-        supplier_id = int(self.table.item(row, 0).text())
-        supplier_name = self.table.item(row, 1).text()
+        record = self.model.row(row)
+        supplier_id, supplier_name = record.supplierid, record.name
 
         reply = QMessageBox.question(
             self, "Подтверждение",
@@ -419,13 +332,16 @@ class SuppliersApp(QMainWindow):
                     "DELETE FROM supplier WHERE supplierid = %s",
                     (supplier_id,))
                 self.conn.commit()
-                self.table.removeRow(row)
+                self.reads.wrote()
+                self.model.remove_row(row)
             except Exception as e:
                 self.conn.rollback()
                 QMessageBox.critical(self, "Ошибка", f"Не удалось удалить поставщика:\n{str(e)}")
 
     def closeEvent(self, event):
         """Обработчик закрытия окна"""
+        if self.reads:
+            self.reads.close()
         if self.cursor:
             self.cursor.close()
         if self.conn:
@@ -434,8 +350,10 @@ class SuppliersApp(QMainWindow):
 
 
 if __name__ == "__main__":
+    startup.mark("импорт")
     app = QApplication(sys.argv)
-    app.setStyle("Fusion")
+    theme.apply(app)
     window = SuppliersApp()
     window.show()
+    startup.mark("окно")
     sys.exit(app.exec())
\ No newline at end of file
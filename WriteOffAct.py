@@ -1,13 +1,38 @@
 import sys
-import psycopg2
+import startup
+import theme
+import database
+from collections import namedtuple
+import partitions
+import refresh
+import locations
+import replicas
+from table_model import RecordTableModel, SortFilterProxyModel, format_date, selected_row
+import fulltext
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
-    QHBoxLayout, QLabel, QPushButton, QTableWidget,
-    QTableWidgetItem, QMessageBox, QLineEdit, QDateEdit,
-    QHeaderView, QDialog, QFormLayout, QComboBox, QTextEdit
+    QHBoxLayout, QLabel, QPushButton, QTableView,
+    QMessageBox, QLineEdit, QDateEdit,
+    QHeaderView, QDialog, QFormLayout, QComboBox, QFileDialog, QTextEdit, QCheckBox
 )
 from PyQt6.QtCore import Qt, QDate
-from PyQt6.QtGui import QColor, QPalette
+
+
+# Строка таблицы актов списания; headline заполняется только при поиске
+WriteOffRow = namedtuple(
+    'WriteOffRow', 'writeoffactid equipmentid equipment writeoffdate reason headline',
+    defaults=(None,))
+
+# Акты списания с названием оборудования; {where} - условия по периоду
+# и по отдельным строкам для автообновления
+WRITEOFF_SQL = """
+    SELECT w.writeoffactid, w.equipmentid, e.name, 
+           w.writeoffdate, w.reason
+    FROM writeoffact w
+    LEFT JOIN equipment e ON w.equipmentid = e.equipmentid
+    WHERE TRUE {where}
+    ORDER BY w.writeoffdate DESC
+"""
 
 
 class WriteOffApp(QMainWindow):
@@ -16,97 +41,62 @@ class WriteOffApp(QMainWindow):
         self.setWindowTitle("Система учета актов списания оборудования")
         self.setGeometry(100, 100, 1000, 700)
 
-        # Цветовая схема
-        self.industrial_blue = QColor(0, 90, 141)
-        self.industrial_light = QColor(240, 244, 248)
-        self.industrial_white = QColor(255, 255, 255)
-        self.industrial_red = QColor(220, 53, 69)  # Для акцента на списании
-
-        # Установка стиля приложения
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: {self.industrial_light.name()};
-            }}
-            QTableWidget {{
-                background-color: {self.industrial_white.name()};
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                gridline-color: #d1d8e0;
-                font-size: 14px;
-            }}
-            QTableWidget::item {{
-                padding: 8px;
-            }}
-            QHeaderView::section {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                padding: 8px;
-                border: none;
-                font-weight: bold;
-            }}
-            QPushButton {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                border: none;
-                border-radius: 5px;
-                padding: 10px 15px;
-                font-size: 14px;
-                min-width: 100px;
-            }}
-            QPushButton:hover {{
-                background-color: {self.industrial_blue.darker(110).name()};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.industrial_blue.darker(120).name()};
-            }}
-            QPushButton:disabled {{
-                background-color: #cccccc;
-            }}
-            QLineEdit, QComboBox, QDateEdit, QTextEdit {{
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                padding: 8px;
-                font-size: 14px;
-            }}
-            QDialog {{
-                background-color: {self.industrial_light.name()};
-            }}
-        """)
-
-        # Настройка цветовой палитры
-        palette = self.palette()
-        palette.setColor(QPalette.ColorRole.Window, self.industrial_light)
-        palette.setColor(QPalette.ColorRole.Base, self.industrial_white)
-        palette.setColor(QPalette.ColorRole.Highlight, self.industrial_blue)
-        self.setPalette(palette)
+        # Общая тема применяется один раз на уровне приложения
+        theme.apply()
 
         self.conn = None
         self.cursor = None
-        self.connect_to_db()
+        self.reads = None
+        self.search_active = False
         self.setup_ui()
+
+        # Окно показывается сразу пустым, подключение к БД и загрузка
+        # данных выполняются после его первой отрисовки
+        self.centralWidget().setEnabled(False)
+        self.statusBar().showMessage("Загрузка данных...")
+        startup.after_first_paint(self, self.start)
+
+    def start(self):
+        """Подключение к БД и первоначальная загрузка данных"""
+        if not self.connect_to_db():
+            return
+        startup.mark("подключение")
+        self.scope_combo.load(self.reads.cursor())
+        self.conn.commit()
         self.load_data()
         self.load_equipment()
+        startup.mark("загрузка")
+
+        self.centralWidget().setEnabled(True)
+        self.statusBar().clearMessage()
+        startup.report(self.windowTitle())
 
     def connect_to_db(self):
         """Подключение к базе данных"""
         try:
-            self.conn = psycopg2.connect(
-                dbname='kurs',
-                user='postgres',
-                password='123',
-                host='localhost'
-            )
+            self.conn = database.connect()
             self.cursor = self.conn.cursor()
+            database.check_schema(self.cursor)
+            self.conn.commit()
+            self.reads = replicas.ReadRouter(self.cursor)
+            return True
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка подключения к БД: {str(e)}")
-            sys.exit(1)
+            QApplication.exit(1)
+            return False
 
     def load_equipment(self):
         """Загрузка списка оборудования для комбобокса"""
         try:
-            self.cursor.execute("SELECT equipmentid, name FROM equipment ORDER BY name")
-            self.equipment_list = self.cursor.fetchall()
+            where, params = locations.scope_filter("e.equipmentid", self.scope_combo.path())
+            cursor = self.reads.cursor()
+            cursor.execute(
+                f"SELECT e.equipmentid, e.name FROM equipment e WHERE e.deleted_at IS NULL {where} ORDER BY e.name",
+                params)
+            self.equipment_list = cursor.fetchall()
+            self.conn.commit()
         except Exception as e:
+            self.conn.rollback()
             print(f"Ошибка при загрузке оборудования: {e}")
             self.equipment_list = []
 
@@ -120,14 +110,7 @@ class WriteOffApp(QMainWindow):
 
         # Заголовок
         title_label = QLabel("Учет актов списания оборудования")
-        title_label.setStyleSheet(f"""
-            QLabel {{
-                font-size: 18px;
-                font-weight: bold;
-                color: {self.industrial_blue.name()};
-                padding: 10px;
-            }}
-        """)
+        title_label.setObjectName("title")
         layout.addWidget(title_label)
 
         # Кнопки управления
@@ -138,48 +121,68 @@ class WriteOffApp(QMainWindow):
         self.edit_btn = QPushButton("Редактировать")
         self.delete_btn = QPushButton("Удалить")
         self.refresh_btn = QPushButton("Обновить")
+        self.print_btn = QPushButton("Печать акта")
+        self.batch_print_btn = QPushButton("Печать за период")
 
-        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn]:
+        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn,
+                    self.print_btn, self.batch_print_btn]:
             btn.setCursor(Qt.CursorShape.PointingHandCursor)
 
         self.add_btn.clicked.connect(self.show_add_dialog)
         self.edit_btn.clicked.connect(self.show_edit_dialog)
         self.delete_btn.clicked.connect(self.delete_writeoff)
         self.refresh_btn.clicked.connect(self.load_data)
+        self.print_btn.clicked.connect(self.print_act)
+        self.batch_print_btn.clicked.connect(self.print_batch)
 
         btn_layout.addWidget(self.add_btn)
         btn_layout.addWidget(self.edit_btn)
         btn_layout.addWidget(self.delete_btn)
         btn_layout.addWidget(self.refresh_btn)
 
+        self.auto_refresh_check = QCheckBox("Автообновление")
+        self.auto_refresh_check.setChecked(True)
+        btn_layout.addWidget(self.auto_refresh_check)
+
+        # Период отображения: запросы с границей по дате читают только нужные секции
+        self.period_combo = QComboBox()
+        self.period_combo.addItem("За все время", None)
+        self.period_combo.addItem("За 3 месяца", 3)
+        self.period_combo.addItem("За год", 12)
+        self.period_combo.addItem("За 3 года", 36)
+        self.period_combo.currentIndexChanged.connect(self.load_data)
+
+        # Участок: показываются только акты оборудования из поддерева
+        self.scope_combo = locations.ScopeCombo()
+        self.scope_combo.currentIndexChanged.connect(self.change_scope)
+
+        btn_layout.addStretch()
+        btn_layout.addWidget(QLabel("Участок:"))
+        btn_layout.addWidget(self.scope_combo)
+        btn_layout.addWidget(QLabel("Период:"))
+        btn_layout.addWidget(self.period_combo)
+        btn_layout.addWidget(self.print_btn)
+        btn_layout.addWidget(self.batch_print_btn)
+
         # Таблица с данными
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(
-            ["ID", "ID оборудования", "Оборудование", "Дата списания", "Причина списания"])
+        self.model = RecordTableModel(
+            ["ID", "ID оборудования", "Оборудование", "Дата списания", "Причина списания"],
+            sort_column=3, descending=True, formatters={3: format_date},
+            key_types={0: 'int', 1: 'int', 2: 'text', 3: 'date', 4: 'text'},
+            parent=self)
+        # Подсвеченная причина есть только у результатов поиска
+        self.model.roles[fulltext.HIGHLIGHT_ROLE] = \
+            lambda row, column: row.headline if column == 4 else None
+
+        # Сортировка по заголовку и фильтр выполняются на клиенте
+        self.proxy = SortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
         self.table.setColumnHidden(0, True)  # Скрываем столбец ID
         self.table.setColumnHidden(1, True)  # Скрываем столбец ID оборудования
 
-        # Настройка внешнего вида таблицы
-        self.table.setStyleSheet("""
-            QTableWidget {
-                border: 1px solid #c0c0c0;
-                gridline-color: #c0c0c0;
-            }
-            QHeaderView::section {
-                background-color: #005A8D;
-                color: white;
-                padding: 8px;
-                border: 1px solid #c0c0c0;
-                font-weight: bold;
-            }
-            QTableWidget::item {
-                border-right: 1px solid #c0c0c0;
-                border-bottom: 1px solid #c0c0c0;
-                padding: 8px;
-            }
-        """)
-
         # Настройка размеров столбцов
         header = self.table.horizontalHeader()
         header.setDefaultSectionSize(200)
@@ -188,21 +191,56 @@ class WriteOffApp(QMainWindow):
         header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)  # Дата
         header.setSectionResizeMode(4, QHeaderView.ResizeMode.Stretch)  # Причина
 
-        self.table.verticalHeader().setVisible(False)
-        self.table.setShowGrid(True)
-        self.table.setAlternatingRowColors(True)
-        self.table.setStyleSheet("""
-            QTableWidget {
-                alternate-background-color: #f5f5f5;
-            }
-            QTableWidget::item[column="4"] {
-                color: #dc3545;  /* Красный цвет для причины списания */
-            }
-        """)
+        theme.setup_table(self.table)
+
+        # Причина списания красным, найденные слова с подсветкой
+        self.table.setItemDelegateForColumn(4, fulltext.HighlightDelegate(theme.ACCENT_RED, self.table))
+
+        # Полнотекстовый поиск по причине списания
+        search_layout = QHBoxLayout()
+        search_layout.setSpacing(10)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Поиск по причине списания (например: коррозия)")
+        self.search_input.returnPressed.connect(self.search_data)
+
+        self.search_btn = QPushButton("Найти")
+        self.reset_search_btn = QPushButton("Сбросить")
+        for btn in [self.search_btn, self.reset_search_btn]:
+            btn.setCursor(Qt.CursorShape.PointingHandCursor)
+
+        self.search_btn.clicked.connect(self.search_data)
+        self.reset_search_btn.clicked.connect(self.reset_search)
+
+        search_layout.addWidget(self.search_input)
+        search_layout.addWidget(self.search_btn)
+        search_layout.addWidget(self.reset_search_btn)
+
+        # Сортировка по щелчку на заголовке, начальный порядок как в запросе
+        header.setSortIndicator(3, Qt.SortOrder.DescendingOrder)
+        self.table.setSortingEnabled(True)
 
         layout.addLayout(btn_layout)
+        layout.addLayout(search_layout)
         layout.addWidget(self.table)
 
+        self.refresher = refresh.AutoRefresh(
+            self, ['writeoffact', 'equipment'], self.apply_changes, model=self.model)
+        self.auto_refresh_check.toggled.connect(self.refresher.set_enabled)
+
+    def load_filter(self):
+        """Условия по выбранным участку и периоду и их параметры"""
+        where, params = locations.scope_filter("w.equipmentid", self.scope_combo.path())
+        months = self.period_combo.currentData()
+        if months is None:
+            return where, params
+        return where + " AND w.writeoffdate >= %s", params + (partitions.period_start(months),)
+
+    def change_scope(self):
+        """Переход к другому поддереву иерархии"""
+        self.load_equipment()
+        self.load_data()
+
     def load_data(self):
         """Загрузка данных об актах списания с объединением таблиц"""
         if not hasattr(self, 'cursor') or not self.cursor:
@@ -210,31 +248,22 @@ class WriteOffApp(QMainWindow):
             return
 
         try:
-            query = """
-                SELECT w.writeoffactid, w.equipmentid, e.name, 
-                       w.writeoffdate, w.reason
-                FROM writeoffact w
-                LEFT JOIN equipment e ON w.equipmentid = e.equipmentid
-                ORDER BY w.writeoffdate DESC
-            """
-            self.cursor.execute(query)
-            data = self.cursor.fetchall()
-
-            self.table.setRowCount(len(data))
-            for row_idx, row in enumerate(data):
-                for col_idx, value in enumerate(row):
-                    item = QTableWidgetItem(str(value) if value is not None else "")
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-
-                    # Окрашиваем причину списания в красный
-                    if col_idx == 4:  # Причина списания
-                        item.setForeground(self.industrial_red)
-
-                    self.table.setItem(row_idx, col_idx, item)
+            where, params = self.load_filter()
+            cursor = self.reads.cursor()
+            self.refresher.sync(cursor)
+            cursor.execute(WRITEOFF_SQL.format(where=where), params)
+            data = cursor.fetchall()
+            # Чтение могло пойти через основное соединение (реплика отстает
+            # или недоступна): транзакция завершается, чтобы не держать
+            # блокировку writeoffact до следующего действия пользователя
+            self.conn.commit()
+            self.model.set_rows(map(WriteOffRow._make, data))
+            self.search_active = False
 
             print(f"Загружено {len(data)} записей")
 
         except Exception as e:
+            self.conn.rollback()
             print(f"Ошибка при загрузке данных: {e}")
             QMessageBox.critical(
                 self,
@@ -242,6 +271,61 @@ class WriteOffApp(QMainWindow):
                 f"Не удалось загрузить данные из базы:\n{str(e)}"
             )
 
+    def search_data(self):
+        """Полнотекстовый поиск актов по причине списания"""
+        text = self.search_input.text().strip()
+        if not text:
+            self.load_data()
+            return
+
+        try:
+            # Поиск идет в тех же участке и периоде, что и список актов
+            where, params = self.load_filter()
+            data = fulltext.search(self.reads.cursor(), text, where, params)
+            self.conn.commit()
+
+            # Строки идут в порядке релевантности, шестой элемент - подсвеченная причина
+            self.model.set_rows(map(WriteOffRow._make, data))
+            self.search_active = True
+
+            print(f"Найдено {len(data)} записей")
+
+        except Exception as e:
+            self.conn.rollback()
+            QMessageBox.critical(self, "Ошибка поиска", f"Не удалось выполнить поиск:\n{str(e)}")
+
+    def reset_search(self):
+        """Сброс поиска и возврат к полному списку"""
+        self.search_input.clear()
+        self.load_data()
+
+    def apply_changes(self, changes):
+        """Перечитывание только измененных актов и актов переименованного оборудования"""
+        # Результаты поиска не обновляются, сброс поиска перечитает все акты
+        if self.search_active:
+            return
+        if None in changes.values():
+            self.load_data()
+            return
+
+        act_ids = changes.get('writeoffact', refresh.NO_CHANGES).keys
+        equipment_ids = changes.get('equipment', refresh.NO_CHANGES).keys
+        if not act_ids and not equipment_ids:
+            return
+
+        where, params = self.load_filter()
+        cursor = self.reads.cursor()
+        cursor.execute(
+            WRITEOFF_SQL.format(where=where + " AND (w.writeoffactid = ANY(%s) OR w.equipmentid = ANY(%s))"),
+            params + (sorted(act_ids), sorted(equipment_ids)))
+        rows = list(map(WriteOffRow._make, cursor.fetchall()))
+        self.conn.commit()
+        # Акты перенесенного в другой участок оборудования убираются
+        if equipment_ids:
+            act_ids = act_ids | {record.writeoffactid for record in self.model.records
+                                 if record.equipmentid in equipment_ids}
+        self.model.merge_rows(rows, removed=act_ids - {row.writeoffactid for row in rows})
+
     def show_add_dialog(self):
         """Диалог добавления нового акта списания"""
         dialog = QDialog(self)
@@ -285,7 +369,7 @@ class WriteOffApp(QMainWindow):
         def add_writeoff():
             # Получаем данные из формы
             equip_id = equipment_combo.currentData()
-            date = date_input.date().toString("yyyy-MM-dd")
+            date = date_input.date().toPyDate()
             reason = reason_input.toPlainText()
 
             # Валидация данных
@@ -303,30 +387,11 @@ class WriteOffApp(QMainWindow):
 
                 new_id = self.cursor.fetchone()[0]
                 self.conn.commit()
+                self.reads.wrote()
 
-                # Добавляем новую строку в таблицу
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
-
-                # Получаем названия для отображения
+                # Новая строка встает на свое место по дате списания
                 equip_name = equipment_combo.currentText()
-
-                # Заполняем таблицу
-                columns = [
-                    str(new_id), str(equip_id), equip_name,
-                    date_input.date().toString("dd.MM.yyyy"),
-                    reason
-                ]
-
-                for col_idx, value in enumerate(columns):
-                    item = QTableWidgetItem(value)
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-
-                    # Окрашиваем причину списания в красный
-                    if col_idx == 4:  # Причина списания
-                        item.setForeground(self.industrial_red)
-
-                    self.table.setItem(row_pos, col_idx, item)
+                self.model.insert_row(WriteOffRow(new_id, equip_id, equip_name, date, reason))
 
                 dialog.close()
 
@@ -341,17 +406,14 @@ class WriteOffApp(QMainWindow):
 
     def show_edit_dialog(self):
         """Диалог редактирования акта списания"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите акт списания для редактирования")
             return
 
-        row = selected_items[0].row()
-        writeoff_id = int(self.table.item(row, 0).text())
-        equip_id = int(self.table.item(row, 1).text())
-        current_equip_name = self.table.item(row, 2).text()
-        current_date = QDate.fromString(self.table.item(row, 3).text(), "dd.MM.yyyy")
-        current_reason = self.table.item(row, 4).text()
+        record = self.model.row(row)
+        writeoff_id, equip_id, current_reason = record.writeoffactid, record.equipmentid, record.reason
+        current_date = QDate(record.writeoffdate) if record.writeoffdate is not None else QDate.currentDate()
 
         dialog = QDialog(self)
         dialog.setWindowTitle("Редактировать акт списания")
@@ -377,7 +439,7 @@ class WriteOffApp(QMainWindow):
 
         reason_input = QTextEdit()
         reason_input.setMaximumHeight(100)
-        reason_input.setText(current_reason)
+        reason_input.setPlainText(current_reason or "")
 
         btn_box = QHBoxLayout()
         btn_box.setSpacing(10)
@@ -397,7 +459,7 @@ class WriteOffApp(QMainWindow):
         def update_writeoff():
             # Получаем данные из формы
             new_equip_id = equipment_combo.currentData()
-            new_date = date_input.date().toString("yyyy-MM-dd")
+            new_date = date_input.date().toPyDate()
             new_reason = reason_input.toPlainText()
 
             # Валидация данных
@@ -415,17 +477,12 @@ class WriteOffApp(QMainWindow):
                     (new_equip_id, new_date, new_reason, writeoff_id))
 
                 self.conn.commit()
+                self.reads.wrote()
 
                 # Обновляем таблицу
                 new_equip_name = equipment_combo.currentText()
-
-                self.table.item(row, 1).setText(str(new_equip_id))
-                self.table.item(row, 2).setText(new_equip_name)
-                self.table.item(row, 3).setText(date_input.date().toString("dd.MM.yyyy"))
-
-                reason_item = self.table.item(row, 4)
-                reason_item.setText(new_reason)
-                reason_item.setForeground(self.industrial_red)
+                self.model.update_row(row, WriteOffRow(
+                    writeoff_id, new_equip_id, new_equip_name, new_date, new_reason))
 
                 dialog.close()
 
@@ -440,15 +497,13 @@ class WriteOffApp(QMainWindow):
 
     def delete_writeoff(self):
         """Удаление выбранного акта списания"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите акт списания для удаления")
             return
 
-        row = selected_items[0].row()
-        writeoff_id = int(self.table.item(row, 0).text())
-        equip_name = self.table.item(row, 2).text()
-        date = self.table.item(row, 3).text()
+        record = self.model.row(row)
+        writeoff_id, equip_name, date = record.writeoffactid, record.equipment, format_date(record.writeoffdate)
 
         reply = QMessageBox.question(
             self, "Подтверждение",
@@ -461,13 +516,111 @@ class WriteOffApp(QMainWindow):
                     "DELETE FROM writeoffact WHERE writeoffactid = %s",
                     (writeoff_id,))
                 self.conn.commit()
-                self.table.removeRow(row)
+                self.reads.wrote()
+                self.model.remove_row(row)
             except Exception as e:
                 self.conn.rollback()
                 QMessageBox.critical(self, "Ошибка", f"Не удалось удалить акт списания:\n{str(e)}")
 
+    def print_act(self):
+        """Печать выбранного акта списания в PDF"""
+        import documents
+
+        row = selected_row(self.table)
+        if row is None:
+            QMessageBox.warning(self, "Ошибка", "Выберите акт списания для печати")
+            return
+
+        act_id = self.model.row(row).writeoffactid
+
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Сохранить акт списания", f"akt_spisaniya_{act_id:06d}.pdf", "PDF (*.pdf)")
+        if not path:
+            return
+
+        try:
+            found = documents.render_single(self.reads.cursor(), 'writeoff', act_id, path)
+            self.conn.commit()
+            if not found:
+                QMessageBox.warning(self, "Ошибка", "Акт списания не найден в базе")
+        except Exception as e:
+            self.conn.rollback()
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сформировать акт списания:\n{str(e)}")
+
+    def print_batch(self):
+        """Пакетная печать актов списания за период в ZIP-архив"""
+        import documents
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Печать актов списания за период")
+        dialog.setFixedSize(400, 220)
+
+        layout = QFormLayout(dialog)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        today = QDate.currentDate()
+        date_from_input = QDateEdit(QDate(today.year(), today.month(), 1))
+        date_from_input.setCalendarPopup(True)
+        date_from_input.setDisplayFormat("dd.MM.yyyy")
+
+        date_to_input = QDateEdit(today)
+        date_to_input.setCalendarPopup(True)
+        date_to_input.setDisplayFormat("dd.MM.yyyy")
+
+        btn_box = QHBoxLayout()
+        btn_box.setSpacing(10)
+
+        ok_btn = QPushButton("Сформировать")
+        cancel_btn = QPushButton("Отмена")
+
+        btn_box.addWidget(ok_btn)
+        btn_box.addWidget(cancel_btn)
+
+        layout.addRow("С:", date_from_input)
+        layout.addRow("По:", date_to_input)
+        layout.addRow(btn_box)
+
+        def render():
+            date_from = date_from_input.date()
+            date_to = date_to_input.date()
+            if date_from > date_to:
+                QMessageBox.warning(dialog, "Ошибка", "Начало периода позже окончания")
+                return
+
+            path, _ = QFileDialog.getSaveFileName(
+                dialog, "Сохранить архив",
+                f"akt_spisaniya_{date_from.toString('yyyyMMdd')}_{date_to.toString('yyyyMMdd')}.zip",
+                "ZIP (*.zip)")
+            if not path:
+                return
+
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                count = documents.render_batch(
+                    self.reads.cursor(), 'writeoff',
+                    date_from.toPyDate(), date_to.toPyDate(), path)
+                self.conn.commit()
+            except Exception as e:
+                QApplication.restoreOverrideCursor()
+                self.conn.rollback()
+                QMessageBox.critical(dialog, "Ошибка", f"Не удалось сформировать архив:\n{str(e)}")
+                return
+            QApplication.restoreOverrideCursor()
+
+            QMessageBox.information(dialog, "Готово", f"Сформировано документов: {count}")
+            dialog.close()
+
+        ok_btn.clicked.connect(render)
+        cancel_btn.clicked.connect(dialog.close)
+
+        dialog.exec()
+
     def closeEvent(self, event):
         """Обработчик закрытия окна"""
+        self.refresher.set_enabled(False)
+        if self.reads:
+            self.reads.close()
         if self.cursor:
             self.cursor.close()
         if self.conn:
@@ -476,8 +629,10 @@ class WriteOffApp(QMainWindow):
 
 
 if __name__ == "__main__":
+    startup.mark("импорт")
     app = QApplication(sys.argv)
-    app.setStyle("Fusion")
+    theme.apply(app)
     window = WriteOffApp()
     window.show()
+    startup.mark("окно")
     sys.exit(app.exec())
\ No newline at end of file
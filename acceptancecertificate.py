@@ -1,13 +1,37 @@
 import sys
-import psycopg2
+import startup
+import theme
+import database
+from collections import namedtuple
+import refresh
+import locations
+import replicas
+from table_model import RecordTableModel, SortFilterProxyModel, format_date, selected_row
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
-    QHBoxLayout, QLabel, QPushButton, QTableWidget,
-    QTableWidgetItem, QMessageBox, QLineEdit, QDateEdit,
-    QHeaderView, QDialog, QFormLayout, QComboBox
+    QHBoxLayout, QLabel, QPushButton, QTableView,
+    QMessageBox, QLineEdit, QDateEdit,
+    QHeaderView, QDialog, QFormLayout, QComboBox, QFileDialog, QCheckBox
 )
 from PyQt6.QtCore import Qt, QDate
-from PyQt6.QtGui import QColor, QPalette, QIcon
+from PyQt6.QtGui import QIcon
+
+
+# Строка таблицы актов приемки с исходными типами из БД
+CertificateRow = namedtuple(
+    'CertificateRow', 'acceptancecertificateid equipmentid equipment dateofrecovery supplier')
+
+# Акты приемки с названиями оборудования и поставщика; {where} - условие
+# по отдельным строкам для автообновления
+CERTIFICATE_SQL = """
+    SELECT ac.acceptancecertificateid, ac.equipmentid, e.name, 
+           ac.dateofrecovery, s.suppliername as supplier_name
+    FROM acceptancecertificate ac
+    LEFT JOIN equipment e ON ac.equipmentid = e.equipmentid
+    LEFT JOIN supplier s ON ac.supplierid = s.supplierid
+    WHERE TRUE {where}
+    ORDER BY ac.dateofrecovery DESC
+"""
 
 
 class AcceptanceCertificateApp(QMainWindow):
@@ -16,107 +40,74 @@ class AcceptanceCertificateApp(QMainWindow):
         self.setWindowTitle("Система учета актов приемки оборудования")
         self.setGeometry(100, 100, 1000, 700)
 
-        # Промышленная цветовая схема
-        self.industrial_blue = QColor(0, 90, 141)  # Основной синий цвет
-        self.industrial_light = QColor(240, 244, 248)  # Светлый фон
-        self.industrial_white = QColor(255, 255, 255)  # Белый
-        self.industrial_green = QColor(0, 128, 0)  # Для успешных операций
-
-        # Установка стиля приложения
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: {self.industrial_light.name()};
-            }}
-            QTableWidget {{
-                background-color: {self.industrial_white.name()};
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                gridline-color: #d1d8e0;
-                font-size: 14px;
-            }}
-            QTableWidget::item {{
-                padding: 8px;
-            }}
-            QHeaderView::section {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                padding: 8px;
-                border: none;
-                font-weight: bold;
-            }}
-            QPushButton {{
-                background-color: {self.industrial_blue.name()};
-                color: white;
-                border: none;
-                border-radius: 5px;
-                padding: 10px 15px;
-                font-size: 14px;
-                min-width: 100px;
-            }}
-            QPushButton:hover {{
-                background-color: {self.industrial_blue.darker(110).name()};
-            }}
-            QPushButton:pressed {{
-                background-color: {self.industrial_blue.darker(120).name()};
-            }}
-            QPushButton:disabled {{
-                background-color: #cccccc;
-            }}
-            QLineEdit, QComboBox, QDateEdit {{
-                border: 1px solid #d1d8e0;
-                border-radius: 5px;
-                padding: 8px;
-                font-size: 14px;
-            }}
-            QDialog {{
-                background-color: {self.industrial_light.name()};
-            }}
-        """)
-
-        # Настройка цветовой палитры
-        palette = self.palette()
-        palette.setColor(QPalette.ColorRole.Window, self.industrial_light)
-        palette.setColor(QPalette.ColorRole.Base, self.industrial_white)
-        palette.setColor(QPalette.ColorRole.Highlight, self.industrial_blue)
-        self.setPalette(palette)
+        # Общая тема применяется один раз на уровне приложения
+        theme.apply()
 
         self.conn = None
         self.cursor = None
-        self.connect_to_db()
+        self.reads = None
         self.setup_ui()
+
+        # Окно показывается сразу пустым, подключение к БД и загрузка
+        # данных выполняются после его первой отрисовки
+        self.centralWidget().setEnabled(False)
+        self.statusBar().showMessage("Загрузка данных...")
+        startup.after_first_paint(self, self.start)
+
+    def start(self):
+        """Подключение к БД и первоначальная загрузка данных"""
+        if not self.connect_to_db():
+            return
+        startup.mark("подключение")
+        self.scope_combo.load(self.reads.cursor())
+        self.conn.commit()
         self.load_data()
         self.load_equipment()
         self.load_suppliers()
+        startup.mark("загрузка")
+
+        self.centralWidget().setEnabled(True)
+        self.statusBar().clearMessage()
+        startup.report(self.windowTitle())
 
     def connect_to_db(self):
         """Подключение к базе данных"""
         try:
-            self.conn = psycopg2.connect(
-                dbname='kurs',
-                user='postgres',
-                password='123',
-                host='localhost'
-            )
+            self.conn = database.connect()
             self.cursor = self.conn.cursor()
+            database.check_schema(self.cursor)
+            self.conn.commit()
+            self.reads = replicas.ReadRouter(self.cursor)
+            return True
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка подключения к БД: {str(e)}")
-            sys.exit(1)
+            QApplication.exit(1)
+            return False
 
     def load_equipment(self):
         """Загрузка списка оборудования для комбобокса"""
         try:
-            self.cursor.execute("SELECT equipmentid, name FROM equipment ORDER BY name")
-            self.equipment_list = self.cursor.fetchall()
+            where, params = locations.scope_filter("e.equipmentid", self.scope_combo.path())
+            cursor = self.reads.cursor()
+            cursor.execute(
+                f"SELECT e.equipmentid, e.name FROM equipment e WHERE e.deleted_at IS NULL {where} ORDER BY e.name",
+                params)
+            self.equipment_list = cursor.fetchall()
+            self.conn.commit()
         except Exception as e:
+            self.conn.rollback()
             print(f"Ошибка при загрузке оборудования: {e}")
             self.equipment_list = []
 
     def load_suppliers(self):
         """Загрузка списка поставщиков для комбобокса"""
         try:
-            self.cursor.execute("SELECT supplierid, suppliername FROM supplier ORDER BY suppliername")
-            self.supplier_list = self.cursor.fetchall()
+            cursor = self.reads.cursor()
+            cursor.execute("SELECT supplierid, suppliername FROM supplier ORDER BY suppliername")
+            self.supplier_list = cursor.fetchall()
+            self.conn.commit()
         except Exception as e:
+            self.conn.rollback()
             print(f"Ошибка при загрузке поставщиков: {e}")
             self.supplier_list = []
 
@@ -130,14 +121,7 @@ class AcceptanceCertificateApp(QMainWindow):
 
         # Заголовок
         title_label = QLabel("Учет актов приемки оборудования")
-        title_label.setStyleSheet(f"""
-            QLabel {{
-                font-size: 18px;
-                font-weight: bold;
-                color: {self.industrial_blue.name()};
-                padding: 10px;
-            }}
-        """)
+        title_label.setObjectName("title")
         layout.addWidget(title_label)
 
         # Кнопки управления
@@ -148,47 +132,59 @@ class AcceptanceCertificateApp(QMainWindow):
         self.edit_btn = QPushButton("Редактировать")
         self.delete_btn = QPushButton("Удалить")
         self.refresh_btn = QPushButton("Обновить")
+        self.print_btn = QPushButton("Печать акта")
+        self.batch_print_btn = QPushButton("Печать за период")
 
-        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn]:
+        for btn in [self.add_btn, self.edit_btn, self.delete_btn, self.refresh_btn,
+                    self.print_btn, self.batch_print_btn]:
             btn.setCursor(Qt.CursorShape.PointingHandCursor)
 
         self.add_btn.clicked.connect(self.show_add_dialog)
         self.edit_btn.clicked.connect(self.show_edit_dialog)
         self.delete_btn.clicked.connect(self.delete_certificate)
         self.refresh_btn.clicked.connect(self.load_data)
+        self.print_btn.clicked.connect(self.print_act)
+        self.batch_print_btn.clicked.connect(self.print_batch)
 
         btn_layout.addWidget(self.add_btn)
         btn_layout.addWidget(self.edit_btn)
         btn_layout.addWidget(self.delete_btn)
         btn_layout.addWidget(self.refresh_btn)
 
+        self.auto_refresh_check = QCheckBox("Автообновление")
+        self.auto_refresh_check.setChecked(True)
+        btn_layout.addWidget(self.auto_refresh_check)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Фильтр...")
+        btn_layout.addWidget(self.filter_input)
+
+        # Участок: показываются только акты оборудования из поддерева
+        self.scope_combo = locations.ScopeCombo()
+        self.scope_combo.currentIndexChanged.connect(self.change_scope)
+        btn_layout.addWidget(QLabel("Участок:"))
+        btn_layout.addWidget(self.scope_combo)
+
+        btn_layout.addWidget(self.print_btn)
+        btn_layout.addWidget(self.batch_print_btn)
+
         # Таблица с данными
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["ID", "ID оборудования", "Оборудование", "Дата приемки", "Поставщик"])
+        self.model = RecordTableModel(
+            ["ID", "ID оборудования", "Оборудование", "Дата приемки", "Поставщик"],
+            sort_column=3, descending=True, formatters={3: format_date},
+            key_types={0: 'int', 1: 'int', 2: 'text', 3: 'date', 4: 'text'},
+            parent=self)
+
+        # Сортировка по заголовку и фильтр выполняются на клиенте
+        self.proxy = SortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_input.textChanged.connect(self.proxy.set_filter_text)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
         self.table.setColumnHidden(0, True)  # Скрываем столбец ID
         self.table.setColumnHidden(1, True)  # Скрываем столбец ID оборудования
 
-        # Настройка внешнего вида таблицы
-        self.table.setStyleSheet("""
-            QTableWidget {
-                border: 1px solid #c0c0c0;
-                gridline-color: #c0c0c0;
-            }
-            QHeaderView::section {
-                background-color: #005A8D;
-                color: white;
-                padding: 8px;
-                border: 1px solid #c0c0c0;
-                font-weight: bold;
-            }
-            QTableWidget::item {
-                border-right: 1px solid #c0c0c0;
-                border-bottom: 1px solid #c0c0c0;
-                padding: 8px;
-            }
-        """)
-
         # Настройка размеров столбцов
         header = self.table.horizontalHeader()
         header.setDefaultSectionSize(200)
@@ -197,18 +193,19 @@ class AcceptanceCertificateApp(QMainWindow):
         header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)  # Дата
         header.setSectionResizeMode(4, QHeaderView.ResizeMode.Interactive)  # Поставщик
 
-        self.table.verticalHeader().setVisible(False)
-        self.table.setShowGrid(True)
-        self.table.setAlternatingRowColors(True)
-        self.table.setStyleSheet("""
-            QTableWidget {
-                alternate-background-color: #f5f5f5;
-            }
-        """)
+        theme.setup_table(self.table)
+
+        # Сортировка по щелчку на заголовке, начальный порядок как в запросе
+        header.setSortIndicator(3, Qt.SortOrder.DescendingOrder)
+        self.table.setSortingEnabled(True)
 
         layout.addLayout(btn_layout)
         layout.addWidget(self.table)
 
+        self.refresher = refresh.AutoRefresh(
+            self, ['acceptancecertificate', 'equipment', 'supplier'], self.apply_changes, model=self.model)
+        self.auto_refresh_check.toggled.connect(self.refresher.set_enabled)
+
     def load_data(self):
         """Загрузка данных об актах приемки с объединением таблиц"""
         if not hasattr(self, 'cursor') or not self.cursor:
@@ -216,27 +213,21 @@ class AcceptanceCertificateApp(QMainWindow):
             return
 
         try:
-            query = """
-                SELECT ac.acceptancecertificateid, ac.equipmentid, e.name, 
-                       ac.dateofrecovery, s.suppliername as supplier_name
-                FROM acceptancecertificate ac
-                LEFT JOIN equipment e ON ac.equipmentid = e.equipmentid
-                LEFT JOIN supplier s ON ac.supplierid = s.supplierid
-                ORDER BY ac.dateofrecovery DESC
-            """
-            self.cursor.execute(query)
-            data = self.cursor.fetchall()
-
-            self.table.setRowCount(len(data))
-            for row_idx, row in enumerate(data):
-                for col_idx, value in enumerate(row):
-                    item = QTableWidgetItem(str(value) if value is not None else "")
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                    self.table.setItem(row_idx, col_idx, item)
+            where, params = locations.scope_filter("ac.equipmentid", self.scope_combo.path())
+            cursor = self.reads.cursor()
+            self.refresher.sync(cursor)
+            cursor.execute(CERTIFICATE_SQL.format(where=where), params)
+            data = cursor.fetchall()
+            # Чтение могло пойти через основное соединение (реплика отстает
+            # или недоступна): транзакция завершается, чтобы не держать
+            # блокировку acceptancecertificate до следующего действия пользователя
+            self.conn.commit()
+            self.model.set_rows(map(CertificateRow._make, data))
 
             print(f"Загружено {len(data)} записей")
 
         except Exception as e:
+            self.conn.rollback()
             print(f"Ошибка при загрузке данных: {e}")
             QMessageBox.critical(
                 self,
@@ -244,6 +235,37 @@ class AcceptanceCertificateApp(QMainWindow):
                 f"Не удалось загрузить данные из базы:\n{str(e)}"
             )
 
+    def apply_changes(self, changes):
+        """Перечитывание только актов, затронутых изменениями"""
+        if None in changes.values():
+            self.load_data()
+            return
+
+        act_ids = changes.get('acceptancecertificate', refresh.NO_CHANGES).keys
+        equipment_ids = changes.get('equipment', refresh.NO_CHANGES).keys
+        supplier_ids = changes.get('supplier', refresh.NO_CHANGES).keys
+        if not act_ids and not equipment_ids and not supplier_ids:
+            return
+
+        where, params = locations.scope_filter("ac.equipmentid", self.scope_combo.path())
+        cursor = self.reads.cursor()
+        cursor.execute(
+            CERTIFICATE_SQL.format(where=where + " AND (ac.acceptancecertificateid = ANY(%s) "
+                                                 "OR ac.equipmentid = ANY(%s) OR ac.supplierid = ANY(%s))"),
+            params + (sorted(act_ids), sorted(equipment_ids), sorted(supplier_ids)))
+        rows = list(map(CertificateRow._make, cursor.fetchall()))
+        self.conn.commit()
+        # Акты перенесенного в другой участок оборудования убираются
+        if equipment_ids:
+            act_ids = act_ids | {record.acceptancecertificateid for record in self.model.records
+                                 if record.equipmentid in equipment_ids}
+        self.model.merge_rows(rows, removed=act_ids - {row.acceptancecertificateid for row in rows})
+
+    def change_scope(self):
+        """Переход к другому поддереву иерархии"""
+        self.load_equipment()
+        self.load_data()
+
     def show_add_dialog(self):
         """Диалог добавления нового акта приемки"""
         dialog = QDialog(self)
@@ -289,7 +311,7 @@ class AcceptanceCertificateApp(QMainWindow):
             # Получаем данные из формы
             equip_id = equipment_combo.currentData()
             supplier_id = supplier_combo.currentData()
-            date = date_input.date().toString("yyyy-MM-dd")
+            date = date_input.date().toPyDate()
 
             # Валидация данных
             if not all([equip_id, supplier_id, date]):
@@ -306,25 +328,12 @@ class AcceptanceCertificateApp(QMainWindow):
 
                 new_id = self.cursor.fetchone()[0]
                 self.conn.commit()
+                self.reads.wrote()
 
-                # Добавляем новую строку в таблицу
-                row_pos = self.table.rowCount()
-                self.table.insertRow(row_pos)
-
-                # Получаем названия для отображения
+                # Новая строка встает на свое место по дате приемки
                 equip_name = equipment_combo.currentText()
                 supplier_name = supplier_combo.currentText()
-
-                # Заполняем таблицу
-                columns = [
-                    str(new_id), str(equip_id), equip_name,
-                    date_input.date().toString("dd.MM.yyyy"), supplier_name
-                ]
-
-                for col_idx, value in enumerate(columns):
-                    item = QTableWidgetItem(value)
-                    item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-                    self.table.setItem(row_pos, col_idx, item)
+                self.model.insert_row(CertificateRow(new_id, equip_id, equip_name, date, supplier_name))
 
                 dialog.close()
 
@@ -339,17 +348,14 @@ class AcceptanceCertificateApp(QMainWindow):
 
     def show_edit_dialog(self):
         """Диалог редактирования акта приемки"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите акт приемки для редактирования")
             return
 
-        row = selected_items[0].row()
-        cert_id = int(self.table.item(row, 0).text())
-        equip_id = int(self.table.item(row, 1).text())
-        current_equip_name = self.table.item(row, 2).text()
-        current_date = QDate.fromString(self.table.item(row, 3).text(), "dd.MM.yyyy")
-        current_supplier_name = self.table.item(row, 4).text()
+        record = self.model.row(row)
+        cert_id, equip_id = record.acceptancecertificateid, record.equipmentid
+        current_date = QDate(record.dateofrecovery) if record.dateofrecovery is not None else QDate.currentDate()
 
         # Получаем текущий supplier_id из БД
         try:
@@ -411,7 +417,7 @@ class AcceptanceCertificateApp(QMainWindow):
             # Получаем данные из формы
             new_equip_id = equipment_combo.currentData()
             new_supplier_id = supplier_combo.currentData()
-            new_date = date_input.date().toString("yyyy-MM-dd")
+            new_date = date_input.date().toPyDate()
 
             # Валидация данных
             if not all([new_equip_id, new_supplier_id, new_date]):
@@ -428,15 +434,14 @@ class AcceptanceCertificateApp(QMainWindow):
                     (new_equip_id, new_date, new_supplier_id, cert_id))
 
                 self.conn.commit()
+                self.reads.wrote()
 
                 # Обновляем таблицу
                 new_equip_name = equipment_combo.currentText()
                 new_supplier_name = supplier_combo.currentText()
 
-                self.table.item(row, 1).setText(str(new_equip_id))
-                self.table.item(row, 2).setText(new_equip_name)
-                self.table.item(row, 3).setText(date_input.date().toString("dd.MM.yyyy"))
-                self.table.item(row, 4).setText(new_supplier_name)
+                self.model.update_row(row, CertificateRow(
+                    cert_id, new_equip_id, new_equip_name, new_date, new_supplier_name))
 
                 dialog.close()
 
@@ -451,15 +456,13 @@ class AcceptanceCertificateApp(QMainWindow):
 
     def delete_certificate(self):
         """Удаление выбранного акта приемки"""
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        row = selected_row(self.table)
+        if row is None:
             QMessageBox.warning(self, "Ошибка", "Выберите акт приемки для удаления")
             return
 
-        row = selected_items[0].row()
-        cert_id = int(self.table.item(row, 0).text())
-        equip_name = self.table.item(row, 2).text()
-        date = self.table.item(row, 3).text()
+        record = self.model.row(row)
+        cert_id, equip_name, date = record.acceptancecertificateid, record.equipment, format_date(record.dateofrecovery)
 
         reply = QMessageBox.question(
             self, "Подтверждение",
@@ -472,13 +475,111 @@ class AcceptanceCertificateApp(QMainWindow):
                     "DELETE FROM acceptancecertificate WHERE acceptancecertificateid = %s",
                     (cert_id,))
                 self.conn.commit()
-                self.table.removeRow(row)
+                self.reads.wrote()
+                self.model.remove_row(row)
             except Exception as e:
                 self.conn.rollback()
                 QMessageBox.critical(self, "Ошибка", f"Не удалось удалить акт приемки:\n{str(e)}")
 
+    def print_act(self):
+        """Печать выбранного акта приемки в PDF"""
+        import documents
+
+        row = selected_row(self.table)
+        if row is None:
+            QMessageBox.warning(self, "Ошибка", "Выберите акт приемки для печати")
+            return
+
+        act_id = self.model.row(row).acceptancecertificateid
+
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Сохранить акт приемки", f"akt_priemki_{act_id:06d}.pdf", "PDF (*.pdf)")
+        if not path:
+            return
+
+        try:
+            found = documents.render_single(self.reads.cursor(), 'acceptance', act_id, path)
+            self.conn.commit()
+            if not found:
+                QMessageBox.warning(self, "Ошибка", "Акт приемки не найден в базе")
+        except Exception as e:
+            self.conn.rollback()
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сформировать акт приемки:\n{str(e)}")
+
+    def print_batch(self):
+        """Пакетная печать актов приемки за период в ZIP-архив"""
+        import documents
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Печать актов приемки за период")
+        dialog.setFixedSize(400, 220)
+
+        layout = QFormLayout(dialog)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        today = QDate.currentDate()
+        date_from_input = QDateEdit(QDate(today.year(), today.month(), 1))
+        date_from_input.setCalendarPopup(True)
+        date_from_input.setDisplayFormat("dd.MM.yyyy")
+
+        date_to_input = QDateEdit(today)
+        date_to_input.setCalendarPopup(True)
+        date_to_input.setDisplayFormat("dd.MM.yyyy")
+
+        btn_box = QHBoxLayout()
+        btn_box.setSpacing(10)
+
+        ok_btn = QPushButton("Сформировать")
+        cancel_btn = QPushButton("Отмена")
+
+        btn_box.addWidget(ok_btn)
+        btn_box.addWidget(cancel_btn)
+
+        layout.addRow("С:", date_from_input)
+        layout.addRow("По:", date_to_input)
+        layout.addRow(btn_box)
+
+        def render():
+            date_from = date_from_input.date()
+            date_to = date_to_input.date()
+            if date_from > date_to:
+                QMessageBox.warning(dialog, "Ошибка", "Начало периода позже окончания")
+                return
+
+            path, _ = QFileDialog.getSaveFileName(
+                dialog, "Сохранить архив",
+                f"akt_priemki_{date_from.toString('yyyyMMdd')}_{date_to.toString('yyyyMMdd')}.zip",
+                "ZIP (*.zip)")
+            if not path:
+                return
+
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                count = documents.render_batch(
+                    self.reads.cursor(), 'acceptance',
+                    date_from.toPyDate(), date_to.toPyDate(), path)
+                self.conn.commit()
+            except Exception as e:
+                QApplication.restoreOverrideCursor()
+                self.conn.rollback()
+                QMessageBox.critical(dialog, "Ошибка", f"Не удалось сформировать архив:\n{str(e)}")
+                return
+            QApplication.restoreOverrideCursor()
+
+            QMessageBox.information(dialog, "Готово", f"Сформировано документов: {count}")
+            dialog.close()
+
+        ok_btn.clicked.connect(render)
+        cancel_btn.clicked.connect(dialog.close)
+
+        dialog.exec()
+
     def closeEvent(self, event):
         """Обработчик закрытия окна"""
+        self.refresher.set_enabled(False)
+        if self.reads:
+            self.reads.close()
         if self.cursor:
             self.cursor.close()
         if self.conn:
@@ -487,8 +588,10 @@ class AcceptanceCertificateApp(QMainWindow):
 
 
 if __name__ == "__main__":
+    startup.mark("импорт")
     app = QApplication(sys.argv)
-    app.setStyle("Fusion")
+    theme.apply(app)
     window = AcceptanceCertificateApp()
     window.show()
+    startup.mark("окно")
     sys.exit(app.exec())
\ No newline at end of file
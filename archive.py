@@ -0,0 +1,217 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import database
+
+
+# Таблицы с мягким удалением: первичный ключ, условие, при котором
+# удаленную строку можно перенести в архив (на нее больше никто не ссылается),
+# и подчиненные таблицы (таблица, столбец ссылки), строки которых переносятся
+# в архив той же пачкой: иначе они остались бы без основной строки или были
+# бы удалены каскадно без копии
+TABLES = {
+    'repair': {
+        'pk': 'repairid',
+        'movable': "TRUE",
+        'children': [('repair_part', 'repairid')],
+    },
+    'equipment': {
+        'pk': 'equipmentid',
+        'movable': """
+            NOT EXISTS (SELECT 1 FROM repair r WHERE r.equipmentid = t.equipmentid)
+            AND NOT EXISTS (SELECT 1 FROM writeoffact w WHERE w.equipmentid = t.equipmentid)
+            AND NOT EXISTS (SELECT 1 FROM acceptancecertificate a WHERE a.equipmentid = t.equipmentid)
+        """,
+        'children': [(child, 'equipmentid') for child in (
+            'maintenance_plan', 'equipment_meter', 'equipment_status_history',
+            'equipment_availability', 'equipment_score')],
+    },
+}
+
+SCHEMA_SQL = """
+    ALTER TABLE equipment ADD COLUMN IF NOT EXISTS deleted_at timestamptz;
+    ALTER TABLE repair ADD COLUMN IF NOT EXISTS deleted_at timestamptz;
+"""
+
+# Частичные индексы покрывают только действующие строки, поэтому удаленные
+# не увеличивают индексы рабочих запросов; отдельные индексы по deleted_at
+# содержат только удаленные строки и нужны архивации. Индексы рабочих таблиц
+# (имя, таблица, определение) строит migrate.py без блокировки записи.
+INDEXES = [
+    ('equipment_active_idx', 'equipment', "(equipmentid) WHERE deleted_at IS NULL"),
+    ('equipment_active_name_idx', 'equipment', "(name) WHERE deleted_at IS NULL"),
+    ('repair_active_date_idx', 'repair', "(repairdate) WHERE deleted_at IS NULL"),
+    ('repair_active_equipment_idx', 'repair', "(equipmentid, repairstatusid) WHERE deleted_at IS NULL"),
+    ('equipment_deleted_idx', 'equipment', "(deleted_at) WHERE deleted_at IS NOT NULL"),
+    ('repair_deleted_idx', 'repair', "(deleted_at) WHERE deleted_at IS NOT NULL"),
+]
+
+# Перенос одной пачки: строки блокируются с SKIP LOCKED, поэтому занятые
+# пользователями строки пропускаются до следующего запуска
+MOVE_SQL = """
+    WITH batch AS (
+        SELECT t.{pk} FROM {table} t
+        WHERE t.deleted_at < %s AND {movable}
+        ORDER BY t.deleted_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ),
+    moved AS (
+        DELETE FROM {table} t USING batch b
+        WHERE t.{pk} = b.{pk}
+        RETURNING t.*
+    ){children}
+    INSERT INTO {table}_archive ({columns}, archived_at)
+    SELECT {columns}, now() FROM moved
+"""
+
+# Перенос строк подчиненной таблицы, относящихся к пачке
+CHILD_SQL = """,
+    moved_{child} AS (
+        DELETE FROM {child} c USING batch b
+        WHERE c.{column} = b.{pk}
+        RETURNING c.*
+    ),
+    archived_{child} AS (
+        INSERT INTO {child}_archive ({columns}, archived_at)
+        SELECT {columns}, now() FROM moved_{child}
+    )"""
+
+
+def ensure_schema(cursor):
+    """Добавление столбцов deleted_at, если их еще нет"""
+    cursor.execute("""
+        SELECT count(*) FROM pg_attribute
+        WHERE attrelid IN ('equipment'::regclass, 'repair'::regclass)
+          AND attname = 'deleted_at' AND NOT attisdropped
+    """)
+    if cursor.fetchone()[0] < len(TABLES):
+        cursor.execute(SCHEMA_SQL)
+
+
+def _has_parts(cursor):
+    """Установлен ли склад запчастей (parts.py)"""
+    cursor.execute("SELECT to_regclass('repair_part') IS NOT NULL")
+    return cursor.fetchone()[0]
+
+
+def soft_delete_equipment(cursor, equipment_id):
+    """Пометка оборудования и его ремонтов удаленными (история сохраняется).
+
+    Резерв запчастей под удаляемые ремонты снимается в той же транзакции,
+    как при удалении одного ремонта (repairs.delete).
+    """
+    cursor.execute(
+        "UPDATE repair SET deleted_at = now() WHERE equipmentid = %s AND deleted_at IS NULL "
+        "RETURNING repairid",
+        (equipment_id,))
+    repair_ids = [repair_id for repair_id, in cursor.fetchall()]
+    if repair_ids and _has_parts(cursor):
+        # parts.py сам импортирует archive, поэтому импорт по месту
+        import parts
+        cursor.execute(
+            "SELECT DISTINCT repairid FROM repair_part WHERE repairid = ANY(%s) AND state = 'reserved'",
+            (repair_ids,))
+        for repair_id, in cursor.fetchall():
+            for sql, params in parts.finish_statements(repair_id, 'Отменён'):
+                cursor.execute(sql, params)
+    cursor.execute(
+        "UPDATE equipment SET deleted_at = now() WHERE equipmentid = %s AND deleted_at IS NULL",
+        (equipment_id,))
+
+
+SOFT_DELETE_REPAIR_SQL = "UPDATE repair SET deleted_at = now() WHERE repairid = %s AND deleted_at IS NULL"
+
+
+def soft_delete_repair(cursor, repair_id):
+    """Пометка записи о ремонте удаленной"""
+    cursor.execute(SOFT_DELETE_REPAIR_SQL, (repair_id,))
+
+
+def _columns(cursor, table):
+    cursor.execute("""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0
+          AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+    """, (table,))
+    return cursor.fetchall()
+
+
+def ensure_archive_table(cursor, table):
+    """Создание архивной таблицы и добавление в нее новых столбцов основной"""
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {table}_archive "
+        f"(LIKE {table}, archived_at timestamptz NOT NULL DEFAULT now())")
+    existing = {name for name, _ in _columns(cursor, f"{table}_archive")}
+    columns = _columns(cursor, table)
+    for name, type_name in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table}_archive ADD COLUMN {name} {type_name}")
+    return [name for name, _ in columns]
+
+
+def archive_table(conn, table, before, batch_size=1000, pause=0.1, max_batches=None):
+    """Перенос удаленных до даты before строк в архив пачками.
+
+    Каждая пачка - отдельная короткая транзакция с ограничением ожидания
+    блокировок, так что рабочие таблицы не блокируются надолго.
+    Возвращает количество перенесенных строк.
+    """
+    config = TABLES[table]
+    children = ""
+    with conn, conn.cursor() as cursor:
+        columns = ", ".join(ensure_archive_table(cursor, table))
+        for child, column in config['children']:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (child,))
+            if cursor.fetchone()[0]:
+                children += CHILD_SQL.format(
+                    child=child, column=column, pk=config['pk'],
+                    columns=", ".join(ensure_archive_table(cursor, child)))
+    sql = MOVE_SQL.format(table=table, pk=config['pk'], movable=config['movable'],
+                          columns=columns, children=children)
+
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = '2s'")
+            # В журнал аудита перенос пишется действием ARCHIVE (audit.py)
+            cursor.execute(sql, (before, batch_size))
+            moved = cursor.rowcount
+        total += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        time.sleep(pause)
+    return total
+
+
+def run(conn, older_than_days=30, batch_size=1000, pause=0.1):
+    """Архивация всех таблиц: сначала ремонты, затем освободившееся оборудование"""
+    before = datetime.now().astimezone() - timedelta(days=older_than_days)
+    return {table: archive_table(conn, table, before, batch_size, pause) for table in TABLES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос удаленных записей в архивные таблицы")
+    parser.add_argument('--older-than-days', type=int, default=30,
+                        help="Переносить строки, удаленные раньше этого числа дней назад")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--pause', type=float, default=0.1, help="Пауза между пачками, с")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+        for table, moved in run(conn, args.older_than_days, args.batch_size, args.pause).items():
+            print(f"{table}: перенесено в архив {moved}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import getpass
+import json
+from datetime import datetime, timedelta
+
+import database
+
+
+# Аудируемые таблицы и их первичные ключи
+TABLES = {
+    'equipment': 'equipmentid',
+    'repair': 'repairid',
+    'writeoffact': 'writeoffactid',
+    'supplier': 'supplierid',
+    'acceptancecertificate': 'acceptancecertificateid',
+}
+
+# Журнал только дописывается, поэтому строки лежат на диске в порядке
+# времени и BRIN-индекса по changed_at хватает для выборки по периоду;
+# B-tree индексов нет, чтобы запись в журнал почти ничего не стоила.
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS audit_log (
+        id bigint GENERATED ALWAYS AS IDENTITY,
+        changed_at timestamptz NOT NULL DEFAULT clock_timestamp(),
+        table_name text NOT NULL,
+        row_pk text,
+        action text NOT NULL,
+        username text NOT NULL,
+        old_data jsonb,
+        new_data jsonb
+    ) WITH (fillfactor = 100);
+    CREATE INDEX IF NOT EXISTS audit_log_changed_at_brin
+        ON audit_log USING BRIN (changed_at) WITH (pages_per_range = 32);
+
+    CREATE OR REPLACE FUNCTION audit_row() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        old_data jsonb;
+        new_data jsonb;
+        action text := TG_OP;
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            old_data := to_jsonb(OLD) - 'reason_tsv';
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            new_data := to_jsonb(NEW) - 'reason_tsv';
+        END IF;
+        IF TG_OP = 'UPDATE' AND old_data = new_data THEN
+            RETURN NULL;
+        END IF;
+        -- Строку, помеченную удаленной, физически удаляет только перенос
+        -- в архив (archive.py); он пишется в журнал отдельным действием
+        IF TG_OP = 'DELETE' AND old_data ->> 'deleted_at' IS NOT NULL THEN
+            action := 'ARCHIVE';
+        END IF;
+
+        INSERT INTO audit_log (table_name, row_pk, action, username, old_data, new_data)
+        VALUES (TG_ARGV[0], coalesce(new_data, old_data) ->> TG_ARGV[1], action,
+                coalesce(nullif(current_setting('audit.user', true), ''), session_user),
+                old_data, new_data);
+        RETURN NULL;
+    END
+    $$;
+
+    CREATE OR REPLACE FUNCTION audit_log_append_only() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        RAISE EXCEPTION 'Журнал аудита доступен только для добавления записей';
+    END
+    $$;
+    DROP TRIGGER IF EXISTS audit_log_append_only ON audit_log;
+    CREATE TRIGGER audit_log_append_only
+        BEFORE UPDATE OR DELETE OR TRUNCATE ON audit_log
+        FOR EACH STATEMENT EXECUTE FUNCTION audit_log_append_only();
+"""
+
+# Выборка за период: условие по диапазону времени использует BRIN-индекс
+PAGE_SQL = """
+    SELECT id, changed_at, table_name, row_pk, action, username, old_data, new_data
+    FROM audit_log
+    WHERE changed_at >= %s AND changed_at < %s
+      {filter}
+    ORDER BY changed_at DESC, id DESC
+    LIMIT %s
+"""
+
+ACTIONS = {
+    'INSERT': "Добавление",
+    'UPDATE': "Изменение",
+    'DELETE': "Удаление",
+    'ARCHIVE': "Перенос в архив",
+}
+
+
+def current_user():
+    """Имя пользователя ОС для журнала аудита"""
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
+def connect_options():
+    """Параметр подключения с именем пользователя для триггеров аудита.
+
+    Передается при установке соединения, без отдельного запроса.
+    """
+    user = current_user().replace("\\", "\\\\").replace(" ", "\\ ")
+    return f"-c audit.user={user}" if user else ""
+
+
+def install_trigger(cursor, table):
+    """Подключение триггера аудита к таблице"""
+    cursor.execute(f"DROP TRIGGER IF EXISTS audit_trigger ON {table}")
+    cursor.execute(
+        f"CREATE TRIGGER audit_trigger AFTER INSERT OR UPDATE OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION audit_row('{table}', '{TABLES[table]}')")
+
+
+def is_installed(cursor):
+    cursor.execute("SELECT to_regprocedure('audit_row()') IS NOT NULL")
+    return cursor.fetchone()[0]
+
+
+def ensure_schema(cursor):
+    """Создание журнала аудита и триггеров на таблицах, где их еще нет"""
+    cursor.execute(SCHEMA_SQL)
+    for table in database.missing_triggers(cursor, TABLES, 'audit_trigger'):
+        install_trigger(cursor, table)
+
+
+def fetch_period(cursor, start, end, table=None, limit=1000):
+    """Записи журнала за период [start, end), новые первыми"""
+    if table:
+        cursor.execute(PAGE_SQL.format(filter="AND table_name = %s"), (start, end, table, limit))
+    else:
+        cursor.execute(PAGE_SQL.format(filter=""), (start, end, limit))
+    return cursor.fetchall()
+
+
+def describe_changes(action, old_data, new_data):
+    """Краткое описание изменения: поля со старым и новым значением"""
+    if action == 'INSERT':
+        return ", ".join(f"{key}={value}" for key, value in (new_data or {}).items())
+    if action in ('DELETE', 'ARCHIVE'):
+        return ", ".join(f"{key}={value}" for key, value in (old_data or {}).items())
+    old_data, new_data = old_data or {}, new_data or {}
+    return ", ".join(
+        f"{key}: {old_data.get(key)} → {value}"
+        for key, value in new_data.items() if old_data.get(key) != value)
+
+
+def format_json(data):
+    """JSON строки для просмотра"""
+    if data is None:
+        return ""
+    return json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def day_bounds(day):
+    """Границы суток для постраничного просмотра"""
+    return day, day + timedelta(days=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Журнал аудита изменений")
+    sub = parser.add_subparsers(dest='command', required=True)
+    tail_parser = sub.add_parser('tail', help="Показать последние изменения")
+    tail_parser.add_argument('--limit', type=int, default=20)
+    tail_parser.add_argument('--days', type=int, default=7, help="Глубина просмотра в днях")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'tail':
+                now = datetime.now().astimezone()
+                rows = fetch_period(cursor, now - timedelta(days=args.days), now, limit=args.limit)
+                for _, changed_at, table, pk, action, user, old_data, new_data in rows:
+                    print(f"{changed_at:%Y-%m-%d %H:%M:%S} {user:<12} {ACTIONS.get(action, action):<10} "
+                          f"{table}#{pk}: {describe_changes(action, old_data, new_data)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
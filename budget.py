@@ -0,0 +1,271 @@
+import argparse
+import io
+import time
+from collections import namedtuple
+from datetime import date
+
+import database
+
+
+# Помесячные суммы ремонтов по оборудованию. Группировка выполняется в БД,
+# в клиент через COPY передается по строке на оборудование и месяц;
+# месяц - сквозной номер (год * 12 + месяц - 1)
+HISTORY_SQL = """
+    COPY (
+        SELECT r.equipmentid,
+               (extract(year FROM r.repairdate) * 12 + extract(month FROM r.repairdate) - 1)::integer,
+               sum(r.repairprice)::double precision
+        FROM repair r
+        JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+        WHERE rs.statusname <> 'Отменён' AND r.deleted_at IS NULL
+          AND r.repairdate >= %s AND r.repairprice IS NOT NULL
+        GROUP BY 1, 2
+    ) TO STDOUT WITH (FORMAT csv)
+"""
+
+# Действующее оборудование с группой (поставщик по первому акту приемки)
+# и признаком списания
+EQUIPMENT_SQL = """
+    COPY (
+        SELECT e.equipmentid, s.suppliername,
+               EXISTS (SELECT 1 FROM writeoffact w WHERE w.equipmentid = e.equipmentid)
+        FROM equipment e
+        LEFT JOIN LATERAL (
+            SELECT ac.supplierid FROM acceptancecertificate ac
+            WHERE ac.equipmentid = e.equipmentid
+            ORDER BY ac.dateofrecovery
+            LIMIT 1
+        ) a ON TRUE
+        LEFT JOIN supplier s ON s.supplierid = a.supplierid
+        WHERE e.deleted_at IS NULL
+        ORDER BY e.equipmentid
+    ) TO STDOUT WITH (FORMAT csv)
+"""
+
+NO_GROUP = "Без поставщика"
+HISTORY_YEARS = 10
+# Окно для средней стоимости ремонтов оборудования и тренда, месяцев
+LOOKBACK_MONTHS = 36
+# Сезонность оценивается, только если истории хватает на два года
+MIN_SEASON_MONTHS = 24
+# Ограничение месячного тренда, чтобы короткая история не давала взрывного роста
+MAX_MONTHLY_GROWTH = 0.02
+
+# Сценарий «что если»: списать N самых дорогих в ремонте единиц, годовой рост
+# цен в процентах сверх тренда, исключить группы оборудования
+Scenario = namedtuple(
+    'Scenario', 'writeoff_top price_growth exclude_groups', defaults=(0, 0.0, ()))
+BASELINE = Scenario()
+
+# Результат прогноза: помесячные суммы по группам (DataFrame, строки -
+# месяцы, столбцы - группы), прогноз по оборудованию и списанные сценарием
+Projection = namedtuple('Projection', 'monthly equipment removed')
+
+
+def _copy(cursor, sql, params=()):
+    buffer = io.StringIO()
+    cursor.copy_expert(cursor.mogrify(sql, params).decode(), buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+class Forecast:
+    """Прогноз расходов на ремонт по помесячной истории.
+
+    Модель разделимая: средняя стоимость ремонтов единицы оборудования в месяц
+    за последние LOOKBACK_MONTHS (без сезонности) умножается на общий для
+    парка множитель месяца - сезонность, линейный тренд и рост цен. Поэтому
+    прогноз по группе - это сумма ставок группы на вектор множителей,
+    и матрица «оборудование x месяцы» не строится. Все расчеты - операции
+    NumPy над массивами по всему парку.
+
+    Результаты кэшируются по сценарию и горизонту.
+    """
+
+    def __init__(self, equipment, history, today=None):
+        import numpy as np
+        import pandas as pd
+
+        self.current = month_index(today or date.today())
+        self.ids = equipment['equipmentid'].to_numpy()
+        self.codes, groups = pd.factorize(equipment['group'].fillna(NO_GROUP), sort=True)
+        self.groups = list(groups)
+        written_off = equipment['written_off'].to_numpy(dtype=bool)
+
+        # Только полные месяцы и только действующее оборудование
+        months = history['month'].to_numpy()
+        amounts = history['amount'].to_numpy(dtype=float)
+        positions = np.searchsorted(self.ids, history['equipmentid'].to_numpy())
+        known = positions < len(self.ids)
+        known[known] = self.ids[positions[known]] == history['equipmentid'].to_numpy()[known]
+        mask = known & (months < self.current)
+        months, amounts, positions = months[mask], amounts[mask], positions[mask]
+
+        first = months.min() if len(months) else self.current - 1
+        length = self.current - first
+        fleet = np.bincount(months - first, weights=amounts, minlength=length)
+        self.history = pd.Series(fleet, index=self._labels(first, length))
+
+        # Сезонность: средняя сумма по календарному месяцу относительно общей средней
+        self.season = np.ones(12)
+        calendar = (first + np.arange(length)) % 12
+        if length >= MIN_SEASON_MONTHS and fleet.sum() > 0:
+            per_month = np.bincount(calendar, weights=fleet, minlength=12) / np.bincount(calendar, minlength=12)
+            self.season = np.where(per_month > 0, per_month / per_month.mean(), 1.0)
+
+        # Тренд: наклон прямой по очищенным от сезонности суммам окна
+        # относительно уровня последнего полного месяца
+        self.growth = 0.0
+        window = min(LOOKBACK_MONTHS, length)
+        series = fleet[-window:] / self.season[calendar[-window:]]
+        if np.count_nonzero(series) >= 6:
+            slope, intercept = np.polyfit(np.arange(window), series, 1)
+            level = intercept + slope * (window - 1)
+            if level > 0:
+                self.growth = float(np.clip(slope / level, -MAX_MONTHLY_GROWTH, MAX_MONTHLY_GROWTH))
+
+        # Ставка оборудования: средняя сумма в месяц за окно без сезонности
+        recent = months >= self.current - LOOKBACK_MONTHS
+        self.rates = np.bincount(
+            positions[recent], weights=amounts[recent] / self.season[months[recent] % 12],
+            minlength=len(self.ids)) / LOOKBACK_MONTHS
+        # Списанное оборудование больше не ремонтируется
+        self.rates[written_off] = 0.0
+
+        self._projections = {}
+
+    @staticmethod
+    def _labels(first, length):
+        import pandas as pd
+        return pd.period_range(
+            pd.Period(year=first // 12, month=first % 12 + 1, freq='M'), periods=length, freq='M')
+
+    def factors(self, horizon, price_growth=0.0):
+        """Множители месяцев прогноза начиная с текущего месяца"""
+        import numpy as np
+        steps = np.arange(1, horizon + 1)
+        months = self.current - 1 + steps
+        trend = np.clip(1.0 + self.growth * steps, 0.0, None)
+        prices = (1.0 + price_growth / 100.0) ** (steps / 12.0)
+        return self.season[months % 12] * trend * prices
+
+    def project(self, scenario=BASELINE, horizon=12):
+        """Прогноз по сценарию на horizon месяцев (кэшируется)"""
+        key = (scenario, horizon)
+        if key not in self._projections:
+            self._projections[key] = self._project(scenario, horizon)
+        return self._projections[key]
+
+    def _project(self, scenario, horizon):
+        import numpy as np
+        import pandas as pd
+
+        rates = self.rates.copy()
+        if scenario.exclude_groups:
+            excluded = [self.groups.index(g) for g in scenario.exclude_groups if g in self.groups]
+            rates[np.isin(self.codes, excluded)] = 0.0
+
+        removed = np.array([], dtype=self.ids.dtype)
+        top = min(scenario.writeoff_top, np.count_nonzero(rates))
+        if top > 0:
+            costliest = np.argpartition(-rates, top - 1)[:top]
+            removed = self.ids[costliest]
+            rates[costliest] = 0.0
+
+        factors = self.factors(horizon, scenario.price_growth)
+        group_rates = np.bincount(self.codes, weights=rates, minlength=len(self.groups))
+        monthly = pd.DataFrame(
+            np.outer(factors, group_rates),
+            index=self._labels(self.current, horizon), columns=self.groups)
+        equipment = pd.DataFrame({
+            'equipmentid': self.ids,
+            'group': np.asarray(self.groups, dtype=object)[self.codes],
+            'projected': rates * factors.sum(),
+        })
+        return Projection(monthly, equipment, removed)
+
+
+def fetch(cursor, years=HISTORY_YEARS):
+    """Выгрузка оборудования и помесячной истории ремонтов в DataFrame"""
+    import pandas as pd
+
+    today = date.today()
+    since = date(today.year - years, today.month, 1)
+    history = pd.read_csv(
+        _copy(cursor, HISTORY_SQL, (since,)), header=None,
+        names=['equipmentid', 'month', 'amount'],
+        dtype={'equipmentid': 'int64', 'month': 'int64', 'amount': 'float64'})
+    equipment = pd.read_csv(
+        _copy(cursor, EQUIPMENT_SQL), header=None, names=['equipmentid', 'group', 'written_off'],
+        dtype={'equipmentid': 'int64', 'group': 'object'},
+        keep_default_na=False, na_values={'group': ['']},
+        true_values=['t'], false_values=['f'])
+    return equipment, history
+
+
+def load(cursor, years=HISTORY_YEARS):
+    """Прогноз по текущим данным"""
+    return Forecast(*fetch(cursor, years))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Прогноз расходов на ремонт оборудования")
+    parser.add_argument('--horizon', type=int, default=12, help="Горизонт прогноза, месяцев")
+    parser.add_argument('--years', type=int, default=HISTORY_YEARS, help="Глубина истории, лет")
+    parser.add_argument('--writeoff-top', type=int, default=0,
+                        help="Сценарий: списать N самых дорогих в ремонте единиц")
+    parser.add_argument('--price-growth', type=float, default=0.0,
+                        help="Сценарий: рост цен на ремонт, %% в год")
+    parser.add_argument('--exclude', action='append', default=[], metavar='GROUP',
+                        help="Сценарий: исключить группу (поставщика)")
+    parser.add_argument('--by-group', action='store_true', help="Показать прогноз по группам")
+    parser.add_argument('--csv', help="Сохранить помесячный прогноз сценария в CSV")
+    args = parser.parse_args()
+
+    # Выгрузка через copy_expert - API psycopg2
+    conn = database.connect(driver='psycopg2')
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            started = time.perf_counter()
+            forecast = load(cursor, args.years)
+            loaded = time.perf_counter()
+    finally:
+        conn.close()
+
+    scenario = Scenario(args.writeoff_top, args.price_growth, tuple(args.exclude))
+    baseline = forecast.project(BASELINE, args.horizon)
+    result = forecast.project(scenario, args.horizon)
+    finished = time.perf_counter()
+
+    base_total = baseline.monthly.sum(axis=1)
+    total = result.monthly.sum(axis=1)
+    print(f"{'Месяц':<10}{'Базовый':>16}{'Сценарий':>16}{'Разница':>16}")
+    for month in total.index:
+        print(f"{str(month):<10}{base_total[month]:>16,.2f}{total[month]:>16,.2f}"
+              f"{total[month] - base_total[month]:>16,.2f}")
+    print(f"{'Итого':<10}{base_total.sum():>16,.2f}{total.sum():>16,.2f}"
+          f"{total.sum() - base_total.sum():>16,.2f}")
+
+    if args.by_group:
+        print()
+        for group, amount in result.monthly.sum().sort_values(ascending=False).items():
+            print(f"{group:<40}{amount:>16,.2f}")
+
+    if len(result.removed):
+        print(f"\nСписано сценарием: {len(result.removed)} ед., "
+              f"коды: {', '.join(map(str, result.removed[:20]))}{' ...' if len(result.removed) > 20 else ''}")
+
+    if args.csv:
+        result.monthly.assign(Итого=total).to_csv(args.csv, encoding='utf-8-sig')
+
+    print(f"\nЗагрузка {loaded - started:.2f} с, расчет {finished - loaded:.2f} с, "
+          f"тренд {forecast.growth * 100:+.2f} %/мес")
+
+
+if __name__ == "__main__":
+    main()
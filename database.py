@@ -0,0 +1,109 @@
+import os
+
+
+# Параметры подключения к базе данных учета оборудования
+DB_PARAMS = {
+    'dbname': 'kurs',
+    'user': 'postgres',
+    'password': '123',
+    'host': 'localhost',
+}
+
+# Реплики для чтения списков и справочников: "host[:port],host[:port]"
+# (переменная окружения KURS_DB_REPLICAS). Без реплик все запросы идут
+# на основной сервер, см. replicas.py.
+REPLICAS = [address.strip() for address in os.environ.get('KURS_DB_REPLICAS', '').split(',')
+            if address.strip()]
+
+# Драйвер БД: psycopg2 или psycopg (psycopg 3 с подготовленными на сервере
+# запросами и конвейерным режимом, см. repairs.py). Выбирается переменной
+# окружения KURS_DB_DRIVER; модули, которым нужен API psycopg2 (COPY,
+# execute_values), указывают драйвер явно.
+DRIVER = os.environ.get('KURS_DB_DRIVER', 'psycopg2')
+
+# psycopg 3 готовит запрос на сервере со второго выполнения и хранит
+# подготовленные запросы в кэше соединения. Разовые скрипты схемы (в том
+# числе из нескольких команд) выполняются один раз и не готовятся.
+PREPARE_THRESHOLD = 1
+PREPARED_MAX = 200
+
+# Версия схемы БД, с которой работают окна и пакетные задания. Схему
+# создает и обновляет только python migrate.py; при изменении шагов
+# миграции номер увеличивается.
+SCHEMA_VERSION = 6
+
+
+def connect(driver=None, **overrides):
+    """Подключение к базе данных с параметрами по умолчанию.
+
+    Имя пользователя передается в параметрах сессии для журнала аудита.
+    """
+    from audit import connect_options
+
+    params = {**DB_PARAMS, 'options': connect_options(), **overrides}
+    if (driver or DRIVER) == 'psycopg':
+        import psycopg
+
+        conn = psycopg.connect(**params, prepare_threshold=PREPARE_THRESHOLD)
+        conn.prepared_max = PREPARED_MAX
+        return conn
+
+    import psycopg2
+
+    return psycopg2.connect(**params)
+
+
+def connect_dsn(dsn, driver=None):
+    """Подключение к другой базе по строке подключения libpq (базы заводов).
+
+    Параметры по умолчанию из DB_PARAMS не подмешиваются: используется только
+    то, что задано в строке (и переменные окружения libpq).
+    """
+    from audit import connect_options
+
+    if (driver or DRIVER) == 'psycopg':
+        import psycopg
+
+        return psycopg.connect(dsn, options=connect_options())
+
+    import psycopg2
+
+    return psycopg2.connect(dsn, options=connect_options())
+
+
+def check_schema(cursor):
+    """Проверка, что схема БД обновлена до SCHEMA_VERSION.
+
+    Сама проверка DDL не выполняет: устаревшая схема - ошибка с подсказкой
+    запустить migrate.py.
+    """
+    cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    installed = 0
+    if cursor.fetchone()[0]:
+        cursor.execute("SELECT version FROM schema_version")
+        row = cursor.fetchone()
+        installed = row[0] if row else 0
+    if installed < SCHEMA_VERSION:
+        raise RuntimeError(f"схема БД версии {installed}, требуется {SCHEMA_VERSION}: "
+                           f"выполните python migrate.py")
+
+
+def missing_triggers(cursor, tables, trigger):
+    """Существующие таблицы из списка, на которых еще нет триггера trigger.
+
+    По нему ensure_schema модулей подключают свои триггеры и к таблице,
+    пересозданной при секционировании (partitions.migrate).
+    """
+    cursor.execute("""
+        SELECT name FROM unnest(%s::text[]) AS name
+        WHERE to_regclass(name) IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_trigger t
+              WHERE t.tgrelid = to_regclass(name) AND t.tgname = %s)
+    """, (list(tables), trigger))
+    return [name for (name,) in cursor.fetchall()]
+
+
+def is_pipelined(conn):
+    """Поддерживает ли соединение конвейерный режим (psycopg 3)"""
+    return hasattr(conn, 'pipeline')
@@ -0,0 +1,297 @@
+import os
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from html import escape
+from string import Template
+
+
+# HTML-шаблоны печатных форм актов
+TEMPLATES = {
+    'writeoff': """
+        <html>
+        <body style="font-family: 'DejaVu Sans', Arial; font-size: 11pt;">
+            <p align="right">Форма ОС-4</p>
+            <h2 align="center">АКТ № $number<br>о списании объекта основных средств</h2>
+            <p align="right">Дата списания: <b>$date</b></p>
+            <table width="100%" border="1" cellspacing="0" cellpadding="6">
+                <tr><td width="35%">Наименование оборудования</td><td>$equipment</td></tr>
+                <tr><td>Инвентарный номер (ID)</td><td>$equipment_id</td></tr>
+                <tr><td>Причина списания</td><td>$reason</td></tr>
+            </table>
+            <br><br>
+            <p>Председатель комиссии: ____________________ / ____________________ /</p>
+            <p>Члены комиссии: ____________________ / ____________________ /</p>
+            <p>____________________ / ____________________ /</p>
+        </body>
+        </html>
+    """,
+    'acceptance': """
+        <html>
+        <body style="font-family: 'DejaVu Sans', Arial; font-size: 11pt;">
+            <p align="right">Форма ОС-1</p>
+            <h2 align="center">АКТ № $number<br>о приеме-передаче объекта основных средств</h2>
+            <p align="right">Дата приемки: <b>$date</b></p>
+            <table width="100%" border="1" cellspacing="0" cellpadding="6">
+                <tr><td width="35%">Наименование оборудования</td><td>$equipment</td></tr>
+                <tr><td>Инвентарный номер (ID)</td><td>$equipment_id</td></tr>
+                <tr><td>Поставщик</td><td>$supplier</td></tr>
+            </table>
+            <br><br>
+            <p>Сдал: ____________________ / ____________________ /</p>
+            <p>Принял: ____________________ / ____________________ /</p>
+        </body>
+        </html>
+    """,
+}
+
+# Запросы для выборки одного акта и актов за период
+QUERIES = {
+    'writeoff': {
+        'single': """
+            SELECT w.writeoffactid, w.equipmentid, e.name, w.writeoffdate, w.reason
+            FROM writeoffact w
+            LEFT JOIN equipment e ON w.equipmentid = e.equipmentid
+            WHERE w.writeoffactid = %s
+        """,
+        'range': """
+            SELECT w.writeoffactid, w.equipmentid, e.name, w.writeoffdate, w.reason
+            FROM writeoffact w
+            LEFT JOIN equipment e ON w.equipmentid = e.equipmentid
+            WHERE w.writeoffdate BETWEEN %s AND %s
+            ORDER BY w.writeoffdate, w.writeoffactid
+        """,
+    },
+    'acceptance': {
+        'single': """
+            SELECT ac.acceptancecertificateid, ac.equipmentid, e.name,
+                   ac.dateofrecovery, s.suppliername
+            FROM acceptancecertificate ac
+            LEFT JOIN equipment e ON ac.equipmentid = e.equipmentid
+            LEFT JOIN supplier s ON ac.supplierid = s.supplierid
+            WHERE ac.acceptancecertificateid = %s
+        """,
+        'range': """
+            SELECT ac.acceptancecertificateid, ac.equipmentid, e.name,
+                   ac.dateofrecovery, s.suppliername
+            FROM acceptancecertificate ac
+            LEFT JOIN equipment e ON ac.equipmentid = e.equipmentid
+            LEFT JOIN supplier s ON ac.supplierid = s.supplierid
+            WHERE ac.dateofrecovery BETWEEN %s AND %s
+            ORDER BY ac.dateofrecovery, ac.acceptancecertificateid
+        """,
+    },
+}
+
+FILE_PREFIXES = {
+    'writeoff': 'akt_spisaniya',
+    'acceptance': 'akt_priemki',
+}
+
+# Ссылка на QGuiApplication в рабочем процессе, чтобы его не собрал GC
+_worker_app = None
+
+
+@lru_cache(maxsize=None)
+def compile_template(kind):
+    """Компиляция шаблона печатной формы (кэшируется на процесс)"""
+    return Template(TEMPLATES[kind])
+
+
+def _format_date(value):
+    return value.strftime("%d.%m.%Y") if value is not None else ""
+
+
+def _text(value):
+    return escape(str(value)).replace("\n", "<br>") if value is not None else ""
+
+
+def build_context(kind, row):
+    """Подстановки для шаблона из строки выборки"""
+    context = {
+        'number': row[0],
+        'equipment_id': row[1] if row[1] is not None else "",
+        'equipment': _text(row[2]),
+        'date': _format_date(row[3]),
+    }
+    if kind == 'writeoff':
+        context['reason'] = _text(row[4])
+    else:
+        context['supplier'] = _text(row[4])
+    return context
+
+
+def document_filename(kind, row):
+    """Имя PDF-файла акта"""
+    return f"{FILE_PREFIXES[kind]}_{row[0]:06d}.pdf"
+
+
+def render_pdf(kind, row):
+    """Формирование PDF одного акта, возвращает содержимое файла"""
+    from PyQt6.QtCore import QBuffer, QByteArray, QIODevice
+    from PyQt6.QtGui import QPageSize, QPdfWriter, QTextDocument
+
+    html = compile_template(kind).substitute(build_context(kind, row))
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+
+    writer = QPdfWriter(buffer)
+    writer.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+    writer.setResolution(96)
+    writer.setTitle(f"Акт № {row[0]}")
+
+    document = QTextDocument()
+    document.setHtml(html)
+    document.print(writer)
+
+    del writer
+    buffer.close()
+    return bytes(data)
+
+
+def _init_worker():
+    """Инициализация рабочего процесса: Qt без дисплея и прогрев кэша шаблонов"""
+    global _worker_app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtGui import QGuiApplication
+
+    _worker_app = QGuiApplication.instance() or QGuiApplication([])
+    for kind in TEMPLATES:
+        compile_template(kind)
+
+
+def _render_chunk(kind, rows):
+    return [(document_filename(kind, row), render_pdf(kind, row)) for row in rows]
+
+
+def render_single(cursor, kind, act_id, path):
+    """Печать одного акта в PDF-файл. Возвращает False, если акт не найден"""
+    cursor.execute(QUERIES[kind]['single'], (act_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return False
+
+    with open(path, 'wb') as f:
+        f.write(render_pdf(kind, row))
+    return True
+
+
+def render_batch(cursor, kind, date_from, date_to, zip_path, workers=None, chunk_size=50):
+    """Пакетная печать актов за период в ZIP-архив.
+
+    Акты рендерятся параллельно в пуле процессов пачками по chunk_size,
+    готовые PDF записываются в архив по мере поступления. Возвращает
+    количество сформированных документов.
+    """
+    cursor.execute(QUERIES[kind]['range'], (date_from, date_to))
+
+    # spawn вместо fork: Qt не переносит копирование процесса с GUI-потоком
+    context = multiprocessing.get_context('spawn')
+    count = 0
+
+    # PDF уже сжат внутри, повторное сжатие в архиве только тратит CPU
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as archive, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                initializer=_init_worker) as pool:
+        futures = []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            futures.append(pool.submit(_render_chunk, kind, rows))
+
+        for future in as_completed(futures):
+            for name, data in future.result():
+                archive.writestr(name, data)
+                count += 1
+
+    return count
+
+
+# Этикетки: сетка на листе A4 (мм), слева QR-код, справа номер и название
+LABEL_COLUMNS = 3
+LABEL_ROWS = 8
+LABEL_MARGIN = 5
+LABEL_QR_SIZE = 27
+
+
+def qr_matrix(text):
+    """Модули QR-кода строки (список строк из bool); требуется пакет qrcode"""
+    import qrcode
+
+    code = qrcode.QRCode(border=0, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    code.add_data(text)
+    code.make(fit=True)
+    return code.get_matrix()
+
+
+def render_labels(labels, path):
+    """Печать этикеток с QR-кодами в PDF.
+
+    labels - пары (инвентарный номер, название). QR-код содержит только
+    инвентарный номер, который сканер передает в поле поиска. Возвращает
+    количество этикеток. PDF пишется во временный файл рядом с path и
+    переименовывается только после успешной печати, поэтому при ошибке
+    прежний файл не портится и пустой файл не остается.
+    """
+    import importlib
+
+    from PyQt6.QtCore import QRectF, Qt
+    from PyQt6.QtGui import QFont, QPageSize, QPainter, QPdfWriter
+
+    # Без пакета qrcode (ImportError) файл не создается вовсе
+    importlib.import_module('qrcode')
+
+    temp_path = f"{path}.tmp"
+    writer = QPdfWriter(temp_path)
+    writer.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+    writer.setResolution(300)
+    writer.setTitle("Этикетки оборудования")
+
+    mm = writer.resolution() / 25.4
+    page = writer.pageLayout().fullRectPixels(writer.resolution())
+    width = (page.width() - 2 * LABEL_MARGIN * mm) / LABEL_COLUMNS
+    height = (page.height() - 2 * LABEL_MARGIN * mm) / LABEL_ROWS
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+
+    painter = QPainter(writer)
+    painter.setPen(Qt.GlobalColor.black)
+    number_font = QFont("DejaVu Sans", 10, QFont.Weight.Bold)
+    name_font = QFont("DejaVu Sans", 8)
+    count = 0
+    try:
+        for count, (number, name) in enumerate(labels, 1):
+            position = (count - 1) % per_page
+            if position == 0 and count > 1:
+                writer.newPage()
+            left = LABEL_MARGIN * mm + position % LABEL_COLUMNS * width
+            top = LABEL_MARGIN * mm + position // LABEL_COLUMNS * height
+            padding = 3 * mm
+
+            matrix = qr_matrix(number)
+            module = LABEL_QR_SIZE * mm / len(matrix)
+            qr_top = top + (height - LABEL_QR_SIZE * mm) / 2
+            for y, line in enumerate(matrix):
+                for x, dark in enumerate(line):
+                    if dark:
+                        painter.fillRect(QRectF(left + padding + x * module, qr_top + y * module,
+                                                module, module), Qt.GlobalColor.black)
+
+            text = QRectF(left + 2 * padding + LABEL_QR_SIZE * mm, top + padding,
+                          width - 3 * padding - LABEL_QR_SIZE * mm, height - 2 * padding)
+            painter.setFont(number_font)
+            painter.drawText(text, Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft, number)
+            painter.setFont(name_font)
+            painter.drawText(text.adjusted(0, 6 * mm, 0, 0),
+                             Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft | Qt.TextFlag.TextWordWrap,
+                             name or "")
+    except BaseException:
+        painter.end()
+        os.remove(temp_path)
+        raise
+    painter.end()
+    os.replace(temp_path, path)
+    return count
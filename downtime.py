@@ -0,0 +1,438 @@
+import argparse
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import archive
+import database
+import refresh
+
+
+# Простой оборудования - интервалы ремонтов [started_at, finished_at).
+# Отметки ставит триггер при смене статуса ремонта; у старых ремонтов и
+# ремонтов, внесенных задним числом, началом считается дата ремонта, а
+# длительность завершенного ремонта без отметки - DEFAULT_REPAIR_HOURS.
+SCHEMA_SQL = """
+    ALTER TABLE repair ADD COLUMN IF NOT EXISTS started_at timestamptz;
+    ALTER TABLE repair ADD COLUMN IF NOT EXISTS finished_at timestamptz;
+
+    CREATE TABLE IF NOT EXISTS equipment_availability (
+        equipmentid integer PRIMARY KEY REFERENCES equipment (equipmentid) ON DELETE CASCADE,
+        period_hours double precision NOT NULL,
+        downtime_hours double precision NOT NULL,
+        failures integer NOT NULL,
+        mtbf_hours double precision,
+        mttr_hours double precision,
+        availability double precision NOT NULL,
+        open_repair boolean NOT NULL DEFAULT false,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS equipment_availability_idx ON equipment_availability (availability);
+    CREATE INDEX IF NOT EXISTS equipment_availability_open_idx
+        ON equipment_availability (equipmentid) WHERE open_repair;
+
+    -- Версия журнала изменений (refresh.py), до которой показатели посчитаны
+    CREATE TABLE IF NOT EXISTS equipment_availability_state (
+        id boolean PRIMARY KEY DEFAULT true CHECK (id),
+        version text NOT NULL,
+        computed_on date NOT NULL
+    );
+
+    CREATE OR REPLACE FUNCTION repair_downtime_stamps() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        status text;
+    BEGIN
+        SELECT statusname INTO status FROM repairstatus WHERE repairstatusid = NEW.repairstatusid;
+        IF TG_OP = 'INSERT' THEN
+            -- Ремонт, внесенный задним числом, начинается с даты ремонта
+            IF NEW.started_at IS NULL AND status IN ('В процессе', 'Завершён') THEN
+                NEW.started_at := CASE
+                    WHEN NEW.repairdate IS NULL OR NEW.repairdate >= current_date THEN now()
+                    ELSE NEW.repairdate::timestamptz
+                END;
+            END IF;
+        ELSIF NEW.repairstatusid IS DISTINCT FROM OLD.repairstatusid THEN
+            IF status = 'В процессе' THEN
+                NEW.started_at := coalesce(NEW.started_at, now());
+                NEW.finished_at := NULL;
+            ELSIF status = 'Завершён' THEN
+                NEW.started_at := coalesce(NEW.started_at, NEW.repairdate::timestamptz, now());
+                NEW.finished_at := coalesce(NEW.finished_at, greatest(NEW.started_at, now()));
+            ELSE
+                NEW.finished_at := NULL;
+            END IF;
+        END IF;
+        RETURN NEW;
+    END
+    $$;
+"""
+
+# Начало простоя у ремонтов, созданных до появления отметок. Заполняется
+# пачками по возрастанию repairid, каждая пачка - отдельная транзакция,
+# чтобы не блокировать всю таблицу ремонтов одной командой.
+BACKFILL_SQL = """
+    WITH batch AS (
+        SELECT r.repairid, r.repairdate
+        FROM repair r
+        JOIN repairstatus rs ON rs.repairstatusid = r.repairstatusid
+        WHERE rs.statusname IN ('В процессе', 'Завершён')
+          AND r.started_at IS NULL AND r.repairdate IS NOT NULL
+          AND r.repairid > %s
+        ORDER BY r.repairid
+        LIMIT %s
+    )
+    UPDATE repair r SET started_at = r.repairdate::timestamptz
+    FROM batch b
+    WHERE r.repairid = b.repairid AND r.repairdate = b.repairdate AND r.started_at IS NULL
+    RETURNING r.repairid
+"""
+
+# Интервалы ремонтов в секундах от эпохи; открытые ремонты берутся целиком,
+# завершенные - с запасом LOOKBACK_DAYS до начала периода расчета
+HISTORY_SQL = """
+    SELECT r.equipmentid,
+           extract(epoch FROM coalesce(r.started_at, r.repairdate::timestamptz))::float8,
+           extract(epoch FROM r.finished_at)::float8,
+           rs.statusname = 'В процессе',
+           extract(epoch FROM w.writeoffdate::timestamptz)::float8
+    FROM repair r
+    JOIN repairstatus rs ON rs.repairstatusid = r.repairstatusid
+    JOIN equipment e ON e.equipmentid = r.equipmentid AND e.deleted_at IS NULL
+    LEFT JOIN (
+        SELECT equipmentid, min(writeoffdate) AS writeoffdate FROM writeoffact GROUP BY equipmentid
+    ) w ON w.equipmentid = r.equipmentid
+    WHERE rs.statusname IN ('В процессе', 'Завершён') AND r.deleted_at IS NULL
+      AND (r.repairdate >= %(since)s OR rs.statusname = 'В процессе')
+      {filter}
+"""
+
+UPSERT_SQL = """
+    INSERT INTO equipment_availability
+        (equipmentid, period_hours, downtime_hours, failures, mtbf_hours, mttr_hours,
+         availability, open_repair, updated_at)
+    VALUES %s
+    ON CONFLICT (equipmentid) DO UPDATE SET
+        period_hours = EXCLUDED.period_hours,
+        downtime_hours = EXCLUDED.downtime_hours,
+        failures = EXCLUDED.failures,
+        mtbf_hours = EXCLUDED.mtbf_hours,
+        mttr_hours = EXCLUDED.mttr_hours,
+        availability = EXCLUDED.availability,
+        open_repair = EXCLUDED.open_repair,
+        updated_at = EXCLUDED.updated_at
+"""
+
+SAVE_STATE_SQL = """
+    INSERT INTO equipment_availability_state (version, computed_on)
+    VALUES (%s, %s)
+    ON CONFLICT (id) DO UPDATE SET
+        version = EXCLUDED.version,
+        computed_on = EXCLUDED.computed_on
+"""
+
+# Худшие по готовности единицы оборудования
+REPORT_SQL = """
+    SELECT e.equipmentid, e.name, a.availability, a.failures, a.downtime_hours,
+           a.mtbf_hours, a.mttr_hours, a.open_repair
+    FROM equipment_availability a
+    JOIN equipment e ON e.equipmentid = a.equipmentid
+    ORDER BY a.availability, a.downtime_hours DESC
+    LIMIT %s
+"""
+
+# Сумма по поддереву каждого узла размещения. Оборудование без ремонтов за
+# период в equipment_availability не хранится и считается исправным весь период.
+LOCATION_SQL = """
+    SELECT l.path::text, l.name, count(e.equipmentid),
+           coalesce(sum(a.failures), 0), coalesce(sum(a.downtime_hours), 0),
+           sum(coalesce(a.period_hours, %(period_hours)s))
+    FROM location l
+    JOIN location d ON d.path <@ l.path
+    JOIN equipment e ON e.locationid = d.locationid AND e.deleted_at IS NULL
+    LEFT JOIN equipment_availability a ON a.equipmentid = e.equipmentid
+    WHERE NOT EXISTS (
+        SELECT 1 FROM writeoffact w
+        WHERE w.equipmentid = e.equipmentid AND w.writeoffdate < %(since)s
+    )
+    GROUP BY l.locationid, l.path, l.name
+    ORDER BY l.path
+"""
+
+# Период расчета показателей, дней до текущего момента
+PERIOD_DAYS = 365
+# Запас выборки завершенных ремонтов, начатых до периода
+LOOKBACK_DAYS = 90
+# Длительность завершенного ремонта без отметки окончания, ч
+DEFAULT_REPAIR_HOURS = 24.0
+
+# Ключ блокировки: пересчет одновременно выполняет только один процесс
+LOCK_KEY = 49049
+
+SOURCE_TABLES = ('repair', 'writeoffact')
+
+HISTORY_COLUMNS = ['equipmentid', 'start', 'finish', 'open', 'retired']
+METRIC_COLUMNS = ['period_hours', 'downtime_hours', 'failures', 'mtbf_hours', 'mttr_hours',
+                  'availability', 'open_repair']
+
+# Итог пересчета: обновлено и удалено строк, полный ли был пересчет
+RunResult = namedtuple('RunResult', 'updated removed full')
+LocationMetrics = namedtuple(
+    'LocationMetrics', 'path name assets failures downtime_hours availability mtbf_hours mttr_hours')
+
+
+def install_trigger(cursor):
+    cursor.execute("DROP TRIGGER IF EXISTS repair_downtime_stamps ON repair")
+    cursor.execute(
+        "CREATE TRIGGER repair_downtime_stamps BEFORE INSERT OR UPDATE OF repairstatusid ON repair "
+        "FOR EACH ROW EXECUTE FUNCTION repair_downtime_stamps()")
+
+
+def is_installed(cursor):
+    cursor.execute("SELECT to_regclass('equipment_availability') IS NOT NULL")
+    return cursor.fetchone()[0]
+
+
+def ensure_schema(cursor):
+    """Создание отметок простоя и таблиц показателей, если их еще нет"""
+    archive.ensure_schema(cursor)
+    refresh.ensure_schema(cursor)
+    if not is_installed(cursor):
+        cursor.execute(SCHEMA_SQL)
+    if database.missing_triggers(cursor, ('repair',), 'repair_downtime_stamps'):
+        install_trigger(cursor)
+
+
+def backfill(conn, batch_size=5000, pause=0.1):
+    """Заполнение начала простоя у старых ремонтов пачками.
+
+    Каждая пачка - короткая транзакция с ограничением ожидания блокировок;
+    повторный запуск продолжает с незаполненных строк. Возвращает число
+    заполненных ремонтов.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = '2s'")
+            cursor.execute(BACKFILL_SQL, (last_id, batch_size))
+            ids = [repairid for repairid, in cursor.fetchall()]
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+        last_id = max(ids)
+        time.sleep(pause)
+
+
+def compute_metrics(history, period_start, period_end, default_hours=DEFAULT_REPAIR_HOURS):
+    """Показатели готовности по интервалам ремонтов.
+
+    history - DataFrame со столбцами HISTORY_COLUMNS (время в секундах от
+    эпохи, retired - дата списания или NaN). Пересекающиеся и смежные
+    ремонты одной единицы сливаются в один простой: строки сортируются по
+    (оборудование, начало), новый простой начинается там, где начало
+    ремонта позже накопленного максимума окончаний предыдущих, - O(n log n)
+    на сортировку и векторные проходы по всему парку без циклов.
+    Отказ - один слитый простой. Возвращает DataFrame METRIC_COLUMNS по
+    equipmentid.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = history.copy()
+    # Окончание периода - списание, если оно было раньше
+    df['limit'] = df['retired'].fillna(period_end).clip(upper=period_end)
+    default_finish = np.where(df['open'].to_numpy(dtype=bool), df['limit'],
+                              df['start'] + default_hours * 3600.0)
+    df['finish'] = df['finish'].fillna(pd.Series(default_finish, index=df.index))
+    df['start'] = df['start'].clip(lower=period_start)
+    df['finish'] = np.minimum(df['finish'], df['limit'])
+    df = df[df['finish'] > df['start']]
+    df = df.sort_values(['equipmentid', 'start'], kind='mergesort')
+
+    reach = df.groupby('equipmentid')['finish'].cummax()
+    previous = reach.groupby(df['equipmentid']).shift()
+    block = (previous.isna() | (df['start'] > previous)).cumsum()
+
+    merged = df.groupby(block).agg(
+        equipmentid=('equipmentid', 'first'), start=('start', 'min'), finish=('finish', 'max'))
+    merged['hours'] = (merged['finish'] - merged['start']) / 3600.0
+    grouped = merged.groupby('equipmentid')
+    metrics = pd.DataFrame({
+        'downtime_hours': grouped['hours'].sum(),
+        'failures': grouped.size(),
+    })
+
+    assets = history.groupby('equipmentid').agg(retired=('retired', 'min'), open_repair=('open', 'any'))
+    limit = assets['retired'].fillna(period_end).clip(upper=period_end)
+    assets['period_hours'] = (limit - period_start) / 3600.0
+    assets = assets[assets['period_hours'] > 0]
+    metrics = assets[['period_hours', 'open_repair']].join(metrics, how='left')
+    metrics['downtime_hours'] = metrics['downtime_hours'].fillna(0.0).clip(upper=metrics['period_hours'])
+    metrics['failures'] = metrics['failures'].fillna(0).astype(int)
+
+    failures = metrics['failures'].where(metrics['failures'] > 0)
+    uptime = metrics['period_hours'] - metrics['downtime_hours']
+    metrics['mtbf_hours'] = uptime / failures
+    metrics['mttr_hours'] = metrics['downtime_hours'] / failures
+    metrics['availability'] = uptime / metrics['period_hours']
+    return metrics[METRIC_COLUMNS].reset_index()
+
+
+def fetch_history(cursor, since, equipment=None):
+    """Интервалы ремонтов в DataFrame; equipment - отбор по кодам оборудования"""
+    import pandas as pd
+
+    params = {'since': since.date()}
+    condition = ""
+    if equipment is not None:
+        condition = "AND r.equipmentid = ANY(%(equipment)s)"
+        params['equipment'] = list(equipment)
+    cursor.execute(HISTORY_SQL.format(filter=condition), params)
+    history = pd.DataFrame(cursor.fetchall(), columns=HISTORY_COLUMNS)
+    return history.astype({'equipmentid': 'int64', 'start': 'float64', 'finish': 'float64',
+                           'open': 'bool', 'retired': 'float64'})
+
+
+def _changed_equipment(cursor, since, current):
+    """Оборудование с изменениями после прошлого расчета; None - нужен полный"""
+    changed = refresh.changed_equipment(cursor, SOURCE_TABLES, since, current)
+    if changed is None:
+        return None
+    # Простой по открытым ремонтам растет и без изменений
+    cursor.execute("SELECT equipmentid FROM equipment_availability WHERE open_repair")
+    changed.update(equipmentid for (equipmentid,) in cursor.fetchall())
+    return changed
+
+
+def run(cursor, full=False, now=None, days=PERIOD_DAYS):
+    """Пересчет показателей готовности.
+
+    По умолчанию пересчитывается только оборудование, у которого после
+    прошлого расчета менялись ремонты или акты списания (по журналу
+    refresh.py), и оборудование с открытым ремонтом. Период расчета
+    скользящий, поэтому первый расчет за новые сутки всегда полный.
+    """
+    from psycopg2.extras import execute_values
+
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+
+    now = now or datetime.now(timezone.utc)
+    period_start = now - timedelta(days=days)
+    current = refresh.current_version(cursor)
+
+    equipment = None
+    if not full:
+        cursor.execute("SELECT version, computed_on FROM equipment_availability_state")
+        state = cursor.fetchone()
+        if state is not None and state[1] == now.date():
+            equipment = _changed_equipment(cursor, state[0], current)
+
+    if equipment is not None and not equipment:
+        updated = removed = 0
+    else:
+        history = fetch_history(cursor, period_start - timedelta(days=LOOKBACK_DAYS), equipment)
+        metrics = compute_metrics(history, period_start.timestamp(), now.timestamp())
+        metrics = metrics.astype(object).where(metrics.notna(), None)
+        rows = [tuple(row) + (now,) for row in metrics.itertuples(index=False)]
+        if rows:
+            execute_values(cursor, UPSERT_SQL, rows, page_size=1000)
+        # Оборудование, у которого не осталось ремонтов за период
+        kept = [row[0] for row in rows]
+        if equipment is None:
+            cursor.execute("DELETE FROM equipment_availability WHERE equipmentid <> ALL(%s)", (kept,))
+        else:
+            cursor.execute(
+                "DELETE FROM equipment_availability WHERE equipmentid = ANY(%s) AND equipmentid <> ALL(%s)",
+                (list(equipment), kept))
+        updated, removed = len(rows), cursor.rowcount
+
+    cursor.execute(SAVE_STATE_SQL, (current, now.date()))
+    return RunResult(updated, removed, equipment is None)
+
+
+def location_metrics(cursor, now=None, days=PERIOD_DAYS):
+    """Показатели по узлам размещения (с оборудованием всех вложенных узлов)"""
+    now = now or datetime.now(timezone.utc)
+    cursor.execute(LOCATION_SQL, {'period_hours': days * 24.0,
+                                  'since': (now - timedelta(days=days)).date()})
+    result = []
+    for path, name, assets, failures, downtime, period in cursor.fetchall():
+        uptime = period - downtime
+        result.append(LocationMetrics(
+            path, name, assets, failures, downtime, uptime / period if period else None,
+            uptime / failures if failures else None, downtime / failures if failures else None))
+    return result
+
+
+def benchmark(assets=20000, repairs=200000, seed=49):
+    """Время расчета на синтетическом парке"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    period_end = time.time()
+    period_start = period_end - PERIOD_DAYS * 86400.0
+    start = rng.uniform(period_start - LOOKBACK_DAYS * 86400.0, period_end, repairs)
+    history = pd.DataFrame({
+        'equipmentid': rng.integers(1, assets + 1, repairs),
+        'start': start,
+        'finish': np.where(rng.random(repairs) < 0.8, start + rng.exponential(30 * 3600.0, repairs), np.nan),
+        'open': rng.random(repairs) < 0.01,
+        'retired': np.where(rng.random(repairs) < 0.02, period_end - 30 * 86400.0, np.nan),
+    })
+    started = time.perf_counter()
+    metrics = compute_metrics(history, period_start, period_end)
+    elapsed = time.perf_counter() - started
+    print(f"Ремонтов: {repairs}, оборудования: {len(metrics)}, расчет: {elapsed * 1000:.0f} мс")
+
+
+def _hours(value):
+    return f"{value:.1f} ч" if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Простой и готовность оборудования")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help="Пересчет показателей")
+    run_parser.add_argument('--full', action='store_true', help="Пересчитать все оборудование")
+    report_parser = sub.add_parser('report', help="Оборудование с наименьшей готовностью")
+    report_parser.add_argument('--limit', type=int, default=20)
+    sub.add_parser('locations', help="Показатели по узлам размещения")
+    bench_parser = sub.add_parser('bench', help="Замер расчета на синтетических данных")
+    bench_parser.add_argument('--assets', type=int, default=20000)
+    bench_parser.add_argument('--repairs', type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        benchmark(args.assets, args.repairs)
+        return
+
+    # Пакетная запись через psycopg2.extras.execute_values
+    conn = database.connect(driver='psycopg2')
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'run':
+                result = run(cursor, args.full)
+                print(f"{'Полный' if result.full else 'Частичный'} пересчет: "
+                      f"обновлено {result.updated}, удалено {result.removed}")
+            elif args.command == 'report':
+                cursor.execute(REPORT_SQL, (args.limit,))
+                for equipmentid, name, availability, failures, downtime, mtbf, mttr, open_repair in cursor.fetchall():
+                    print(f"{equipmentid:>6}  {name:<30}{availability:>8.2%}  отказов {failures:>3}  "
+                          f"простой {_hours(downtime)}  MTBF {_hours(mtbf)}  MTTR {_hours(mttr)}"
+                          f"{'  (в ремонте)' if open_repair else ''}")
+            else:
+                for item in location_metrics(cursor):
+                    indent = "  " * item.path.count('.')
+                    availability = f"{item.availability:.2%}" if item.availability is not None else "-"
+                    print(f"{indent}{item.name}: оборудования {item.assets}, готовность {availability}, "
+                          f"отказов {item.failures}, MTBF {_hours(item.mtbf_hours)}, "
+                          f"MTTR {_hours(item.mttr_hours)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import heapq
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import locations
+from table_model import format_date, format_money, sort_key
+
+
+# Каждый завод ведет свою базу kurs; сводка для управления собирается
+# запросами ко всем базам сразу. Строки с завода приходят пачками из
+# серверного курсора, в очереди к слиянию не больше QUEUE_BATCHES пачек,
+# поэтому медленное слияние не заставляет держать в памяти всю выборку.
+BATCH_SIZE = 500
+QUEUE_BATCHES = 4
+# Как часто поток завода проверяет, не прекращено ли чтение сводки, с
+CANCEL_CHECK = 0.1
+
+# Строки сводки: первым столбцом - завод, с которого пришла строка
+PlantEquipmentRow = namedtuple('PlantEquipmentRow', 'plant equipmentid inventory_number name status')
+PlantRepairRow = namedtuple('PlantRepairRow', 'plant repairid equipment repairdate repairprice status')
+
+# Итог запроса к одному заводу: число строк, время от начала сводки, ошибка
+PlantStats = namedtuple('PlantStats', 'plant rows elapsed error')
+
+# Запрос сводки: порядок строк в SQL и ключ слияния должны совпадать
+Query = namedtuple('Query', 'title sql row key descending')
+
+EQUIPMENT_SQL = """
+    SELECT e.equipmentid, e.inventory_number, e.name,
+           CASE
+               WHEN EXISTS (
+                   SELECT 1 FROM writeoffact w
+                   WHERE w.equipmentid = e.equipmentid
+               ) THEN 'Списано'
+               WHEN EXISTS (
+                   SELECT 1 FROM repair r
+                   JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+                   WHERE r.equipmentid = e.equipmentid
+                   AND rs.statusname = 'В процессе'
+                   AND r.deleted_at IS NULL
+               ) THEN 'На ремонте'
+               ELSE 'Исправен'
+           END AS status
+    FROM equipment e
+    WHERE e.deleted_at IS NULL
+    ORDER BY e.name COLLATE "C", e.equipmentid
+"""
+
+REPAIRS_SQL = """
+    SELECT r.repairid, e.name, r.repairdate, r.repairprice, rs.statusname
+    FROM repair r
+    LEFT JOIN equipment e ON r.equipmentid = e.equipmentid
+    LEFT JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+    WHERE r.deleted_at IS NULL
+    ORDER BY r.repairdate DESC, r.repairid DESC
+"""
+
+# Название сравнивается по кодам символов, как при ORDER BY с правилом
+# сортировки "C": слиянию нужен один порядок у всех заводов, а правила
+# сортировки их баз могут различаться
+QUERIES = {
+    'equipment': Query(
+        "Оборудование",
+        EQUIPMENT_SQL,
+        PlantEquipmentRow,
+        lambda row: (sort_key(row.name), row.equipmentid),
+        False),
+    'repairs': Query(
+        "Ремонты",
+        REPAIRS_SQL,
+        PlantRepairRow,
+        lambda row: (sort_key(row.repairdate), row.repairid),
+        True),
+}
+
+_DONE = object()
+
+
+def parse_dsn(dsn):
+    """Параметры подключения из строки libpq ("host=... dbname=...") или URI"""
+    from psycopg2.extensions import parse_dsn as parse
+
+    return parse(dsn)
+
+
+def plants():
+    """Зарегистрированные заводы {название: строка подключения}"""
+    return dict(locations.settings().value("federation/plants") or {})
+
+
+def register(name, dsn):
+    parse_dsn(dsn)
+    registry = plants()
+    registry[name] = dsn
+    locations.settings().setValue("federation/plants", registry)
+
+
+def unregister(name):
+    registry = plants()
+    if registry.pop(name, None) is None:
+        return False
+    locations.settings().setValue("federation/plants", registry)
+    return True
+
+
+def _put(target, item, cancel):
+    """Передача пачки в очередь слияния; False, если чтение прекращено"""
+    while not cancel.is_set():
+        try:
+            target.put(item, timeout=CANCEL_CHECK)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(plant, dsn, query, target, cancel, stats, started):
+    """Выполнение запроса на одном заводе (в своем потоке)"""
+    rows = 0
+    error = None
+    try:
+        conn = database.connect_dsn(dsn)
+        try:
+            # Именованный курсор читает результат на сервере частями
+            with conn.cursor(name='federation') as cursor:
+                cursor.execute(query.sql)
+                while not cancel.is_set():
+                    batch = cursor.fetchmany(BATCH_SIZE)
+                    if not batch or not _put(target, batch, cancel):
+                        break
+                    rows += len(batch)
+        finally:
+            conn.close()
+    except Exception as e:
+        error = str(e).strip()
+    finally:
+        stats[plant] = PlantStats(plant, rows, time.perf_counter() - started, error)
+        _put(target, _DONE, cancel)
+
+
+def _drain(plant, query, source):
+    """Строки одного завода из очереди, помеченные названием завода"""
+    while True:
+        batch = source.get()
+        if batch is _DONE:
+            return
+        for row in batch:
+            yield query.row(plant, *row)
+
+
+def merged(registry, query, stats=None):
+    """Строки запроса со всех заводов в общем порядке.
+
+    Запросы к заводам выполняются одновременно, каждый в своем потоке, и
+    их строки сливаются по мере поступления (слияние k упорядоченных
+    потоков по ключу query.key), поэтому общее время - время самого
+    медленного завода, а не сумма. В stats записывается PlantStats по
+    каждому заводу; строки завода, запрос к которому не удался, не
+    попадают в сводку (или попадают частично, если ошибка была при чтении).
+    """
+    if stats is None:
+        stats = {}
+    if not registry:
+        return
+    cancel = threading.Event()
+    queues = {plant: queue.Queue(QUEUE_BATCHES) for plant in registry}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(registry), thread_name_prefix='plant') as pool:
+        for plant, dsn in registry.items():
+            pool.submit(_produce, plant, dsn, query, queues[plant], cancel, stats, started)
+        try:
+            yield from heapq.merge(
+                *(_drain(plant, query, queues[plant]) for plant in registry),
+                key=query.key, reverse=query.descending)
+        finally:
+            # Если сводку дочитали не до конца, потоки заводов завершаются
+            cancel.set()
+
+
+def describe(stats):
+    """Краткий итог по заводам для строки состояния"""
+    if not stats:
+        return ""
+    slowest = max(stats.values(), key=lambda item: item.elapsed)
+    failed = sum(1 for item in stats.values() if item.error)
+    text = (f"Заводов: {len(stats)}, строк: {sum(item.rows for item in stats.values())}, "
+            f"{slowest.elapsed * 1000:.0f} мс (дольше всех - {slowest.plant})")
+    if failed:
+        text += f", недоступно: {failed}"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сводка по базам заводов")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = sub.add_parser('add', help="Регистрация базы завода")
+    add_parser.add_argument('name', help="Название завода")
+    add_parser.add_argument('dsn', help='Строка подключения, например "host=plant1 dbname=kurs"')
+
+    remove_parser = sub.add_parser('remove', help="Удаление завода из сводки")
+    remove_parser.add_argument('name')
+
+    sub.add_parser('list', help="Зарегистрированные заводы")
+
+    for command, query in QUERIES.items():
+        query_parser = sub.add_parser(command, help=f"{query.title} всех заводов")
+        query_parser.add_argument('--limit', type=int, help="Вывести только первые строки")
+
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        register(args.name, args.dsn)
+        print(f"Завод {args.name} добавлен")
+        return
+    if args.command == 'remove':
+        print(f"Завод {args.name} удален" if unregister(args.name) else f"Завод {args.name} не найден")
+        return
+
+    registry = plants()
+    if not registry:
+        print("Заводы не заданы: python federation.py add <название> <строка подключения>")
+        return
+    if args.command == 'list':
+        for name, dsn in registry.items():
+            print(f"{name}: {dsn}")
+        return
+
+    query = QUERIES[args.command]
+    formatters = {'repairdate': format_date, 'repairprice': format_money}
+    stats = {}
+    started = time.perf_counter()
+    first = None
+    count = 0
+    rows = merged(registry, query, stats)
+    for row in rows:
+        if first is None:
+            first = time.perf_counter() - started
+        print("  ".join(formatters.get(field, lambda value: str(value) if value is not None else "")(value)
+                        for field, value in zip(row._fields, row)))
+        count += 1
+        if args.limit is not None and count >= args.limit:
+            break
+    # Закрытие слияния останавливает чтение с заводов, не дочитанных до --limit
+    rows.close()
+    total = time.perf_counter() - started
+
+    print()
+    for item in sorted(stats.values(), key=lambda item: item.elapsed):
+        state = f"ошибка: {item.error}" if item.error else f"{item.rows} строк"
+        print(f"{item.plant:<24}{item.elapsed * 1000:>10.0f} мс  {state}")
+    if first is not None:
+        print(f"Первая строка через {first * 1000:.0f} мс")
+    print(f"Всего {count} строк за {total * 1000:.0f} мс "
+          f"(сумма по заводам {sum(item.elapsed for item in stats.values()) * 1000:.0f} мс)")
+
+
+if __name__ == "__main__":
+    main()
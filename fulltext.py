@@ -0,0 +1,105 @@
+from html import escape
+
+from PyQt6.QtCore import Qt, QRectF
+from PyQt6.QtGui import QBrush, QPalette, QTextDocument
+from PyQt6.QtWidgets import QApplication, QStyle, QStyledItemDelegate
+
+
+# Сгенерированный столбец с лексемами причины списания. Добавление столбца
+# переписывает таблицу под исключительной блокировкой, поэтому выполняется
+# только при установке (migrate.py); дальше PostgreSQL поддерживает его сам
+# при каждой вставке и изменении.
+SCHEMA_SQL = """
+    ALTER TABLE writeoffact
+        ADD COLUMN IF NOT EXISTS reason_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('russian', coalesce(reason, ''))) STORED;
+"""
+
+# GIN-индекс по лексемам; строится migrate.py без блокировки записи
+INDEXES = [
+    ('writeoffact_reason_tsv_idx', 'writeoffact', "USING GIN (reason_tsv)"),
+]
+
+# Служебные символы-маркеры вместо HTML-тегов: текст причины экранируется
+# уже на клиенте, поэтому разметка из БД не попадает в отображение.
+START_MARK = "\x02"
+STOP_MARK = "\x03"
+
+SEARCH_SQL = """
+    SELECT w.writeoffactid, w.equipmentid, e.name, w.writeoffdate, w.reason,
+           ts_headline('russian', w.reason, q,
+                       'StartSel=' || chr(2) || ', StopSel=' || chr(3) ||
+                       ', HighlightAll=true') AS headline,
+           ts_rank(w.reason_tsv, q) AS rank
+    FROM writeoffact w
+    LEFT JOIN equipment e ON w.equipmentid = e.equipmentid,
+         websearch_to_tsquery('russian', %s) q
+    WHERE w.reason_tsv @@ q {where}
+    ORDER BY rank DESC, w.writeoffdate DESC
+    LIMIT %s
+"""
+
+HIGHLIGHT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+def ensure_schema(cursor):
+    """Создание столбца tsvector, если его еще нет"""
+    cursor.execute("""
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = 'writeoffact'::regclass AND attname = 'reason_tsv' AND NOT attisdropped
+    """)
+    if cursor.fetchone() is None:
+        cursor.execute(SCHEMA_SQL)
+
+
+def search(cursor, text, where="", params=(), limit=500):
+    """Поиск актов списания по причине с ранжированием.
+
+    where и params - дополнительные условия по актам (алиас w), например
+    выбранные в окне участок и период. Возвращает строки (id, id оборудования, название, дата, причина,
+    подсвеченная причина в HTML), отсортированные по релевантности.
+    """
+    cursor.execute(SEARCH_SQL.format(where=where), (text,) + tuple(params) + (limit,))
+    return [row[:5] + (headline_to_html(row[5]),) for row in cursor.fetchall()]
+
+
+def headline_to_html(headline):
+    """Перевод маркеров ts_headline в HTML-подсветку"""
+    return (escape(headline or "")
+            .replace(START_MARK, '<span style="background-color: #ffe066;">')
+            .replace(STOP_MARK, '</span>')
+            .replace("\n", "<br>"))
+
+
+class HighlightDelegate(QStyledItemDelegate):
+    """Отрисовка ячейки цветом color и с HTML-подсветкой найденных слов"""
+
+    def __init__(self, color, parent=None):
+        super().__init__(parent)
+        self.color = color.name()
+        self.brush = QBrush(color)
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        option.palette.setBrush(QPalette.ColorRole.Text, self.brush)
+
+    def paint(self, painter, option, index):
+        html = index.data(HIGHLIGHT_ROLE)
+        if not html:
+            super().paint(painter, option, index)
+            return
+
+        self.initStyleOption(option, index)
+        option.text = ""
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, option, painter, option.widget)
+
+        document = QTextDocument()
+        document.setDefaultFont(option.font)
+        document.setHtml(f'<span style="color: {self.color};">{html}</span>')
+        document.setTextWidth(option.rect.width())
+
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        document.drawContents(painter, QRectF(0, 0, option.rect.width(), option.rect.height()))
+        painter.restore()
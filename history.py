@@ -0,0 +1,361 @@
+import argparse
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+import database
+import downtime
+import locations
+from table_model import RecordTableModel, format_date
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QSpinBox, QTableView, QHeaderView, QMessageBox
+)
+from PyQt6.QtCore import Qt
+
+
+# История статусов оборудования: периоды действия статуса в tstzrange, у
+# каждой единицы периоды не пересекаются (ограничение исключения). История
+# не редактируется напрямую: триггеры ремонтов, актов списания и
+# оборудования пересобирают ее для затронутого оборудования из исходных
+# строк, поэтому ремонты задним числом и удаление актов тоже учитываются.
+# Ремонт занимает [started_at, finished_at) из downtime.py, завершенный без
+# отметки окончания - сутки (как DEFAULT_REPAIR_HOURS), открытый - до
+# бесконечности. Нужен PostgreSQL 14 (мультидиапазоны).
+SCHEMA_SQL = """
+    CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+    -- У оборудования, созданного до появления истории, начало не известно
+    ALTER TABLE equipment ADD COLUMN IF NOT EXISTS created_at timestamptz;
+    ALTER TABLE equipment ALTER COLUMN created_at SET DEFAULT now();
+
+    CREATE TABLE IF NOT EXISTS equipment_status_history (
+        equipmentid integer NOT NULL REFERENCES equipment (equipmentid) ON DELETE CASCADE,
+        status text NOT NULL CHECK (status IN ('Исправен', 'На ремонте', 'Списано')),
+        valid tstzrange NOT NULL,
+        EXCLUDE USING GIST (equipmentid WITH =, valid WITH &&)
+    );
+    CREATE INDEX IF NOT EXISTS equipment_status_history_valid_gist
+        ON equipment_status_history USING GIST (valid);
+"""
+
+# Функции пересборки заменяются при каждой установке, в том числе у уже
+# созданной истории
+FUNCTIONS_SQL = """
+    CREATE OR REPLACE FUNCTION equipment_status_rebuild(ids integer[]) RETURNS void
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- Параллельные пересборки одного оборудования выполняются по очереди
+        PERFORM pg_advisory_xact_lock(50050, id) FROM unnest(ids) AS id ORDER BY id;
+        DELETE FROM equipment_status_history WHERE equipmentid = ANY(ids);
+        INSERT INTO equipment_status_history (equipmentid, status, valid)
+        SELECT s.equipmentid, p.status, p.valid
+        FROM (
+            SELECT e.equipmentid,
+                   tstzmultirange(tstzrange(e.created_at, NULL)) AS life,
+                   coalesce((
+                       SELECT range_agg(tstzrange(
+                           r.started,
+                           CASE WHEN r.statusname = 'Завершён' THEN greatest(
+                               r.started, coalesce(r.finished_at, r.started + interval '24 hours'))
+                           END))
+                       FROM (
+                           SELECT coalesce(r.started_at, r.repairdate::timestamptz) AS started,
+                                  r.finished_at, rs.statusname
+                           FROM repair r
+                           JOIN repairstatus rs ON rs.repairstatusid = r.repairstatusid
+                           WHERE r.equipmentid = e.equipmentid AND r.deleted_at IS NULL
+                             AND rs.statusname IN ('В процессе', 'Завершён')
+                       ) r
+                       WHERE r.started IS NOT NULL
+                   ), tstzmultirange()) AS repairs,
+                   coalesce((
+                       SELECT tstzmultirange(tstzrange(min(w.writeoffdate)::timestamptz, NULL))
+                       FROM writeoffact w
+                       WHERE w.equipmentid = e.equipmentid
+                       HAVING min(w.writeoffdate) IS NOT NULL
+                   ), tstzmultirange()) AS retired
+            FROM equipment e
+            WHERE e.equipmentid = ANY(ids)
+        ) s
+        CROSS JOIN LATERAL (
+            SELECT 'Списано', unnest(s.life * s.retired)
+            UNION ALL
+            SELECT 'На ремонте', unnest((s.life * s.repairs) - s.retired)
+            UNION ALL
+            SELECT 'Исправен', unnest((s.life - s.repairs) - s.retired)
+        ) AS p (status, valid);
+    END
+    $$;
+
+    CREATE OR REPLACE FUNCTION equipment_status_capture() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM equipment_status_rebuild(ARRAY(
+                SELECT DISTINCT equipmentid FROM new_rows WHERE equipmentid IS NOT NULL));
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM equipment_status_rebuild(ARRAY(
+                SELECT DISTINCT equipmentid FROM old_rows WHERE equipmentid IS NOT NULL));
+        -- Изменение пересобирает историю только у строк, где поменялись
+        -- влияющие на статус столбцы: UPDATE OF нельзя совмещать с таблицами
+        -- переходов, поэтому старые и новые значения сравниваются здесь.
+        -- Старое оборудование нужно, если строка перешла к другому.
+        ELSIF TG_TABLE_NAME = 'repair' THEN
+            PERFORM equipment_status_rebuild(ARRAY(
+                SELECT DISTINCT c.equipmentid
+                FROM old_rows o
+                JOIN new_rows n ON n.repairid = o.repairid
+                CROSS JOIN LATERAL (VALUES (o.equipmentid), (n.equipmentid)) AS c (equipmentid)
+                WHERE c.equipmentid IS NOT NULL
+                  AND (o.repairstatusid, o.repairdate, o.started_at, o.finished_at,
+                       o.equipmentid, o.deleted_at)
+                      IS DISTINCT FROM
+                      (n.repairstatusid, n.repairdate, n.started_at, n.finished_at,
+                       n.equipmentid, n.deleted_at)));
+        ELSE
+            PERFORM equipment_status_rebuild(ARRAY(
+                SELECT DISTINCT c.equipmentid
+                FROM old_rows o
+                JOIN new_rows n ON n.writeoffactid = o.writeoffactid
+                CROSS JOIN LATERAL (VALUES (o.equipmentid), (n.equipmentid)) AS c (equipmentid)
+                WHERE c.equipmentid IS NOT NULL
+                  AND (o.equipmentid, o.writeoffdate) IS DISTINCT FROM (n.equipmentid, n.writeoffdate)));
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+"""
+
+# Таблицы, изменения которых пересобирают историю, и события триггеров;
+# у оборудования история меняется только при добавлении. Первичные ключи
+# repairid и writeoffactid сопоставляют старые и новые строки изменения
+# в equipment_status_capture()
+TRIGGERS = {
+    'repair': ('INSERT', 'UPDATE', 'DELETE'),
+    'writeoffact': ('INSERT', 'UPDATE', 'DELETE'),
+    'equipment': ('INSERT',),
+}
+REFERENCING = {
+    'INSERT': "NEW TABLE AS new_rows",
+    'UPDATE': "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    'DELETE': "OLD TABLE AS old_rows",
+}
+
+# Статус оборудования за день: при нескольких статусах за день - как в
+# окне оборудования, списание важнее ремонта. Оборудования, которого в этот
+# день еще не было, в выборке нет. Оценка риска - только текущая, поэтому
+# не показывается. {where} - отбор по участку
+STATUS_AT_SQL = """
+    SELECT e.equipmentid, e.name,
+           CASE
+               WHEN bool_or(h.status = 'Списано') THEN 'Списано'
+               WHEN bool_or(h.status = 'На ремонте') THEN 'На ремонте'
+               ELSE 'Исправен'
+           END AS status,
+           NULL::float8 AS risk_score, e.inventory_number, e.locationid
+    FROM equipment e
+    JOIN equipment_status_history h ON h.equipmentid = e.equipmentid
+     AND h.valid && tstzrange(%s::date::timestamptz, (%s::date + 1)::timestamptz)
+    WHERE e.deleted_at IS NULL {where}
+    GROUP BY e.equipmentid
+    ORDER BY e.equipmentid
+"""
+
+# Недельный ряд одним запросом: недели соединяются с периодами истории по
+# пересечению диапазонов (GiST-индекс по valid). Статус считается на начало
+# недели; repaired - сколько единиц было в ремонте хотя бы часть недели
+WEEKLY_SQL = """
+    SELECT w.week::date,
+           count(*) FILTER (WHERE h.status = 'Исправен' AND h.valid @> w.week),
+           count(*) FILTER (WHERE h.status = 'На ремонте' AND h.valid @> w.week),
+           count(*) FILTER (WHERE h.status = 'Списано' AND h.valid @> w.week),
+           count(DISTINCT h.equipmentid) FILTER (WHERE h.status = 'На ремонте')
+    FROM generate_series(%s::date::timestamptz, %s::date::timestamptz, interval '1 week') AS w (week)
+    LEFT JOIN (
+        equipment_status_history h
+        JOIN equipment e ON e.equipmentid = h.equipmentid AND e.deleted_at IS NULL {where}
+    ) ON h.valid && tstzrange(w.week, w.week + interval '1 week')
+    GROUP BY w.week
+    ORDER BY w.week
+"""
+
+WEEKS = 26
+
+WeekRow = namedtuple('WeekRow', 'week in_service under_repair written_off repaired')
+
+
+def install_triggers(cursor, table=None):
+    """Подключение триггеров пересборки истории (ко всем таблицам или к одной)"""
+    for name in [table] if table else TRIGGERS:
+        for event in TRIGGERS.get(name, ()):
+            trigger = f"equipment_status_{event.lower()}"
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {name}")
+            cursor.execute(
+                f"CREATE TRIGGER {trigger} AFTER {event} ON {name} REFERENCING {REFERENCING[event]} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION equipment_status_capture()")
+
+
+def is_installed(cursor):
+    cursor.execute("SELECT to_regclass('equipment_status_history') IS NOT NULL")
+    return cursor.fetchone()[0]
+
+
+def ensure_schema(cursor):
+    """Создание таблицы истории и триггеров, если их еще нет.
+
+    История по существующим данным заполняется отдельно (rebuild_all).
+    """
+    # Начало и окончание ремонтов отмечает downtime.py
+    downtime.ensure_schema(cursor)
+    if not is_installed(cursor):
+        cursor.execute(SCHEMA_SQL)
+    cursor.execute(FUNCTIONS_SQL)
+    for table in database.missing_triggers(cursor, TRIGGERS, 'equipment_status_insert'):
+        install_triggers(cursor, table)
+
+
+def rebuild(cursor, equipment=None):
+    """Пересборка истории оборудования (по умолчанию всего)"""
+    if equipment is None:
+        cursor.execute("SELECT equipment_status_rebuild(ARRAY(SELECT equipmentid FROM equipment))")
+    else:
+        cursor.execute("SELECT equipment_status_rebuild(%s)", (list(equipment),))
+
+
+def rebuild_all(conn, batch_size=1000):
+    """Пересборка истории всего оборудования пачками.
+
+    Каждая пачка - своя транзакция, поэтому блокировки пересборки не
+    копятся на все оборудование сразу. Возвращает число единиц оборудования.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT equipmentid FROM equipment ORDER BY equipmentid")
+        ids = [equipmentid for equipmentid, in cursor.fetchall()]
+    conn.commit()
+    for start in range(0, len(ids), batch_size):
+        with conn.cursor() as cursor:
+            rebuild(cursor, ids[start:start + batch_size])
+        conn.commit()
+    return len(ids)
+
+
+def fetch_at(cursor, day, path=None):
+    """Оборудование участка со статусом на день day (строки как в окне оборудования)"""
+    where, params = locations.scope_filter("e.equipmentid", path)
+    cursor.execute(STATUS_AT_SQL.format(where=where), (day, day) + params)
+    return cursor.fetchall()
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def fetch_weekly(cursor, weeks=WEEKS, path=None, until=None):
+    """Число оборудования по статусам за последние weeks недель"""
+    last = week_start(until or date.today())
+    where, params = locations.scope_filter("e.equipmentid", path)
+    cursor.execute(WEEKLY_SQL.format(where=where),
+                   (last - timedelta(weeks=weeks - 1), last) + params)
+    return list(map(WeekRow._make, cursor.fetchall()))
+
+
+class WeeklyDialog(QDialog):
+    """Число оборудования по статусам по неделям для окна оборудования"""
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.owner = window
+        self.setWindowTitle("Статусы оборудования по неделям")
+        self.resize(700, 600)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        nav_layout = QHBoxLayout()
+        self.weeks_input = QSpinBox()
+        self.weeks_input.setRange(1, 520)
+        self.weeks_input.setValue(WEEKS)
+        self.refresh_btn = QPushButton("Обновить")
+        self.refresh_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.refresh_btn.clicked.connect(self.load_data)
+        nav_layout.addWidget(QLabel("Недель:"))
+        nav_layout.addWidget(self.weeks_input)
+        nav_layout.addWidget(self.refresh_btn)
+        nav_layout.addStretch()
+        layout.addLayout(nav_layout)
+
+        self.model = RecordTableModel(
+            ["Неделя", "Исправно", "На ремонте", "Списано", "Были в ремонте"],
+            formatters={0: format_date},
+            key_types={0: 'date', 1: 'int', 2: 'int', 3: 'int', 4: 'int'},
+            parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        header = self.table.horizontalHeader()
+        for col_idx in range(5):
+            header.setSectionResizeMode(col_idx, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        self.load_data()
+
+    def load_data(self):
+        try:
+            started = time.perf_counter()
+            rows = fetch_weekly(self.owner.reads.cursor(), self.weeks_input.value(), self.owner.scope)
+            self.owner.conn.commit()
+        except Exception as e:
+            self.owner.conn.rollback()
+            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить статусы по неделям:\n{str(e)}")
+            return
+        # Новые недели сверху
+        self.model.set_rows(reversed(rows))
+        print(f"Статусы по неделям: {len(rows)} недель за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="История статусов оборудования")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('rebuild', help="Пересборка истории всего оборудования")
+    at_parser = sub.add_parser('at', help="Статусы оборудования на дату")
+    at_parser.add_argument('day', type=date.fromisoformat, help="Дата, ГГГГ-ММ-ДД")
+    at_parser.add_argument('--status', help="Только оборудование с этим статусом, например 'На ремонте'")
+    weekly_parser = sub.add_parser('weekly', help="Число оборудования по статусам по неделям")
+    weekly_parser.add_argument('--weeks', type=int, default=WEEKS)
+    for command_parser in [at_parser, weekly_parser]:
+        command_parser.add_argument('--path', help="Участок: путь узла размещения, например 1.4")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        if args.command == 'rebuild':
+            with conn.cursor() as cursor:
+                database.check_schema(cursor)
+            conn.commit()
+            print(f"История пересобрана для оборудования: {rebuild_all(conn)}")
+            return
+        with conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'at':
+                rows = [row for row in fetch_at(cursor, args.day, args.path)
+                        if args.status is None or row[2] == args.status]
+                for equipmentid, name, status, _, inventory_number, _ in rows:
+                    print(f"{equipmentid:>6}  {inventory_number or '':<14}{name:<40}{status}")
+                print(f"Всего: {len(rows)}")
+            else:
+                started = time.perf_counter()
+                rows = fetch_weekly(cursor, args.weeks, args.path)
+                elapsed = time.perf_counter() - started
+                print(f"{'Неделя':<12}{'Исправно':>10}{'На ремонте':>12}{'Списано':>10}{'Были в ремонте':>16}")
+                for row in rows:
+                    print(f"{format_date(row.week):<12}{row.in_service:>10}{row.under_repair:>12}"
+                          f"{row.written_off:>10}{row.repaired:>16}")
+                print(f"Запрос: {elapsed * 1000:.0f} мс")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
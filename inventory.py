@@ -0,0 +1,138 @@
+import argparse
+from collections import namedtuple
+
+import archive
+import database
+
+
+# Инвентарный номер - текст метки (штрихкода или QR-кода) на оборудовании.
+# Номер уникален среди всего оборудования, включая удаленное, чтобы метка
+# не могла указать на другую единицу. Без явного номера присваивается
+# INV-<код оборудования>; номера хранятся в верхнем регистре без пробелов
+# по краям, как их передает сканер после normalize().
+SCHEMA_SQL = """
+    ALTER TABLE equipment ADD COLUMN IF NOT EXISTS inventory_number text;
+    UPDATE equipment SET inventory_number = 'INV-' || lpad(equipmentid::text, 6, '0')
+    WHERE inventory_number IS NULL;
+
+    CREATE OR REPLACE FUNCTION equipment_inventory_number() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.inventory_number := coalesce(
+            nullif(upper(btrim(NEW.inventory_number)), ''),
+            'INV-' || lpad(NEW.equipmentid::text, 6, '0'));
+        RETURN NEW;
+    END
+    $$;
+    DROP TRIGGER IF EXISTS equipment_inventory_number ON equipment;
+    CREATE TRIGGER equipment_inventory_number
+        BEFORE INSERT OR UPDATE OF inventory_number ON equipment
+        FOR EACH ROW EXECUTE FUNCTION equipment_inventory_number();
+"""
+
+# Уникальный индекс номеров; строится migrate.py без блокировки записи
+INDEXES = [
+    ('equipment_inventory_number_key', 'equipment', "(inventory_number)"),
+]
+
+TAGS_SQL = """
+    SELECT inventory_number, equipmentid, name
+    FROM equipment
+    WHERE deleted_at IS NULL AND inventory_number IS NOT NULL {where}
+"""
+
+# Найденная по метке единица оборудования
+Tag = namedtuple('Tag', 'inventory_number equipmentid name')
+
+
+def ensure_schema(cursor):
+    """Добавление инвентарных номеров, если их еще нет"""
+    archive.ensure_schema(cursor)
+    cursor.execute("""
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = 'equipment'::regclass AND attname = 'inventory_number' AND NOT attisdropped
+    """)
+    if cursor.fetchone() is None:
+        cursor.execute(SCHEMA_SQL)
+
+
+def normalize(text):
+    """Инвентарный номер из считанной сканером строки"""
+    return text.strip().upper()
+
+
+class TagIndex:
+    """Словарь «инвентарный номер -> оборудование» в памяти окна.
+
+    Сканирование разрешается одним поиском в словаре без запроса к БД.
+    Словарь загружается целиком при запуске, а затем обновляется только
+    по оборудованию, которое автообновление окна нашло измененным.
+    """
+
+    def __init__(self):
+        self.by_tag = {}
+        self.by_id = {}
+
+    def __len__(self):
+        return len(self.by_tag)
+
+    def put(self, tag):
+        """Запись номера, измененного самим окном"""
+        self.drop(tag.equipmentid)
+        self.by_tag[tag.inventory_number] = tag
+        self.by_id[tag.equipmentid] = tag
+
+    def drop(self, equipmentid):
+        tag = self.by_id.pop(equipmentid, None)
+        if tag is not None and self.by_tag.get(tag.inventory_number) is tag:
+            del self.by_tag[tag.inventory_number]
+
+    def load(self, cursor):
+        cursor.execute(TAGS_SQL.format(where=""))
+        self.by_tag, self.by_id = {}, {}
+        for row in cursor.fetchall():
+            tag = Tag._make(row)
+            self.by_tag[tag.inventory_number] = tag
+            self.by_id[tag.equipmentid] = tag
+
+    def update(self, cursor, equipment_ids):
+        """Перечитывание номеров измененного оборудования"""
+        if not equipment_ids:
+            return
+        for equipmentid in equipment_ids:
+            self.drop(equipmentid)
+        cursor.execute(TAGS_SQL.format(where="AND equipmentid = ANY(%s)"), (sorted(equipment_ids),))
+        for row in cursor.fetchall():
+            self.put(Tag._make(row))
+
+    def lookup(self, text):
+        """Оборудование по считанной метке или None"""
+        return self.by_tag.get(normalize(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Инвентарные номера оборудования")
+    sub = parser.add_subparsers(dest='command', required=True)
+    labels_parser = sub.add_parser('labels', help="Напечатать этикетки с QR-кодами в PDF")
+    labels_parser.add_argument('path')
+    labels_parser.add_argument('equipment', type=int, nargs='*', help="Коды оборудования (по умолчанию все)")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'labels':
+                import documents
+                where, params = "", ()
+                if args.equipment:
+                    where, params = "AND equipmentid = ANY(%s)", (args.equipment,)
+                cursor.execute(TAGS_SQL.format(where=where) + " ORDER BY inventory_number", params)
+                labels = [(number, name) for number, _, name in cursor.fetchall()]
+                print(f"Этикеток: {documents.render_labels(labels, args.path)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+
+from PyQt6.QtCore import QSettings
+from PyQt6.QtWidgets import QComboBox
+
+import archive
+import database
+
+
+# Уровни иерархии размещения оборудования
+KINDS = {
+    'plant': "Завод",
+    'workshop': "Цех",
+    'line': "Линия",
+}
+
+# Путь узла - ltree из кодов узлов от корня ('1.4.17'), поэтому переименование
+# не меняет путей, а выборка поддерева - одно условие path <@ по GiST-индексу.
+# Число действующего оборудования в поддереве хранится в самом узле и
+# обновляется триггерами у всех предков, без рекурсивных обходов при чтении.
+SCHEMA_SQL = """
+    CREATE EXTENSION IF NOT EXISTS ltree;
+
+    CREATE TABLE IF NOT EXISTS location (
+        locationid serial PRIMARY KEY,
+        parentid integer REFERENCES location (locationid),
+        name text NOT NULL,
+        kind text NOT NULL CHECK (kind IN ('plant', 'workshop', 'line')),
+        path ltree,
+        equipment_count integer NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS location_path_gist ON location USING GIST (path);
+    CREATE INDEX IF NOT EXISTS location_parent_idx ON location (parentid);
+
+    ALTER TABLE equipment ADD COLUMN IF NOT EXISTS locationid integer REFERENCES location (locationid);
+
+    CREATE OR REPLACE FUNCTION location_set_path() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        parent_path ltree;
+    BEGIN
+        IF NEW.parentid IS NULL THEN
+            NEW.path := NEW.locationid::text::ltree;
+        ELSE
+            SELECT path INTO parent_path FROM location WHERE locationid = NEW.parentid;
+            IF TG_OP = 'UPDATE' AND parent_path <@ OLD.path THEN
+                RAISE EXCEPTION 'Узел нельзя перенести внутрь собственного поддерева';
+            END IF;
+            NEW.path := parent_path || NEW.locationid::text;
+        END IF;
+        RETURN NEW;
+    END
+    $$;
+    DROP TRIGGER IF EXISTS location_set_path ON location;
+    CREATE TRIGGER location_set_path
+        BEFORE INSERT OR UPDATE OF parentid ON location
+        FOR EACH ROW EXECUTE FUNCTION location_set_path();
+
+    -- Перенос узла: пути потомков и счетчики старых и новых предков
+    CREATE OR REPLACE FUNCTION location_moved() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF NEW.path = OLD.path THEN
+            RETURN NULL;
+        END IF;
+        UPDATE location SET path = NEW.path || subpath(path, nlevel(OLD.path))
+        WHERE path <@ OLD.path AND locationid <> NEW.locationid;
+        UPDATE location SET equipment_count = equipment_count - NEW.equipment_count
+        WHERE path @> OLD.path AND locationid <> NEW.locationid;
+        UPDATE location SET equipment_count = equipment_count + NEW.equipment_count
+        WHERE path @> NEW.path AND locationid <> NEW.locationid;
+        RETURN NULL;
+    END
+    $$;
+    DROP TRIGGER IF EXISTS location_moved ON location;
+    CREATE TRIGGER location_moved
+        AFTER UPDATE OF parentid ON location
+        FOR EACH ROW EXECUTE FUNCTION location_moved();
+
+    -- Счетчики оборудования по поддеревьям: +1/-1 всем предкам узла
+    CREATE OR REPLACE FUNCTION location_count_equipment() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' AND OLD.locationid IS NOT NULL AND OLD.deleted_at IS NULL THEN
+            UPDATE location SET equipment_count = equipment_count - 1
+            WHERE path @> (SELECT path FROM location WHERE locationid = OLD.locationid);
+        END IF;
+        IF TG_OP <> 'DELETE' AND NEW.locationid IS NOT NULL AND NEW.deleted_at IS NULL THEN
+            UPDATE location SET equipment_count = equipment_count + 1
+            WHERE path @> (SELECT path FROM location WHERE locationid = NEW.locationid);
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+    DROP TRIGGER IF EXISTS location_count_equipment ON equipment;
+    CREATE TRIGGER location_count_equipment
+        AFTER INSERT OR DELETE OR UPDATE OF locationid, deleted_at ON equipment
+        FOR EACH ROW EXECUTE FUNCTION location_count_equipment();
+"""
+
+# Индекс рабочей таблицы; строится migrate.py без блокировки записи
+INDEXES = [
+    ('equipment_location_idx', 'equipment', "(locationid) WHERE deleted_at IS NULL"),
+]
+
+# Пересчет счетчиков с нуля (после массовой загрузки или ручной правки)
+REBUILD_COUNTS_SQL = """
+    UPDATE location a SET equipment_count = (
+        SELECT count(*)
+        FROM location d
+        JOIN equipment e ON e.locationid = d.locationid AND e.deleted_at IS NULL
+        WHERE d.path <@ a.path
+    )
+"""
+
+# Условие на оборудование из поддерева; подставляется в запросы окон
+SCOPE_SQL = """
+    AND {column} IN (
+        SELECT se.equipmentid FROM equipment se
+        JOIN location sl ON sl.locationid = se.locationid
+        WHERE sl.path <@ %s::ltree
+    )
+"""
+
+_settings = None
+
+
+def ensure_schema(cursor):
+    """Создание иерархии размещения, если ее еще нет"""
+    archive.ensure_schema(cursor)
+    cursor.execute("SELECT to_regclass('location') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        cursor.execute(SCHEMA_SQL)
+
+
+def rebuild_counts(cursor):
+    cursor.execute(REBUILD_COUNTS_SQL)
+
+
+def fetch_tree(cursor):
+    """Узлы иерархии в порядке обхода: (код, родитель, название, уровень, путь, число оборудования)"""
+    cursor.execute("""
+        SELECT locationid, parentid, name, kind, path::text, equipment_count
+        FROM location
+        ORDER BY path
+    """)
+    return cursor.fetchall()
+
+
+def add(cursor, name, kind, parentid=None):
+    cursor.execute(
+        "INSERT INTO location (parentid, name, kind) VALUES (%s, %s, %s) RETURNING locationid",
+        (parentid, name, kind))
+    return cursor.fetchone()[0]
+
+
+def move(cursor, locationid, parentid):
+    cursor.execute("UPDATE location SET parentid = %s WHERE locationid = %s", (parentid, locationid))
+
+
+def assign(cursor, equipmentid, locationid):
+    cursor.execute("UPDATE equipment SET locationid = %s WHERE equipmentid = %s", (locationid, equipmentid))
+
+
+def scope_filter(column, path):
+    """Условие выборки только поддерева path (None - без ограничения) и его параметры"""
+    if path is None:
+        return "", ()
+    return SCOPE_SQL.format(column=column), (path,)
+
+
+def settings():
+    global _settings
+    if _settings is None:
+        _settings = QSettings("kurs", "equipment")
+    return _settings
+
+
+def saved_scope():
+    """Поддерево, с которым работает оператор (общее для всех окон)"""
+    return settings().value("location/path") or None
+
+
+def save_scope(path):
+    settings().setValue("location/path", path or "")
+
+
+class ScopeCombo(QComboBox):
+    """Выбор поддерева иерархии для окон без навигатора.
+
+    Выбор сохраняется и используется всеми окнами по умолчанию.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.addItem("Все участки", None)
+        self.currentIndexChanged.connect(lambda index: save_scope(self.path()))
+
+    def load(self, cursor):
+        """Заполнение списком узлов; выбирается сохраненное поддерево"""
+        saved = saved_scope()
+        self.blockSignals(True)
+        self.clear()
+        self.addItem("Все участки", None)
+        for _, _, name, kind, path, count in fetch_tree(cursor):
+            indent = "    " * path.count(".")
+            self.addItem(f"{indent}{name} ({count})", path)
+            if path == saved:
+                self.setCurrentIndex(self.count() - 1)
+        self.blockSignals(False)
+
+    def path(self):
+        return self.currentData()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Иерархия размещения оборудования")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('tree', help="Показать иерархию со счетчиками")
+    add_parser = sub.add_parser('add', help="Добавить узел")
+    add_parser.add_argument('name')
+    add_parser.add_argument('--kind', choices=KINDS, required=True)
+    add_parser.add_argument('--parent', type=int)
+    move_parser = sub.add_parser('move', help="Перенести узел")
+    move_parser.add_argument('location', type=int)
+    move_parser.add_argument('--parent', type=int)
+    assign_parser = sub.add_parser('assign', help="Разместить оборудование в узле")
+    assign_parser.add_argument('equipment', type=int)
+    assign_parser.add_argument('location', type=int)
+    sub.add_parser('rebuild', help="Пересчитать счетчики оборудования")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'tree':
+                for locationid, _, name, kind, path, count in fetch_tree(cursor):
+                    indent = "  " * path.count(".")
+                    print(f"{indent}{KINDS[kind]} {name} [{locationid}]: {count}")
+            elif args.command == 'add':
+                print(f"Добавлен узел {add(cursor, args.name, args.kind, args.parent)}")
+            elif args.command == 'move':
+                move(cursor, args.location, args.parent)
+            elif args.command == 'assign':
+                assign(cursor, args.equipment, args.location)
+            elif args.command == 'rebuild':
+                rebuild_counts(cursor)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+from datetime import date
+
+import archive
+import database
+import refresh
+
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS equipment_score (
+        equipmentid integer PRIMARY KEY REFERENCES equipment (equipmentid) ON DELETE CASCADE,
+        repair_count integer NOT NULL,
+        mtbr_days double precision,
+        cost_trend double precision,
+        last_repair date,
+        risk_score double precision NOT NULL,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS equipment_score_risk_idx ON equipment_score (risk_score DESC);
+
+    -- Состояние прежнего формата (последний учтенный repairid) пересоздается
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'equipment_score_state' AND column_name = 'last_repairid'
+        ) THEN
+            DROP TABLE equipment_score_state;
+        END IF;
+    END
+    $$;
+    -- Версия журнала изменений (refresh.py), до которой оценки посчитаны
+    CREATE TABLE IF NOT EXISTS equipment_score_state (
+        id boolean PRIMARY KEY DEFAULT true CHECK (id),
+        version text NOT NULL,
+        computed_on date NOT NULL
+    );
+"""
+
+# Отмененные ремонты не считаются отказами. Списанное оборудование не
+# оценивается: иначе его риск рос бы вместе с днями после последнего ремонта
+HISTORY_SQL = """
+    SELECT r.equipmentid, r.repairdate, r.repairprice
+    FROM repair r
+    JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+    WHERE rs.statusname <> 'Отменён' AND r.repairdate IS NOT NULL
+      AND r.deleted_at IS NULL
+      AND NOT EXISTS (SELECT 1 FROM writeoffact w WHERE w.equipmentid = r.equipmentid)
+      {filter}
+"""
+
+UPSERT_SQL = """
+    INSERT INTO equipment_score
+        (equipmentid, repair_count, mtbr_days, cost_trend, last_repair, risk_score, updated_at)
+    VALUES %s
+    ON CONFLICT (equipmentid) DO UPDATE SET
+        repair_count = EXCLUDED.repair_count,
+        mtbr_days = EXCLUDED.mtbr_days,
+        cost_trend = EXCLUDED.cost_trend,
+        last_repair = EXCLUDED.last_repair,
+        risk_score = EXCLUDED.risk_score,
+        updated_at = EXCLUDED.updated_at
+"""
+
+SAVE_STATE_SQL = """
+    INSERT INTO equipment_score_state (version, computed_on)
+    VALUES (%s, %s)
+    ON CONFLICT (id) DO UPDATE SET
+        version = EXCLUDED.version,
+        computed_on = EXCLUDED.computed_on
+"""
+
+# Межремонтный интервал по умолчанию для оборудования с одним ремонтом
+DEFAULT_MTBR_DAYS = 365.0
+
+# Таблицы, изменения которых меняют оценки: после акта списания оценка
+# оборудования удаляется при следующем частичном пересчете
+SOURCE_TABLES = ('repair', 'writeoffact')
+
+
+def ensure_schema(cursor):
+    """Создание таблиц оценок, если их еще нет"""
+    archive.ensure_schema(cursor)
+    refresh.ensure_schema(cursor)
+    cursor.execute(SCHEMA_SQL)
+
+
+def compute_scores(history, today=None):
+    """Расчет показателей по истории ремонтов.
+
+    history - DataFrame со столбцами equipmentid, repairdate, repairprice.
+    Все вычисления векторные по всему парку сразу, без циклов по оборудованию.
+    Возвращает DataFrame с одной строкой на единицу оборудования.
+    """
+    import numpy as np
+    import pandas as pd
+
+    today = pd.Timestamp(today or date.today())
+    df = history.copy()
+    df['repairdate'] = pd.to_datetime(df['repairdate'])
+    df['repairprice'] = df['repairprice'].astype(float).fillna(0.0)
+    df = df.sort_values(['equipmentid', 'repairdate'], kind='mergesort')
+
+    # Интервалы между соседними ремонтами одного оборудования
+    df['interval'] = df.groupby('equipmentid')['repairdate'].diff().dt.days
+
+    # Время в годах от первого ремонта - для наклона тренда стоимости
+    first = df.groupby('equipmentid')['repairdate'].transform('min')
+    x = (df['repairdate'] - first).dt.days.to_numpy() / 365.25
+    y = df['repairprice'].to_numpy()
+    df['x'], df['xx'], df['xy'] = x, x * x, x * y
+    df['recent'] = (df['repairdate'] >= today - pd.Timedelta(days=365)).astype(int)
+
+    grouped = df.groupby('equipmentid')
+    scores = pd.DataFrame({
+        'repair_count': grouped.size(),
+        'mtbr_days': grouped['interval'].mean(),
+        'last_repair': grouped['repairdate'].max(),
+        'mean_price': grouped['repairprice'].mean(),
+        'sx': grouped['x'].sum(),
+        'sy': grouped['repairprice'].sum(),
+        'sxx': grouped['xx'].sum(),
+        'sxy': grouped['xy'].sum(),
+        'recent': grouped['recent'].sum(),
+    })
+
+    # Наклон МНК: изменение стоимости ремонта за год
+    n = scores['repair_count'].to_numpy(dtype=float)
+    denominator = n * scores['sxx'] - scores['sx'] ** 2
+    slope = (n * scores['sxy'] - scores['sx'] * scores['sy']) / denominator.where(denominator > 1e-9)
+    scores['cost_trend'] = slope
+
+    # Экспоненциальная модель отказов: вероятность отказа к текущему дню
+    mtbr = scores['mtbr_days'].fillna(DEFAULT_MTBR_DAYS).clip(lower=1.0)
+    since_last = (today - scores['last_repair']).dt.days.clip(lower=0)
+    p_fail = 1.0 - np.exp(-since_last / mtbr)
+
+    frequency = (scores['recent'] / 4.0).clip(upper=1.0)
+    relative_trend = (slope.fillna(0.0) / scores['mean_price'].where(scores['mean_price'] > 0)).fillna(0.0)
+    trend = relative_trend.clip(lower=0.0, upper=1.0)
+
+    scores['risk_score'] = (100.0 * (0.6 * p_fail + 0.3 * frequency + 0.1 * trend)).round(1)
+    scores['last_repair'] = scores['last_repair'].dt.date
+
+    return scores[['repair_count', 'mtbr_days', 'cost_trend', 'last_repair', 'risk_score']].reset_index()
+
+
+def run(cursor, full=False, today=None):
+    """Пересчет оценок.
+
+    По умолчанию пересчитывается только оборудование, у которого после
+    прошлого расчета менялись ремонты или акты списания (по журналу
+    refresh.py), в том числе задним числом, удаленные и отмененные. Вероятность отказа зависит от
+    текущей даты, поэтому первый расчет за новые сутки всегда полный.
+    Возвращает количество обновленных записей.
+    """
+    import pandas as pd
+    from psycopg2.extras import execute_values
+
+    today = today or date.today()
+    current = refresh.current_version(cursor)
+
+    equipment = None
+    if not full:
+        cursor.execute("SELECT version, computed_on FROM equipment_score_state")
+        state = cursor.fetchone()
+        if state is not None and state[1] == today:
+            equipment = refresh.changed_equipment(cursor, SOURCE_TABLES, state[0], current)
+
+    updated = 0
+    if equipment is None or equipment:
+        if equipment is None:
+            cursor.execute(HISTORY_SQL.format(filter=""))
+        else:
+            # Полная история только того оборудования, у которого менялись ремонты
+            cursor.execute(HISTORY_SQL.format(filter="AND r.equipmentid = ANY(%s)"), (list(equipment),))
+        history = pd.DataFrame(cursor.fetchall(), columns=['equipmentid', 'repairdate', 'repairprice'])
+        kept = []
+        if not history.empty:
+            scores = compute_scores(history, today)
+            scores = scores.astype(object).where(scores.notna(), None)
+            now = pd.Timestamp.now(tz='UTC').to_pydatetime()
+            rows = [tuple(row) + (now,) for row in scores.itertuples(index=False)]
+            execute_values(cursor, UPSERT_SQL, rows, page_size=1000)
+            updated = len(rows)
+            kept = [row[0] for row in rows]
+        # Оборудование, у которого не осталось учитываемых ремонтов, и списанное
+        if equipment is None:
+            cursor.execute("DELETE FROM equipment_score WHERE equipmentid <> ALL(%s)", (kept,))
+        else:
+            cursor.execute(
+                "DELETE FROM equipment_score WHERE equipmentid = ANY(%s) AND equipmentid <> ALL(%s)",
+                (list(equipment), kept))
+
+    cursor.execute(SAVE_STATE_SQL, (current, today))
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Расчет оценок риска отказа оборудования")
+    parser.add_argument('--full', action='store_true', help="Пересчитать по всей истории")
+    args = parser.parse_args()
+
+    # Пакетная запись через psycopg2.extras.execute_values
+    conn = database.connect(driver='psycopg2')
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            print(f"Обновлено оценок: {run(cursor, args.full)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
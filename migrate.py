@@ -0,0 +1,155 @@
+import argparse
+
+import archive
+import audit
+import database
+import downtime
+import fulltext
+import history
+import inventory
+import locations
+import maintenance
+import overdue
+import parts
+import partitions
+import preventive
+import refresh
+import scorecard
+
+
+# Единственная точка установки и обновления схемы: окна, пакетные задания
+# и команды модулей только проверяют версию (database.check_schema) и DDL
+# не выполняют; ensure_schema модулей вызываются только отсюда.
+# Шаги идут в порядке зависимостей: deleted_at (archive.py) нужен частичным
+# индексам и запросам остальных модулей, журнал изменений (refresh.py) -
+# пересчетам, отметки простоя (downtime.py) - истории статусов.
+STEPS = [
+    ("Мягкое удаление", archive.ensure_schema),
+    ("Журнал изменений", refresh.ensure_schema),
+    ("Журнал аудита", audit.ensure_schema),
+    ("Размещение", locations.ensure_schema),
+    ("Инвентарные номера", inventory.ensure_schema),
+    ("Оценки риска", maintenance.ensure_schema),
+    ("Показатели поставщиков", scorecard.ensure_schema),
+    ("Поиск по причине списания", fulltext.ensure_schema),
+    ("Планы ТО", preventive.ensure_schema),
+    ("Склад запчастей", parts.ensure_schema),
+    ("Сроки ремонтов", overdue.ensure_schema),
+    ("Простой и готовность", downtime.ensure_schema),
+    ("История статусов", history.ensure_schema),
+]
+
+# Индексы рабочих таблиц (equipment, repair, writeoffact, acceptancecertificate).
+# Обычный CREATE INDEX блокирует запись в таблицу на все время построения,
+# поэтому они строятся CREATE INDEX CONCURRENTLY после шагов схемы.
+INDEXES = (archive.INDEXES + locations.INDEXES + inventory.INDEXES + scorecard.INDEXES
+           + preventive.INDEXES + overdue.INDEXES + fulltext.INDEXES)
+
+VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        id boolean PRIMARY KEY DEFAULT true CHECK (id),
+        version integer NOT NULL,
+        migrated_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+SET_VERSION_SQL = """
+    INSERT INTO schema_version (version) VALUES (%s)
+    ON CONFLICT (id) DO UPDATE
+    SET version = greatest(schema_version.version, EXCLUDED.version), migrated_at = now()
+"""
+
+# Достроен ли индекс; NULL - индекса нет
+INDEX_VALID_SQL = "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)"
+
+
+def create_index(cursor, name, table, definition):
+    """Построение индекса в текущей транзакции (для таблицы, созданной в ней же)"""
+    unique = "UNIQUE " if name.endswith('_key') else ""
+    cursor.execute(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON {table} {definition}")
+
+
+def build_index(cursor, name, table, definition):
+    """Построение индекса без блокировки записи в таблицу.
+
+    Курсор должен работать в режиме autocommit: CONCURRENTLY нельзя
+    выполнять в транзакции. Индекс, оставшийся недостроенным после
+    прерванной сборки, удаляется и строится заново. Имена на _key -
+    уникальные индексы. На секционированной таблице индекс создается
+    на родителе (ON ONLY), строится на каждой секции и подключается к
+    родителю. Возвращает True, если индекс пришлось строить.
+    """
+    cursor.execute(INDEX_VALID_SQL, (name,))
+    row = cursor.fetchone()
+    if row and row[0]:
+        return False
+    unique = "UNIQUE " if name.endswith('_key') else ""
+
+    if not partitions.is_partitioned(cursor, table):
+        if row:
+            cursor.execute(f"DROP INDEX CONCURRENTLY {name}")
+        cursor.execute(f"CREATE {unique}INDEX CONCURRENTLY {name} ON {table} {definition}")
+        return True
+
+    cursor.execute(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}")
+    suffix = name[len(table) + 1:] if name.startswith(f"{table}_") else name
+    for partition, *_ in partitions.list_partitions(cursor, table):
+        build_index(cursor, f"{partition}_{suffix}", partition, definition)
+        cursor.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition}_{suffix}")
+    return True
+
+
+def migrate(conn, batch_size=5000, pause=0.1):
+    """Установка и обновление схемы до database.SCHEMA_VERSION.
+
+    Шаги схемы выполняются одной транзакцией, заполнение старых строк -
+    пачками, индексы - затем по одному в autocommit. Версия записывается последней, поэтому прерванную
+    миграцию достаточно запустить повторно.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(VERSION_SQL)
+        new_history = not history.is_installed(cursor)
+        for title, step in STEPS:
+            step(cursor)
+            print(f"{title}: готово")
+    conn.commit()
+
+    # Заполнение данных по существующим строкам - пачками, своими транзакциями
+    print(f"Начало простоя заполнено у ремонтов: {downtime.backfill(conn, batch_size, pause)}")
+    if new_history:
+        print(f"История статусов собрана для оборудования: {history.rebuild_all(conn)}")
+
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            for name, table, definition in INDEXES:
+                if build_index(cursor, name, table, definition):
+                    print(f"Индекс {name} построен")
+            cursor.execute(SET_VERSION_SQL, (database.SCHEMA_VERSION,))
+    finally:
+        conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Установка и обновление схемы БД")
+    parser.add_argument('--check', action='store_true', help="Только проверить версию схемы")
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help="Строк в пачке при заполнении данных по существующим строкам")
+    parser.add_argument('--pause', type=float, default=0.1, help="Пауза между пачками, с")
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        if args.check:
+            with conn.cursor() as cursor:
+                database.check_schema(cursor)
+            print(f"Схема актуальна (версия {database.SCHEMA_VERSION})")
+            return
+        migrate(conn, args.batch_size, args.pause)
+        print(f"Схема обновлена до версии {database.SCHEMA_VERSION}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+import argparse
+import heapq
+import json
+import os
+import select
+import urllib.request
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from email.message import EmailMessage
+
+import archive
+import database
+import refresh
+from PyQt6.QtCore import QObject, QSocketNotifier, QTimer
+from PyQt6.QtWidgets import QApplication, QStyle, QSystemTrayIcon
+
+
+# Сроки ремонта (SLA) задаются по классу оборудования, правило с пустым
+# классом действует для оборудования без своего правила. Открытые ремонты
+# выбираются по индексу (repairstatusid, repairdate); дальше список
+# поддерживается в памяти по уведомлениям NOTIFY и журналу изменений
+# автообновления (refresh.py): перечитываются только измененные строки.
+SCHEMA_SQL = """
+    ALTER TABLE equipment ADD COLUMN IF NOT EXISTS equipment_class text;
+
+    CREATE TABLE IF NOT EXISTS repair_sla (
+        equipment_class text PRIMARY KEY,
+        warn_days integer CHECK (warn_days > 0),
+        max_days integer NOT NULL CHECK (max_days > 0)
+    );
+    INSERT INTO repair_sla (equipment_class, warn_days, max_days)
+    VALUES ('', 7, 14)
+    ON CONFLICT DO NOTHING;
+
+    -- Отправленные оповещения: каждое уходит по почте один раз, даже если
+    -- запущено несколько обработчиков
+    CREATE TABLE IF NOT EXISTS overdue_alert (
+        repairid integer NOT NULL,
+        level text NOT NULL,
+        sent_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (repairid, level)
+    );
+
+    CREATE OR REPLACE FUNCTION overdue_notify() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify('repair_overdue', TG_TABLE_NAME);
+        RETURN NULL;
+    END
+    $$;
+"""
+
+# Открытые ремонты по статусу и возрасту; строится migrate.py без блокировки записи
+INDEXES = [
+    ('repair_status_date_idx', 'repair', "(repairstatusid, repairdate) WHERE deleted_at IS NULL"),
+]
+
+# Таблицы, изменения которых будят обработчик
+NOTIFY_TABLES = ('repair', 'equipment', 'repair_sla')
+CHANNEL = 'repair_overdue'
+
+# Открытые ремонты с классом оборудования; {where} - отбор измененных строк
+OPEN_SQL = """
+    SELECT r.repairid, r.equipmentid, e.name, coalesce(e.equipment_class, ''), r.repairdate
+    FROM repair r
+    JOIN equipment e ON e.equipmentid = r.equipmentid
+    WHERE r.repairstatusid = (SELECT repairstatusid FROM repairstatus WHERE statusname = 'В процессе')
+      AND r.deleted_at IS NULL AND r.repairdate IS NOT NULL {where}
+"""
+
+# Уровни оповещения: предупреждение и нарушение срока
+LEVELS = {'warning': "Срок ремонта подходит", 'overdue': "Срок ремонта нарушен"}
+
+# Почта и веб-хук: письма и запросы складываются в каталог KURS_ALERT_OUTBOX;
+# если задан KURS_ALERT_WEBHOOK, запрос отправляется по этому адресу
+OUTBOX_DIR = os.environ.get('KURS_ALERT_OUTBOX', 'outbox')
+WEBHOOK_URL = os.environ.get('KURS_ALERT_WEBHOOK')
+ALERT_EMAIL = os.environ.get('KURS_ALERT_EMAIL', 'mechanic@localhost')
+WEBHOOK_TIMEOUT = 5
+# Повтор неотправленных оповещений через столько секунд
+RETRY_SECONDS = 60
+
+# Больше оповещений за раз показывается одним сводным сообщением
+MAX_POPUPS = 3
+# Допустимое число устаревших порогов в куче сверх двух на ремонт
+COMPACT_SLACK = 1000
+
+OpenRepair = namedtuple('OpenRepair', 'repairid equipmentid equipment equipment_class repairdate')
+Alert = namedtuple('Alert', 'level repair days deadline')
+
+
+def install_triggers(cursor, tables=NOTIFY_TABLES):
+    for table in tables:
+        cursor.execute(f"DROP TRIGGER IF EXISTS overdue_notify ON {table}")
+        cursor.execute(
+            f"CREATE TRIGGER overdue_notify AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION overdue_notify()")
+
+
+def is_installed(cursor):
+    cursor.execute("SELECT to_regclass('repair_sla') IS NOT NULL")
+    return cursor.fetchone()[0]
+
+
+def ensure_schema(cursor):
+    """Создание правил сроков и уведомлений, если их еще нет"""
+    archive.ensure_schema(cursor)
+    refresh.ensure_schema(cursor)
+    if not is_installed(cursor):
+        cursor.execute(SCHEMA_SQL)
+    install_triggers(cursor, database.missing_triggers(cursor, NOTIFY_TABLES, 'overdue_notify'))
+
+
+def seconds_to_midnight(now=None):
+    now = now or datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (tomorrow - now).total_seconds() + 1
+
+
+class OverdueTracker:
+    """Открытые ремонты и ближайшие пороги сроков в памяти.
+
+    Пороги всех ремонтов лежат в куче по дате, поэтому проверка - это
+    просмотр ее вершины, без запросов к БД. Измененные ремонты
+    перечитываются по журналу изменений (apply), их старые пороги в куче
+    пропускаются при извлечении. Каждый порог срабатывает один раз.
+    """
+
+    TABLES = ('repair', 'equipment')
+
+    def __init__(self):
+        self.rules = {}
+        self.repairs = {}
+        self.queue = []
+        self.generation = 0
+        self.raised = set()
+        self.version = None
+
+    def load(self, cursor):
+        """Полная загрузка правил и открытых ремонтов"""
+        self.version = refresh.current_version(cursor)
+        cursor.execute(OPEN_SQL.format(where=""))
+        self.repairs = {row.repairid: row for row in map(OpenRepair._make, cursor.fetchall())}
+        self.load_rules(cursor)
+
+    def load_rules(self, cursor):
+        """Перечитывание правил сроков и пересчет порогов в памяти"""
+        cursor.execute("SELECT equipment_class, warn_days, max_days FROM repair_sla")
+        self.rules = {equipment_class: (warn_days, max_days)
+                      for equipment_class, warn_days, max_days in cursor.fetchall()}
+        self._rebuild()
+
+    def _rebuild(self):
+        self.generation += 1
+        self.queue = []
+        for repair in self.repairs.values():
+            self._push(repair)
+
+    def thresholds(self, repair):
+        """Даты порогов ремонта: [(дата, уровень)]"""
+        warn_days, max_days = self.rules.get(repair.equipment_class) or self.rules.get('', (None, None))
+        result = []
+        if warn_days is not None:
+            result.append((repair.repairdate + timedelta(days=warn_days), 'warning'))
+        if max_days is not None:
+            result.append((repair.repairdate + timedelta(days=max_days), 'overdue'))
+        return result
+
+    def _push(self, repair):
+        for day, level in self.thresholds(repair):
+            if (repair.repairid, level) not in self.raised:
+                heapq.heappush(self.queue, (day, repair.repairid, level, self.generation, repair))
+
+    def apply(self, cursor):
+        """Учет изменений ремонтов и оборудования; True, если что-то изменилось"""
+        current = refresh.current_version(cursor)
+        changes = refresh.fetch_changes(cursor, self.TABLES, self.version, current)
+        if None in changes.values():
+            self.load(cursor)
+            return True
+        self.version = current
+        repair_ids = changes.get('repair', refresh.NO_CHANGES).keys
+        equipment_ids = changes.get('equipment', refresh.NO_CHANGES).keys
+        if not repair_ids and not equipment_ids:
+            return False
+
+        cursor.execute(OPEN_SQL.format(where="AND (r.repairid = ANY(%s) OR r.equipmentid = ANY(%s))"),
+                       (sorted(repair_ids), sorted(equipment_ids)))
+        rows = list(map(OpenRepair._make, cursor.fetchall()))
+        # Не найденные ремонты закрыты или удалены
+        stale = repair_ids | {repair_id for repair_id, repair in self.repairs.items()
+                              if repair.equipmentid in equipment_ids}
+        for repair_id in stale:
+            self.repairs.pop(repair_id, None)
+        for row in rows:
+            self.repairs[row.repairid] = row
+            self._push(row)
+        closed = stale - {row.repairid for row in rows}
+        self.raised = {(repair_id, level) for repair_id, level in self.raised if repair_id not in closed}
+        # Устаревшие пороги копятся в куче до своей даты; при частых
+        # изменениях куча собирается заново
+        if len(self.queue) > 4 * len(self.repairs) + COMPACT_SLACK:
+            self._rebuild()
+        return True
+
+    def due(self, today=None):
+        """Сработавшие к дню today пороги"""
+        today = today or date.today()
+        alerts = []
+        while self.queue and self.queue[0][0] <= today:
+            day, repair_id, level, generation, repair = heapq.heappop(self.queue)
+            if generation != self.generation or self.repairs.get(repair_id) is not repair:
+                continue
+            if (repair_id, level) in self.raised:
+                continue
+            self.raised.add((repair_id, level))
+            alerts.append(Alert(level, repair, (today - repair.repairdate).days, day))
+        return alerts
+
+    def release(self, alerts):
+        """Возврат неотправленных оповещений: пороги сработают снова"""
+        for alert in alerts:
+            repair = alert.repair
+            self.raised.discard((repair.repairid, alert.level))
+            if self.repairs.get(repair.repairid) is repair:
+                heapq.heappush(self.queue, (alert.deadline, repair.repairid, alert.level,
+                                            self.generation, repair))
+
+    def overdue_count(self, today=None):
+        today = today or date.today()
+        return sum(1 for repair in self.repairs.values()
+                   if any(level == 'overdue' and day <= today for day, level in self.thresholds(repair)))
+
+
+def describe(alert):
+    repair = alert.repair
+    return (f"{LEVELS[alert.level]}: ремонт №{repair.repairid}, {repair.equipment}, "
+            f"в работе {alert.days} дн. (срок {alert.deadline:%d.%m.%Y})")
+
+
+def claim(cursor, alerts):
+    """Оповещения, которые еще никто не отправил (отметка об отправке - здесь же).
+
+    Отметка фиксируется вместе с транзакцией вызывающего кода (send).
+    """
+    if not alerts:
+        return []
+    cursor.execute("""
+        INSERT INTO overdue_alert (repairid, level)
+        SELECT * FROM unnest(%s::integer[], %s::text[])
+        ON CONFLICT DO NOTHING
+        RETURNING repairid, level
+    """, ([alert.repair.repairid for alert in alerts], [alert.level for alert in alerts]))
+    claimed = set(cursor.fetchall())
+    return [alert for alert in alerts if (alert.repair.repairid, alert.level) in claimed]
+
+
+def deliver(alerts):
+    """Отправка оповещений письмом и веб-хуком (локальная замена - каталог OUTBOX_DIR)"""
+    if not alerts:
+        return
+    os.makedirs(OUTBOX_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+    message = EmailMessage()
+    message['From'] = ALERT_EMAIL
+    message['To'] = ALERT_EMAIL
+    message['Subject'] = f"Сроки ремонтов: {len(alerts)}"
+    message.set_content("\n".join(describe(alert) for alert in alerts))
+    with open(os.path.join(OUTBOX_DIR, f"{stamp}.eml"), 'wb') as f:
+        f.write(bytes(message))
+
+    payload = json.dumps([{
+        'level': alert.level,
+        'repairid': alert.repair.repairid,
+        'equipmentid': alert.repair.equipmentid,
+        'equipment': alert.repair.equipment,
+        'repairdate': alert.repair.repairdate.isoformat(),
+        'deadline': alert.deadline.isoformat(),
+        'days': alert.days,
+    } for alert in alerts], ensure_ascii=False).encode()
+    if WEBHOOK_URL:
+        request = urllib.request.Request(WEBHOOK_URL, data=payload,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT).close()
+            return
+        except Exception as e:
+            print(f"Веб-хук недоступен, запрос сохранен в {OUTBOX_DIR}: {e}")
+    with open(os.path.join(OUTBOX_DIR, f"{stamp}.json"), 'wb') as f:
+        f.write(payload)
+
+
+def send(conn, tracker):
+    """Отправка сработавших порогов; False, если отправить не удалось.
+
+    Отметка об отправке и доставка выполняются в одной транзакции:
+    отметка фиксируется только после доставки, а параллельный обработчик
+    ждет ее фиксации и пропускает уже отправленное. При ошибке транзакция
+    откатывается, а пороги возвращаются в очередь для повтора.
+    """
+    alerts = tracker.due()
+    if not alerts:
+        return True
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        claimed = claim(cursor, alerts)
+        deliver(claimed)
+        cursor.execute("COMMIT")
+        for alert in claimed:
+            print(describe(alert))
+        return True
+    except Exception as e:
+        print(f"Оповещения не отправлены, повтор через {RETRY_SECONDS} с: {e}")
+        if not conn.closed:
+            cursor.execute("ROLLBACK")
+        tracker.release(alerts)
+        return False
+    finally:
+        cursor.close()
+
+
+def received(conn):
+    """Таблицы из пришедших уведомлений"""
+    conn.poll()
+    tables = {notify.payload for notify in conn.notifies}
+    conn.notifies.clear()
+    return tables
+
+
+def handle(tracker, cursor, tables):
+    """Обработка уведомлений об изменении таблиц"""
+    if 'repair_sla' in tables:
+        tracker.load_rules(cursor)
+    if tables & set(OverdueTracker.TABLES):
+        tracker.apply(cursor)
+
+
+def listen(cursor):
+    """Подключение к каналу уведомлений; соединение должно быть в autocommit"""
+    cursor.execute(f"LISTEN {CHANNEL}")
+
+
+class OverdueMonitor(QObject):
+    """Оповещения о сроках ремонтов на рабочем столе для окна ремонтов.
+
+    Работает через отдельное соединение psycopg2 с основным сервером
+    (LISTEN не работает на репликах): уведомления читаются по готовности
+    сокета в цикле событий Qt, пороги проверяются после изменений и в
+    полночь. Почту и веб-хук отправляет обработчик `overdue.py watch`.
+    """
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.tracker = OverdueTracker()
+        self.conn = None
+        self.cursor = None
+        self.notifier = None
+        self.tray = None
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.check)
+
+    def start(self):
+        try:
+            self.conn = database.connect(driver='psycopg2')
+            self.conn.autocommit = True
+            self.cursor = self.conn.cursor()
+            listen(self.cursor)
+            self.tracker.load(self.cursor)
+        except Exception as e:
+            print(f"Оповещения о сроках ремонтов недоступны: {e}")
+            self.stop()
+            return
+
+        self.notifier = QSocketNotifier(self.conn.fileno(), QSocketNotifier.Type.Read, self)
+        self.notifier.activated.connect(self.notified)
+
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            icon = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxWarning)
+            self.tray = QSystemTrayIcon(icon, self)
+            self.tray.setToolTip(self.window.windowTitle())
+            self.tray.show()
+        self.check()
+
+    def notified(self):
+        try:
+            handle(self.tracker, self.cursor, received(self.conn))
+        except Exception as e:
+            print(f"Ошибка обработки уведомления о ремонтах: {e}")
+            return
+        self.check()
+
+    def check(self):
+        alerts = self.tracker.due()
+        if len(alerts) > MAX_POPUPS:
+            self.show_message("Сроки ремонтов",
+                              f"Ремонтов с нарушенным сроком: {self.tracker.overdue_count()}, "
+                              f"новых оповещений: {len(alerts)}")
+        else:
+            for alert in alerts:
+                self.show_message(LEVELS[alert.level], describe(alert))
+        self.timer.start(int(seconds_to_midnight() * 1000))
+
+    def show_message(self, title, text):
+        if self.tray is not None:
+            self.tray.showMessage(title, text, QSystemTrayIcon.MessageIcon.Warning)
+        else:
+            self.window.statusBar().showMessage(text, 10000)
+
+    def stop(self):
+        self.timer.stop()
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+        if self.tray is not None:
+            self.tray.hide()
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+
+
+def watch():
+    """Обработчик оповещений: почта и веб-хук, пока не прерван"""
+    # conn.notifies и poll() - API psycopg2
+    conn = database.connect(driver='psycopg2')
+    conn.autocommit = True
+    try:
+        cursor = conn.cursor()
+        database.check_schema(cursor)
+        listen(cursor)
+        tracker = OverdueTracker()
+        tracker.load(cursor)
+        print(f"Открытых ремонтов: {len(tracker.repairs)}, с нарушенным сроком: {tracker.overdue_count()}")
+        while True:
+            sent = send(conn, tracker)
+            # Без уведомлений обработчик просыпается в полночь (пороги - даты)
+            # или раньше, если оповещения нужно отправить повторно
+            timeout = seconds_to_midnight() if sent else RETRY_SECONDS
+            if select.select([conn], [], [], timeout) != ([], [], []):
+                try:
+                    handle(tracker, cursor, received(conn))
+                except Exception as e:
+                    if conn.closed:
+                        raise
+                    print(f"Ошибка обработки уведомления о ремонтах: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сроки ремонтов и оповещения")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('watch', help="Обработчик оповещений (почта, веб-хук)")
+    sub.add_parser('list', help="Ремонты с подходящим и нарушенным сроком")
+
+    rule_parser = sub.add_parser('rule', help="Правило срока для класса оборудования")
+    rule_parser.add_argument('equipment_class', help='Класс оборудования ("*" - правило по умолчанию)')
+    rule_parser.add_argument('--warn', type=int, help="Предупреждение через столько дней")
+    rule_parser.add_argument('--max', type=int, required=True, help="Срок ремонта, дней")
+
+    class_parser = sub.add_parser('class', help="Класс оборудования")
+    class_parser.add_argument('equipment_class')
+    class_parser.add_argument('equipmentid', type=int, nargs='+')
+
+    args = parser.parse_args()
+
+    if args.command == 'watch':
+        watch()
+        return
+
+    conn = database.connect()
+    try:
+        with conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'list':
+                tracker = OverdueTracker()
+                tracker.load(cursor)
+                for alert in sorted(tracker.due(), key=lambda alert: alert.deadline):
+                    print(describe(alert))
+            elif args.command == 'rule':
+                equipment_class = '' if args.equipment_class == '*' else args.equipment_class
+                cursor.execute("""
+                    INSERT INTO repair_sla (equipment_class, warn_days, max_days) VALUES (%s, %s, %s)
+                    ON CONFLICT (equipment_class) DO UPDATE
+                    SET warn_days = EXCLUDED.warn_days, max_days = EXCLUDED.max_days
+                """, (equipment_class, args.warn, args.max))
+                print("Правило сохранено")
+            elif args.command == 'class':
+                cursor.execute("UPDATE equipment SET equipment_class = %s WHERE equipmentid = ANY(%s)",
+                               (args.equipment_class or None, args.equipmentid))
+                print(f"Обновлено оборудования: {cursor.rowcount}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
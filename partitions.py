@@ -0,0 +1,282 @@
+import argparse
+import os
+from datetime import date
+
+import database
+
+
+# Секционируемые таблицы: ключ секционирования, гранулярность и то, что
+# нужно только секционированной таблице. Столбцы, индексы и триггеры
+# модулей ставятся на новую таблицу их же шагами установки (migrate.py).
+TABLES = {
+    'repair': {
+        'key': 'repairdate',
+        'pk': 'repairid',
+        'granularity': 'month',
+        'objects': [
+            "CREATE INDEX IF NOT EXISTS repair_repairdate_idx ON repair (repairdate)",
+            "ALTER TABLE repair ADD FOREIGN KEY (equipmentid) REFERENCES equipment (equipmentid)",
+            "ALTER TABLE repair ADD FOREIGN KEY (repairstatusid) REFERENCES repairstatus (repairstatusid)",
+        ],
+    },
+    'writeoffact': {
+        'key': 'writeoffdate',
+        'pk': 'writeoffactid',
+        'granularity': 'year',
+        'objects': [
+            "CREATE INDEX IF NOT EXISTS writeoffact_writeoffdate_idx ON writeoffact (writeoffdate)",
+            "ALTER TABLE writeoffact ADD FOREIGN KEY (equipmentid) REFERENCES equipment (equipmentid)",
+        ],
+    },
+}
+
+
+def period_start(months, today=None):
+    """Первый день месяца, отстоящего на months месяцев назад"""
+    today = today or date.today()
+    total = today.year * 12 + today.month - 1 - months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def partition_bounds(day, granularity):
+    """Границы секции [from, to), в которую попадает дата"""
+    if granularity == 'year':
+        return date(day.year, 1, 1), date(day.year + 1, 1, 1)
+    start = date(day.year, day.month, 1)
+    end = date(day.year + (day.month == 12), day.month % 12 + 1, 1)
+    return start, end
+
+
+def partition_name(table, start, granularity):
+    if granularity == 'year':
+        return f"{table}_y{start.year}"
+    return f"{table}_y{start.year}m{start.month:02d}"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)",
+        (table,))
+    return cursor.fetchone()[0]
+
+
+def create_partition(cursor, table, day):
+    """Создание секции, содержащей указанную дату, если ее еще нет"""
+    granularity = TABLES[table]['granularity']
+    start, end = partition_bounds(day, granularity)
+    name = partition_name(table, start, granularity)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        (start, end))
+    return name
+
+
+def ensure_partitions(cursor, table, ahead=3):
+    """Создание секций от текущего периода на ahead периодов вперед"""
+    granularity = TABLES[table]['granularity']
+    day = date.today()
+    created = []
+    for _ in range(ahead + 1):
+        created.append(create_partition(cursor, table, day))
+        day = partition_bounds(day, granularity)[1]
+    return created
+
+
+def list_partitions(cursor, table):
+    """Список секций с границами и размером на диске"""
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid),
+               pg_size_pretty(pg_total_relation_size(c.oid)),
+               coalesce(t.spcname, 'pg_default')
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        LEFT JOIN pg_tablespace t ON t.oid = c.reltablespace
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (table,))
+    return cursor.fetchall()
+
+
+def migrate(cursor, table):
+    """Перевод существующей таблицы в секционированную по дате.
+
+    Старая таблица и ее индексы переименовываются (<имя>_legacy), данные
+    копируются в новые секции, затем старая таблица удаляется вместе со
+    своими внешними ключами и триггерами. Первичный ключ дополняется ключом
+    секционирования, как того требует PostgreSQL, поэтому строки без даты
+    не переносятся: при их наличии миграция прерывается до изменений.
+    Выполнять в одной транзакции.
+    """
+    config = TABLES[table]
+    key, pk = config['key'], config['pk']
+    legacy = f"{table}_legacy"
+
+    if is_partitioned(cursor, table):
+        return False
+
+    cursor.execute(f"SELECT count(*) FROM {table} WHERE {key} IS NULL")
+    missing = cursor.fetchone()[0]
+    if missing:
+        raise RuntimeError(f"в таблице {table} строк без {key}: {missing}; "
+                           f"заполните {key} перед секционированием")
+
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    # Индексы (и первичный ключ) сохраняют прежние имена: CREATE INDEX
+    # IF NOT EXISTS на новой таблице молча пропустил бы их, поэтому они
+    # переименовываются в <имя>_legacy до создания индексов
+    cursor.execute("""
+        SELECT c.relname FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass
+    """, (legacy,))
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"ALTER INDEX {name} RENAME TO {name[:56]}_legacy")
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (legacy, pk))
+    sequence = cursor.fetchone()[0]
+
+    cursor.execute(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING GENERATED "
+        f"INCLUDING CONSTRAINTS, PRIMARY KEY ({pk}, {key})) PARTITION BY RANGE ({key})")
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', {key})::date FROM {legacy}")
+    for (day,) in cursor.fetchall():
+        create_partition(cursor, table, day)
+    ensure_partitions(cursor, table)
+
+    cursor.execute("""
+        SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0
+          AND NOT attisdropped AND attgenerated = ''
+    """, (legacy,))
+    columns = cursor.fetchone()[0]
+    cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}")
+
+    for statement in config['objects']:
+        cursor.execute(statement)
+
+    # Последовательность идентификаторов переходит к новой таблице до
+    # удаления старой, иначе она удалилась бы вместе с ней
+    if sequence:
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{pk}")
+    cursor.execute(f"DROP TABLE {legacy}")
+
+    # Столбцы, триггеры и индексы модулей - их же шагами установки; индексы
+    # строятся обычным CREATE INDEX: новая таблица и так заблокирована этой
+    # транзакцией (migrate.py импортирует этот модуль, импорт по месту)
+    import migrate
+    for _, step in migrate.STEPS:
+        step(cursor)
+    for name, indexed, definition in migrate.INDEXES:
+        if indexed == table:
+            migrate.create_index(cursor, name, table, definition)
+    return True
+
+
+def archive_partition(cursor, table, name, tablespace=None, parquet_dir=None):
+    """Архивирование секции.
+
+    С tablespace секция переносится в более дешевое табличное пространство
+    и остается доступной для запросов. С parquet_dir секция отсоединяется,
+    выгружается в Parquet-файл и удаляется из БД.
+    """
+    if tablespace:
+        cursor.execute(f"ALTER TABLE {name} SET TABLESPACE {tablespace}")
+        return name
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для выгрузки в Parquet установите пакет pyarrow")
+
+    cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    cursor.execute(f"SELECT * FROM {name}")
+    columns = [desc[0] for desc in cursor.description]
+    path = os.path.join(parquet_dir, f"{name}.parquet")
+
+    writer = None
+    try:
+        while True:
+            rows = cursor.fetchmany(50000)
+            if not rows:
+                break
+            batch = pa.Table.from_pydict({col: [row[i] for row in rows] for i, col in enumerate(columns)})
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    cursor.execute(f"DROP TABLE {name}")
+    return path
+
+
+def archive_before(cursor, table, before, tablespace=None, parquet_dir=None):
+    """Архивирование всех секций, полностью лежащих раньше даты before"""
+    granularity = TABLES[table]['granularity']
+    archived = []
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+          AND pg_get_expr(c.relpartbound, c.oid) <> 'DEFAULT'
+    """, (table,))
+    for (name,) in cursor.fetchall():
+        year_month = name[len(table) + 2:]
+        year = int(year_month[:4])
+        month = int(year_month[5:7]) if granularity == 'month' else 1
+        end = partition_bounds(date(year, month, 1), granularity)[1]
+        if end <= before:
+            archived.append(archive_partition(cursor, table, name, tablespace, parquet_dir))
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Управление секциями таблиц repair и writeoffact")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = sub.add_parser('migrate', help="Перевести таблицу в секционированную")
+    migrate_parser.add_argument('table', choices=TABLES)
+
+    ensure_parser = sub.add_parser('ensure', help="Создать секции на будущие периоды")
+    ensure_parser.add_argument('--ahead', type=int, default=3)
+
+    list_parser = sub.add_parser('list', help="Показать секции таблицы")
+    list_parser.add_argument('table', choices=TABLES)
+
+    archive_parser = sub.add_parser('archive', help="Архивировать старые секции")
+    archive_parser.add_argument('table', choices=TABLES)
+    archive_parser.add_argument('--before', type=date.fromisoformat, required=True)
+    target = archive_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--tablespace')
+    target.add_argument('--parquet')
+
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'migrate':
+                done = migrate(cursor, args.table)
+                print("Таблица переведена" if done else "Таблица уже секционирована")
+            elif args.command == 'ensure':
+                for table in TABLES:
+                    if is_partitioned(cursor, table):
+                        print(", ".join(ensure_partitions(cursor, table, args.ahead)))
+            elif args.command == 'list':
+                for name, bound, size, tablespace in list_partitions(cursor, args.table):
+                    print(f"{name:<28} {bound:<60} {size:>10} {tablespace}")
+            elif args.command == 'archive':
+                for item in archive_before(cursor, args.table, args.before, args.tablespace, args.parquet):
+                    print(f"Архивировано: {item}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
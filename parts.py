@@ -0,0 +1,447 @@
+import argparse
+from collections import namedtuple
+from decimal import Decimal
+
+import archive
+import database
+from table_model import RecordTableModel, format_money
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableView,
+    QComboBox, QSpinBox, QHeaderView, QMessageBox
+)
+from PyQt6.QtCore import Qt
+
+
+# Склад запчастей. Доступный остаток - quantity - reserved; резерв
+# под ремонт и списание при его завершении - условные UPDATE, которые
+# не пропускают остаток ниже нуля (ограничения CHECK - последняя защита).
+# Стоимость ремонта = работы + запчасти: repair.parts_cost хранит сумму
+# запчастей, работы - разница repairprice - parts_cost, поэтому цена,
+# введенная в окне ремонтов вручную, остается стоимостью работ.
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS spare_part (
+        partid serial PRIMARY KEY,
+        name text NOT NULL,
+        sku text UNIQUE,
+        supplierid integer REFERENCES supplier (supplierid) ON DELETE SET NULL,
+        unit_price numeric(12, 2) NOT NULL DEFAULT 0 CHECK (unit_price >= 0),
+        quantity integer NOT NULL DEFAULT 0 CHECK (quantity >= 0),
+        reserved integer NOT NULL DEFAULT 0 CHECK (reserved >= 0 AND reserved <= quantity),
+        min_quantity integer NOT NULL DEFAULT 0 CHECK (min_quantity >= 0)
+    );
+
+    -- Строки ремонта; repairid без внешнего ключа, так как repair может
+    -- быть секционирована (partitions.py)
+    CREATE TABLE IF NOT EXISTS repair_part (
+        lineid serial PRIMARY KEY,
+        repairid integer NOT NULL,
+        partid integer NOT NULL REFERENCES spare_part (partid),
+        quantity integer NOT NULL CHECK (quantity > 0),
+        unit_price numeric(12, 2) NOT NULL,
+        state text NOT NULL DEFAULT 'reserved' CHECK (state IN ('reserved', 'consumed', 'released'))
+    );
+    CREATE INDEX IF NOT EXISTS repair_part_repairid_idx ON repair_part (repairid);
+
+    ALTER TABLE repair ADD COLUMN IF NOT EXISTS parts_cost numeric(12, 2) NOT NULL DEFAULT 0;
+
+    -- Очередь оповещений о заканчивающихся запчастях: не больше одного
+    -- необработанного оповещения на запчасть
+    CREATE TABLE IF NOT EXISTS part_alert (
+        alertid serial PRIMARY KEY,
+        partid integer NOT NULL REFERENCES spare_part (partid) ON DELETE CASCADE,
+        available integer NOT NULL,
+        min_quantity integer NOT NULL,
+        created_at timestamptz NOT NULL DEFAULT now(),
+        handled_at timestamptz
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS part_alert_open_key ON part_alert (partid) WHERE handled_at IS NULL;
+
+    CREATE OR REPLACE FUNCTION spare_part_low_stock() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO part_alert (partid, available, min_quantity)
+        VALUES (NEW.partid, NEW.quantity - NEW.reserved, NEW.min_quantity)
+        ON CONFLICT (partid) WHERE handled_at IS NULL DO NOTHING;
+        RETURN NULL;
+    END
+    $$;
+    -- Оповещение создается при переходе остатка через минимум, а не при
+    -- каждом изменении уже низкого остатка
+    DROP TRIGGER IF EXISTS spare_part_low_stock ON spare_part;
+    CREATE TRIGGER spare_part_low_stock
+        AFTER UPDATE OF quantity, reserved, min_quantity ON spare_part
+        FOR EACH ROW WHEN (NEW.quantity - NEW.reserved < NEW.min_quantity
+                           AND OLD.quantity - OLD.reserved >= OLD.min_quantity)
+        EXECUTE FUNCTION spare_part_low_stock();
+    DROP TRIGGER IF EXISTS spare_part_low_stock_insert ON spare_part;
+    CREATE TRIGGER spare_part_low_stock_insert
+        AFTER INSERT ON spare_part
+        FOR EACH ROW WHEN (NEW.quantity - NEW.reserved < NEW.min_quantity)
+        EXECUTE FUNCTION spare_part_low_stock();
+"""
+
+# Резерв: строка ремонта создается, только если доступного остатка
+# хватает; проверка и увеличение резерва - одна операция над строкой склада
+RESERVE_SQL = """
+    WITH part AS (
+        UPDATE spare_part SET reserved = reserved + %(quantity)s
+        WHERE partid = %(partid)s AND quantity - reserved >= %(quantity)s
+        RETURNING partid, unit_price
+    )
+    INSERT INTO repair_part (repairid, partid, quantity, unit_price)
+    SELECT %(repairid)s, partid, %(quantity)s, unit_price FROM part
+    RETURNING lineid
+"""
+
+RELEASE_LINE_SQL = """
+    WITH line AS (
+        UPDATE repair_part SET state = 'released'
+        WHERE lineid = %s AND state = 'reserved'
+        RETURNING partid, quantity
+    )
+    UPDATE spare_part p SET reserved = p.reserved - line.quantity
+    FROM line
+    WHERE p.partid = line.partid
+"""
+
+# Перед списанием или снятием резерва ремонта строки склада блокируются
+# в порядке partid: техники, одновременно закрывающие ремонты с общими
+# запчастями, ждут друг друга недолго и не попадают во взаимоблокировку
+LOCK_SQL = """
+    SELECT p.partid FROM spare_part p
+    WHERE p.partid IN (
+        SELECT partid FROM repair_part WHERE repairid = %s AND state = 'reserved'
+    )
+    ORDER BY p.partid
+    FOR UPDATE
+"""
+
+# Завершение ремонта списывает зарезервированное, отмена и удаление
+# снимают резерв. %(consume)s - списать (TRUE) или вернуть (FALSE)
+FINISH_SQL = """
+    WITH lines AS (
+        UPDATE repair_part
+        SET state = CASE WHEN %(consume)s THEN 'consumed' ELSE 'released' END
+        WHERE repairid = %(repairid)s AND state = 'reserved'
+        RETURNING partid, quantity
+    ), totals AS (
+        SELECT partid, sum(quantity) AS quantity FROM lines GROUP BY partid
+    )
+    UPDATE spare_part p SET
+        quantity = p.quantity - CASE WHEN %(consume)s THEN t.quantity ELSE 0 END,
+        reserved = p.reserved - t.quantity
+    FROM totals t
+    WHERE p.partid = t.partid
+"""
+
+# Пересчет стоимости ремонта по строкам; ничего не возвращает, если
+# сумма запчастей не изменилась
+ROLLUP_SQL = """
+    UPDATE repair r SET
+        repairprice = coalesce(r.repairprice, 0) - r.parts_cost + s.total,
+        parts_cost = s.total
+    FROM (
+        SELECT coalesce(sum(quantity * unit_price) FILTER (WHERE state <> 'released'), 0) AS total
+        FROM repair_part
+        WHERE repairid = %(repairid)s
+    ) s
+    WHERE r.repairid = %(repairid)s AND r.parts_cost IS DISTINCT FROM s.total
+    RETURNING r.repairprice
+"""
+
+LINES_SQL = """
+    SELECT l.lineid, p.name, l.quantity, l.unit_price, l.quantity * l.unit_price, l.state
+    FROM repair_part l
+    JOIN spare_part p ON p.partid = l.partid
+    WHERE l.repairid = %s AND l.state <> 'released'
+    ORDER BY l.lineid
+"""
+
+STOCK_SQL = """
+    SELECT partid, name, sku, unit_price, quantity, reserved, min_quantity
+    FROM spare_part
+    ORDER BY name
+"""
+
+# Необработанные оповещения забирает один обработчик: строки, уже
+# взятые другим, пропускаются без ожидания
+CLAIM_ALERTS_SQL = """
+    SELECT a.alertid, p.name, p.quantity - p.reserved, p.min_quantity, s.suppliername
+    FROM part_alert a
+    JOIN spare_part p ON p.partid = a.partid
+    LEFT JOIN supplier s ON s.supplierid = p.supplierid
+    WHERE a.handled_at IS NULL
+    ORDER BY a.created_at
+    LIMIT %s
+    FOR UPDATE OF a SKIP LOCKED
+"""
+
+# Статусы ремонта, после которых резерв списывается или снимается
+FINISHED_STATUSES = {'Завершён': True, 'Отменён': False}
+
+PartLine = namedtuple('PartLine', 'lineid name quantity unit_price amount state')
+StockRow = namedtuple('StockRow', 'partid name sku unit_price quantity reserved min_quantity')
+Alert = namedtuple('Alert', 'alertid name available min_quantity supplier')
+
+STATES = {'reserved': "Резерв", 'consumed': "Списано"}
+
+
+def ensure_schema(cursor):
+    """Создание склада запчастей, если его еще нет"""
+    archive.ensure_schema(cursor)
+    cursor.execute("SELECT to_regclass('spare_part') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        cursor.execute(SCHEMA_SQL)
+
+
+def finish_statements(repair_id, status):
+    """Запросы списания или снятия резерва при смене статуса ремонта
+    (для repairs.run); пустой список для незавершенных статусов"""
+    if status not in FINISHED_STATUSES:
+        return []
+    return [
+        (LOCK_SQL, (repair_id,)),
+        (FINISH_SQL, {'repairid': repair_id, 'consume': FINISHED_STATUSES[status]}),
+    ]
+
+
+def reserve(cursor, repair_id, part_id, quantity):
+    """Резерв запчасти под ремонт; код строки или None, если остатка не хватает"""
+    cursor.execute(RESERVE_SQL, {'repairid': repair_id, 'partid': part_id, 'quantity': quantity})
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def release_line(cursor, line_id):
+    cursor.execute(RELEASE_LINE_SQL, (line_id,))
+
+
+def rollup(cursor, repair_id):
+    """Пересчет стоимости ремонта; новая стоимость или None, если не изменилась"""
+    cursor.execute(ROLLUP_SQL, {'repairid': repair_id})
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def fetch_lines(cursor, repair_id):
+    cursor.execute(LINES_SQL, (repair_id,))
+    return list(map(PartLine._make, cursor.fetchall()))
+
+
+def fetch_stock(cursor):
+    cursor.execute(STOCK_SQL)
+    return list(map(StockRow._make, cursor.fetchall()))
+
+
+def claim_alerts(cursor, limit=100):
+    """Оповещения о заканчивающихся запчастях, отмечаемые обработанными.
+
+    Выполнять в транзакции: несколько обработчиков могут работать
+    одновременно и не получат одно оповещение дважды.
+    """
+    cursor.execute(CLAIM_ALERTS_SQL, (limit,))
+    alerts = list(map(Alert._make, cursor.fetchall()))
+    if alerts:
+        cursor.execute("UPDATE part_alert SET handled_at = now() WHERE alertid = ANY(%s)",
+                       ([alert.alertid for alert in alerts],))
+    return alerts
+
+
+def low_stock_count(cursor):
+    cursor.execute("SELECT count(*) FROM part_alert WHERE handled_at IS NULL")
+    return cursor.fetchone()[0]
+
+
+class PartsDialog(QDialog):
+    """Запчасти ремонта: резерв со склада, снятие резерва и стоимость.
+
+    Изменения сохраняются сразу, каждое своей короткой транзакцией через
+    основное соединение окна ремонтов; строка ремонта в окне получает
+    пересчитанную стоимость.
+    """
+
+    def __init__(self, window, row):
+        super().__init__(window)
+        self.owner = window
+        self.record = window.model.row(row)
+        self.setWindowTitle(f"Запчасти - ремонт №{self.record.repairid}")
+        self.resize(750, 500)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        layout.addWidget(QLabel(f"{self.record.equipment}, {self.record.status}"))
+
+        self.model = RecordTableModel(
+            ["ID", "Запчасть", "Количество", "Цена", "Сумма", "Состояние"],
+            formatters={3: format_money, 4: format_money, 5: lambda value: STATES.get(value, value)},
+            parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setColumnHidden(0, True)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        add_layout = QHBoxLayout()
+        self.part_combo = QComboBox()
+        self.quantity_input = QSpinBox()
+        self.quantity_input.setRange(1, 100000)
+        self.add_btn = QPushButton("Зарезервировать")
+        self.release_btn = QPushButton("Снять резерв")
+        for btn in [self.add_btn, self.release_btn]:
+            btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.add_btn.clicked.connect(self.add_part)
+        self.release_btn.clicked.connect(self.release_part)
+        add_layout.addWidget(self.part_combo, 1)
+        add_layout.addWidget(self.quantity_input)
+        add_layout.addWidget(self.add_btn)
+        add_layout.addWidget(self.release_btn)
+        layout.addLayout(add_layout)
+
+        self.total_label = QLabel()
+        layout.addWidget(self.total_label)
+
+        # Резерв возможен только у незавершенного ремонта
+        editable = self.record.status not in FINISHED_STATUSES
+        for widget in [self.part_combo, self.quantity_input, self.add_btn, self.release_btn]:
+            widget.setEnabled(editable)
+
+        self.load_data()
+
+    def load_data(self):
+        try:
+            cursor = self.owner.reads.cursor()
+            lines = fetch_lines(cursor, self.record.repairid)
+            stock = fetch_stock(cursor)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить запчасти:\n{str(e)}")
+            return
+        self.model.set_rows(lines)
+
+        current = self.part_combo.currentData()
+        self.part_combo.clear()
+        for part in stock:
+            available = part.quantity - part.reserved
+            low = " - заканчивается" if available < part.min_quantity else ""
+            self.part_combo.addItem(f"{part.name} ({format_money(part.unit_price)}, доступно {available}{low})",
+                                    part.partid)
+        if current is not None:
+            self.part_combo.setCurrentIndex(max(self.part_combo.findData(current), 0))
+
+        parts_cost = sum((line.amount for line in lines), Decimal(0))
+        price = self.record.repairprice or Decimal(0)
+        self.total_label.setText(
+            f"Работы: {format_money(price - parts_cost)}   Запчасти: {format_money(parts_cost)}   "
+            f"Итого: {format_money(price)}")
+
+    def save(self, action):
+        """Изменение строк и пересчет стоимости одной транзакцией; результат action"""
+        cursor = self.owner.cursor
+        try:
+            cursor.execute("BEGIN")
+            result = action(cursor)
+            price = rollup(cursor, self.record.repairid)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        self.owner.reads.wrote()
+        if price is not None:
+            self.record = self.record._replace(repairprice=price)
+            # Строка ищется по ключу заново: после прошлого сохранения она могла
+            # переехать при сортировке по стоимости или скрыться фильтром
+            row = self.owner.model.find(self.record.repairid)
+            if row is not None:
+                self.owner.model.update_row(row, self.record)
+        return result
+
+    def add_part(self):
+        part_id = self.part_combo.currentData()
+        if part_id is None:
+            return
+        quantity = self.quantity_input.value()
+        try:
+            line_id = self.save(lambda cursor: reserve(cursor, self.record.repairid, part_id, quantity))
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось зарезервировать запчасть:\n{str(e)}")
+            return
+        if line_id is None:
+            QMessageBox.warning(self, "Недостаточно запчастей",
+                                f"На складе нет {quantity} шт. свободного остатка")
+        self.load_data()
+
+    def release_part(self):
+        index = self.table.currentIndex()
+        if not index.isValid():
+            QMessageBox.warning(self, "Ошибка", "Выберите запчасть")
+            return
+        line = self.model.row(index.row())
+        if line.state != 'reserved':
+            QMessageBox.warning(self, "Ошибка", "Списанную запчасть вернуть нельзя")
+            return
+        try:
+            self.save(lambda cursor: release_line(cursor, line.lineid))
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось снять резерв:\n{str(e)}")
+            return
+        self.load_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Склад запчастей")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = sub.add_parser('add', help="Новая запчасть")
+    add_parser.add_argument('name')
+    add_parser.add_argument('--sku')
+    add_parser.add_argument('--price', type=Decimal, default=Decimal(0))
+    add_parser.add_argument('--quantity', type=int, default=0)
+    add_parser.add_argument('--min', type=int, default=0, help="Неснижаемый остаток")
+    add_parser.add_argument('--supplier', type=int, help="Код поставщика")
+
+    receive_parser = sub.add_parser('receive', help="Поступление на склад")
+    receive_parser.add_argument('partid', type=int)
+    receive_parser.add_argument('quantity', type=int)
+
+    sub.add_parser('stock', help="Остатки")
+
+    alerts_parser = sub.add_parser('alerts', help="Обработка оповещений о заканчивающихся запчастях")
+    alerts_parser.add_argument('--limit', type=int, default=100)
+
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        with conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'add':
+                cursor.execute("""
+                    INSERT INTO spare_part (name, sku, unit_price, quantity, min_quantity, supplierid)
+                    VALUES (%s, %s, %s, %s, %s, %s) RETURNING partid
+                """, (args.name, args.sku, args.price, args.quantity, args.min, args.supplier))
+                print(f"Запчасть {cursor.fetchone()[0]} добавлена")
+            elif args.command == 'receive':
+                cursor.execute("UPDATE spare_part SET quantity = quantity + %s WHERE partid = %s",
+                               (args.quantity, args.partid))
+                print("Остаток обновлен" if cursor.rowcount else "Запчасть не найдена")
+            elif args.command == 'stock':
+                for part in fetch_stock(cursor):
+                    available = part.quantity - part.reserved
+                    mark = "  заканчивается" if available < part.min_quantity else ""
+                    print(f"{part.partid:>6}  {part.name:<40}{part.quantity:>8}{part.reserved:>8}"
+                          f"{available:>8}{mark}")
+            elif args.command == 'alerts':
+                for alert in claim_alerts(cursor, args.limit):
+                    if alert.available >= alert.min_quantity:
+                        continue  # Склад уже пополнен
+                    supplier = f", поставщик: {alert.supplier}" if alert.supplier else ""
+                    print(f"Заканчивается {alert.name}: доступно {alert.available}, "
+                          f"минимум {alert.min_quantity}{supplier}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+import argparse
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+import archive
+import database
+import locations
+from table_model import RecordTableModel, format_date
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableView,
+    QCheckBox, QHeaderView, QMessageBox
+)
+from PyQt6.QtCore import Qt
+
+
+# План ТО задает интервал в днях, в моточасах или оба (что наступит
+# раньше). Моточасы берутся из показаний счетчика, срок по моточасам
+# прогнозируется по средней наработке за последние RATE_DAYS дней.
+# Заказ на ТО - обычный ремонт со статусом «Запланирован», связанный
+# с планом; завершенный заказ переносит следующий срок, а после отмены
+# срок остается прежним и планировщик создает новый заказ.
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS maintenance_plan (
+        planid serial PRIMARY KEY,
+        equipmentid integer NOT NULL REFERENCES equipment (equipmentid) ON DELETE CASCADE,
+        title text NOT NULL,
+        interval_days integer CHECK (interval_days > 0),
+        interval_hours numeric(10, 1) CHECK (interval_hours > 0),
+        cost numeric(12, 2) NOT NULL DEFAULT 0,
+        last_done date NOT NULL DEFAULT current_date,
+        last_done_hours numeric(12, 1) NOT NULL DEFAULT 0,
+        next_due date,
+        active boolean NOT NULL DEFAULT true,
+        CHECK (interval_days IS NOT NULL OR interval_hours IS NOT NULL)
+    );
+    CREATE INDEX IF NOT EXISTS maintenance_plan_due_idx ON maintenance_plan (next_due) WHERE active;
+    CREATE INDEX IF NOT EXISTS maintenance_plan_equipment_idx ON maintenance_plan (equipmentid);
+
+    CREATE TABLE IF NOT EXISTS equipment_meter (
+        equipmentid integer NOT NULL REFERENCES equipment (equipmentid) ON DELETE CASCADE,
+        read_at date NOT NULL,
+        hours numeric(12, 1) NOT NULL CHECK (hours >= 0),
+        PRIMARY KEY (equipmentid, read_at)
+    );
+
+    ALTER TABLE repair ADD COLUMN IF NOT EXISTS planid integer;
+
+    INSERT INTO repairstatus (statusname)
+    SELECT 'Запланирован'
+    WHERE NOT EXISTS (SELECT 1 FROM repairstatus WHERE statusname = 'Запланирован');
+"""
+
+# Заказы по плану; индекс строится migrate.py без блокировки записи
+INDEXES = [
+    ('repair_planid_idx', 'repair', "(planid, repairdate) WHERE planid IS NOT NULL"),
+]
+
+# Наработка за этот период дает среднюю скорость для прогноза срока
+RATE_DAYS = 90
+# Заказы создаются на работы со сроком не позже чем через HORIZON_DAYS
+HORIZON_DAYS = 7
+# Завершенные заказы ищутся среди ремонтов за последний год
+COMPLETION_LOOKBACK_DAYS = 366
+# Один проход планировщика за раз (ночной запуск и кнопка в календаре)
+LOCK_KEY = 46046
+
+# Заказы по плану, которые еще не выполнены
+OPEN_STATUSES = ('Запланирован', 'В процессе')
+
+# Завершенный заказ переносит начало следующего интервала на дату окончания
+# работ (finished_at из downtime.py, без отметки - дата заказа). Отмененный
+# заказ работу не выполнил: план остается просроченным, и следующий проход
+# создает по нему новый заказ.
+COMPLETE_SQL = """
+    UPDATE maintenance_plan p SET
+        last_done = c.done,
+        last_done_hours = coalesce((
+            SELECT m.hours FROM equipment_meter m
+            WHERE m.equipmentid = p.equipmentid AND m.read_at <= c.done
+            ORDER BY m.read_at DESC LIMIT 1
+        ), p.last_done_hours)
+    FROM (
+        SELECT r.planid, max(coalesce(r.finished_at::date, r.repairdate)) AS done
+        FROM repair r
+        JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+        WHERE r.planid IS NOT NULL AND r.deleted_at IS NULL
+          AND r.repairdate >= %(since)s
+          AND rs.statusname = 'Завершён'
+        GROUP BY r.planid
+    ) c
+    WHERE c.planid = p.planid AND c.done > p.last_done
+"""
+
+# Срок всех активных планов одним запросом: по дням от последнего
+# выполнения и по моточасам от последнего показания счетчика
+DUE_SQL = """
+    WITH meter AS (
+        SELECT equipmentid, max(read_at) AS read_at, max(hours) AS hours,
+               (max(hours) - min(hours)) / nullif(max(read_at) - min(read_at), 0) AS rate
+        FROM equipment_meter
+        WHERE read_at > %(today)s::date - %(rate_days)s
+        GROUP BY equipmentid
+    )
+    UPDATE maintenance_plan p SET next_due = d.due
+    FROM (
+        SELECT p.planid,
+               least(
+                   p.last_done + p.interval_days,
+                   CASE
+                       WHEN p.interval_hours IS NULL OR m.hours IS NULL THEN NULL
+                       WHEN m.hours >= p.last_done_hours + p.interval_hours THEN m.read_at
+                       WHEN m.rate > 0 THEN m.read_at
+                           + ceil((p.last_done_hours + p.interval_hours - m.hours) / m.rate)::integer
+                   END) AS due
+        FROM maintenance_plan p
+        LEFT JOIN meter m ON m.equipmentid = p.equipmentid
+        WHERE p.active
+    ) d
+    WHERE p.planid = d.planid AND p.next_due IS DISTINCT FROM d.due
+"""
+
+# Заказы на все подошедшие работы одним INSERT ... SELECT; по плану
+# не бывает двух невыполненных заказов
+GENERATE_SQL = """
+    INSERT INTO repair (equipmentid, repairdate, repairprice, repairstatusid, planid)
+    SELECT p.equipmentid, p.next_due, p.cost,
+           (SELECT repairstatusid FROM repairstatus WHERE statusname = 'Запланирован'),
+           p.planid
+    FROM maintenance_plan p
+    JOIN equipment e ON e.equipmentid = p.equipmentid AND e.deleted_at IS NULL
+    WHERE p.active AND p.next_due <= %(until)s
+      AND NOT EXISTS (SELECT 1 FROM writeoffact w WHERE w.equipmentid = p.equipmentid)
+      AND NOT EXISTS (
+          SELECT 1 FROM repair r
+          JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+          WHERE r.planid = p.planid AND r.deleted_at IS NULL
+            AND rs.statusname = ANY(%(open)s)
+      )
+    ORDER BY p.next_due, p.planid
+"""
+
+# Работы недели для календаря; {where} - участок
+WEEK_SQL = """
+    SELECT p.planid, p.next_due, e.name, p.title, p.interval_days, p.interval_hours,
+           o.repairid, o.statusname
+    FROM maintenance_plan p
+    JOIN equipment e ON e.equipmentid = p.equipmentid
+    LEFT JOIN LATERAL (
+        SELECT r.repairid, rs.statusname
+        FROM repair r
+        JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+        WHERE r.planid = p.planid AND r.deleted_at IS NULL
+          AND rs.statusname = ANY(%s)
+        ORDER BY r.repairdate DESC
+        LIMIT 1
+    ) o ON TRUE
+    WHERE p.active AND e.deleted_at IS NULL
+      AND p.next_due >= %s AND p.next_due < %s {where}
+    ORDER BY p.next_due, e.name, p.planid
+"""
+
+# Строка календаря ТО
+DueRow = namedtuple('DueRow', 'planid next_due equipment title interval_days interval_hours repairid status')
+
+# Итог прохода планировщика
+RunResult = namedtuple('RunResult', 'completed rescheduled generated')
+
+
+def ensure_schema(cursor):
+    """Создание таблиц планов ТО, если их еще нет"""
+    archive.ensure_schema(cursor)
+    cursor.execute("SELECT to_regclass('maintenance_plan') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        cursor.execute(SCHEMA_SQL)
+
+
+def week_start(day):
+    """Понедельник недели, в которую попадает день"""
+    return day - timedelta(days=day.weekday())
+
+
+def run(cursor, today=None, until=None):
+    """Проход планировщика по всему парку: учет выполненных заказов,
+    пересчет сроков и создание заказов на работы со сроком до until
+    (по умолчанию на HORIZON_DAYS вперед). Каждый шаг - один запрос по
+    всем планам. Выполняется в транзакции вызывающего кода.
+    """
+    today = today or date.today()
+    until = until or today + timedelta(days=HORIZON_DAYS)
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+    cursor.execute(COMPLETE_SQL, {'since': today - timedelta(days=COMPLETION_LOOKBACK_DAYS)})
+    completed = cursor.rowcount
+    cursor.execute(DUE_SQL, {'today': today, 'rate_days': RATE_DAYS})
+    rescheduled = cursor.rowcount
+    cursor.execute(GENERATE_SQL, {'until': until, 'open': list(OPEN_STATUSES)})
+    return RunResult(completed, rescheduled, cursor.rowcount)
+
+
+def fetch_week(cursor, start, path=None, overdue=False):
+    """Работы недели, начинающейся с start; overdue - вместе с просроченными"""
+    where, params = locations.scope_filter("p.equipmentid", path)
+    lower = date.min if overdue else start
+    cursor.execute(WEEK_SQL.format(where=where),
+                   (list(OPEN_STATUSES), lower, start + timedelta(days=7)) + params)
+    return list(map(DueRow._make, cursor.fetchall()))
+
+
+def add_plan(cursor, equipmentid, title, interval_days=None, interval_hours=None, cost=0, last_done=None):
+    """Новый план ТО; отсчет моточасов - от последнего показания счетчика"""
+    cursor.execute("""
+        INSERT INTO maintenance_plan
+            (equipmentid, title, interval_days, interval_hours, cost, last_done, last_done_hours)
+        VALUES (%s, %s, %s, %s, %s, coalesce(%s, current_date), coalesce((
+            SELECT hours FROM equipment_meter WHERE equipmentid = %s ORDER BY read_at DESC LIMIT 1
+        ), 0))
+        RETURNING planid
+    """, (equipmentid, title, interval_days, interval_hours, cost, last_done, equipmentid))
+    return cursor.fetchone()[0]
+
+
+def record_meter(cursor, equipmentid, hours, read_at=None):
+    """Показание счетчика моточасов (повторное за день заменяет прежнее)"""
+    cursor.execute("""
+        INSERT INTO equipment_meter (equipmentid, read_at, hours)
+        VALUES (%s, coalesce(%s, current_date), %s)
+        ON CONFLICT (equipmentid, read_at) DO UPDATE SET hours = EXCLUDED.hours
+    """, (equipmentid, read_at, hours))
+
+
+def describe_interval(days, hours):
+    parts = []
+    if days is not None:
+        parts.append(f"{days} дн.")
+    if hours is not None:
+        parts.append(f"{hours:g} моточасов")
+    return " / ".join(parts)
+
+
+class CalendarDialog(QDialog):
+    """Календарь ТО по неделям для окна ремонтов.
+
+    Читает через маршрутизатор чтения окна, заказы создает через
+    основное соединение окна.
+    """
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.owner = window
+        self.start = week_start(date.today())
+        self.setWindowTitle("Календарь ТО")
+        self.resize(900, 600)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        nav_layout = QHBoxLayout()
+        self.prev_btn = QPushButton("← Предыдущая неделя")
+        self.today_btn = QPushButton("Текущая неделя")
+        self.next_btn = QPushButton("Следующая неделя →")
+        self.generate_btn = QPushButton("Создать заказы")
+        for btn in [self.prev_btn, self.today_btn, self.next_btn, self.generate_btn]:
+            btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.prev_btn.clicked.connect(lambda: self.show_week(self.start - timedelta(days=7)))
+        self.next_btn.clicked.connect(lambda: self.show_week(self.start + timedelta(days=7)))
+        self.today_btn.clicked.connect(lambda: self.show_week(week_start(date.today())))
+        self.generate_btn.clicked.connect(self.generate)
+
+        self.week_label = QLabel()
+        self.overdue_check = QCheckBox("С просроченными")
+        self.overdue_check.toggled.connect(lambda checked: self.show_week(self.start))
+
+        nav_layout.addWidget(self.prev_btn)
+        nav_layout.addWidget(self.today_btn)
+        nav_layout.addWidget(self.next_btn)
+        nav_layout.addWidget(self.week_label)
+        nav_layout.addStretch()
+        nav_layout.addWidget(self.overdue_check)
+        nav_layout.addWidget(self.generate_btn)
+        layout.addLayout(nav_layout)
+
+        self.model = RecordTableModel(
+            ["ID", "Срок", "Оборудование", "Работа", "Интервал", "Заказ"],
+            formatters={1: format_date},
+            key_types={0: 'int', 1: 'date', 2: 'text', 3: 'text'},
+            parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setColumnHidden(0, True)
+        header = self.table.horizontalHeader()
+        for col_idx in range(1, 6):
+            header.setSectionResizeMode(col_idx, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        self.show_week(self.start)
+
+    def show_week(self, start):
+        self.start = start
+        end = start + timedelta(days=6)
+        self.week_label.setText(f"{start:%d.%m.%Y} - {end:%d.%m.%Y}")
+        try:
+            rows = fetch_week(self.owner.reads.cursor(), start, self.owner.scope_combo.path(),
+                              self.overdue_check.isChecked())
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить календарь ТО:\n{str(e)}")
+            return
+        today = date.today()
+        self.model.set_rows(
+            (row.planid, row.next_due, row.equipment, row.title,
+             describe_interval(row.interval_days, row.interval_hours),
+             f"№{row.repairid} ({row.status})" if row.repairid is not None
+             else "Просрочено" if row.next_due < today else "")
+            for row in rows)
+
+    def generate(self):
+        """Заказы на все работы до конца показанной недели"""
+        until = max(self.start + timedelta(days=6), date.today())
+        cursor = self.owner.cursor
+        try:
+            cursor.execute("BEGIN")
+            result = run(cursor, until=until)
+            cursor.execute("COMMIT")
+        except Exception as e:
+            cursor.execute("ROLLBACK")
+            QMessageBox.critical(self, "Ошибка", f"Не удалось создать заказы:\n{str(e)}")
+            return
+        self.owner.reads.wrote()
+        QMessageBox.information(self, "Календарь ТО", f"Создано заказов: {result.generated}")
+        self.show_week(self.start)
+
+
+def benchmark(cursor, plans):
+    """Проход планировщика по plans синтетическим планам (изменения откатываются)"""
+    cursor.execute("""
+        INSERT INTO maintenance_plan (equipmentid, title, interval_days, interval_hours, last_done)
+        SELECT eq.ids[1 + g %% cardinality(eq.ids)], 'Проверка ' || g,
+               CASE WHEN g %% 3 <> 0 THEN 30 + g %% 335 END,
+               CASE WHEN g %% 3 <> 1 THEN 250 + g %% 750 END,
+               current_date - g %% 400
+        FROM (
+            SELECT array_agg(equipmentid ORDER BY equipmentid) AS ids
+            FROM equipment WHERE deleted_at IS NULL
+        ) eq, generate_series(1, %s) AS g
+        WHERE eq.ids IS NOT NULL
+    """, (plans,))
+    cursor.execute("""
+        INSERT INTO equipment_meter (equipmentid, read_at, hours)
+        SELECT equipmentid, current_date - d, 5000 - d * 8
+        FROM equipment, generate_series(0, 60, 30) AS d
+        WHERE deleted_at IS NULL
+        ON CONFLICT DO NOTHING
+    """)
+    started = time.perf_counter()
+    result = run(cursor)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Планово-предупредительное ТО")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help="Проход планировщика (ночной запуск)")
+    run_parser.add_argument('--horizon', type=int, default=HORIZON_DAYS,
+                            help="Создавать заказы на работы на столько дней вперед")
+
+    plan_parser = sub.add_parser('plan', help="Новый план ТО оборудования")
+    plan_parser.add_argument('equipmentid', type=int)
+    plan_parser.add_argument('title')
+    plan_parser.add_argument('--days', type=int, help="Интервал в днях")
+    plan_parser.add_argument('--hours', type=float, help="Интервал в моточасах")
+    plan_parser.add_argument('--cost', type=float, default=0, help="Плановая стоимость работы")
+    plan_parser.add_argument('--last-done', type=date.fromisoformat, help="Дата последнего выполнения")
+
+    disable_parser = sub.add_parser('disable', help="Отключение плана ТО")
+    disable_parser.add_argument('planid', type=int)
+
+    meter_parser = sub.add_parser('meter', help="Показание счетчика моточасов")
+    meter_parser.add_argument('equipmentid', type=int)
+    meter_parser.add_argument('hours', type=float)
+    meter_parser.add_argument('--date', type=date.fromisoformat)
+
+    week_parser = sub.add_parser('week', help="Работы недели")
+    week_parser.add_argument('--date', type=date.fromisoformat, default=date.today())
+    week_parser.add_argument('--overdue', action='store_true', help="Вместе с просроченными")
+
+    bench_parser = sub.add_parser('bench', help="Время прохода планировщика на синтетических планах")
+    bench_parser.add_argument('--plans', type=int, default=100000)
+
+    args = parser.parse_args()
+
+    if args.command == 'plan' and args.days is None and args.hours is None:
+        parser.error("укажите --days и/или --hours")
+
+    conn = database.connect()
+    try:
+        with conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'run':
+                started = time.perf_counter()
+                result = run(cursor, until=date.today() + timedelta(days=args.horizon))
+                print(f"Выполнено работ: {result.completed}, пересчитано сроков: {result.rescheduled}, "
+                      f"создано заказов: {result.generated} "
+                      f"({(time.perf_counter() - started) * 1000:.0f} мс)")
+            elif args.command == 'plan':
+                planid = add_plan(cursor, args.equipmentid, args.title, args.days, args.hours,
+                                  args.cost, args.last_done)
+                print(f"План ТО {planid} добавлен")
+            elif args.command == 'disable':
+                cursor.execute("UPDATE maintenance_plan SET active = false WHERE planid = %s", (args.planid,))
+                print("План ТО отключен" if cursor.rowcount else "План ТО не найден")
+            elif args.command == 'meter':
+                record_meter(cursor, args.equipmentid, args.hours, args.date)
+            elif args.command == 'week':
+                for row in fetch_week(cursor, week_start(args.date), overdue=args.overdue):
+                    order = f"№{row.repairid} ({row.status})" if row.repairid is not None else ""
+                    print(f"{format_date(row.next_due)}  {row.equipment}  {row.title}  "
+                          f"{describe_interval(row.interval_days, row.interval_hours)}  {order}")
+            elif args.command == 'bench':
+                result, elapsed = benchmark(cursor, args.plans)
+                print(f"Планов: {args.plans}, пересчитано сроков: {result.rescheduled}, "
+                      f"создано заказов: {result.generated}, {elapsed:.2f} с")
+                conn.rollback()
+                return
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import argparse
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtWidgets import QApplication
+
+import database
+
+
+# Отслеживаемые таблицы: первичный ключ и столбец с кодом оборудования,
+# по которому окна находят зависящие от изменения строки
+TABLES = {
+    'equipment': ('equipmentid', 'equipmentid'),
+    'repair': ('repairid', 'equipmentid'),
+    'writeoffact': ('writeoffactid', 'equipmentid'),
+    'acceptancecertificate': ('acceptancecertificateid', 'equipmentid'),
+    'supplier': ('supplierid', None),
+    'equipment_score': ('equipmentid', 'equipmentid'),
+}
+
+# Журнал измененных строк с номером транзакции, которая их изменила.
+# Версия для клиента - снимок транзакций (pg_snapshot): изменения после
+# версии - строки журнала, невидимые в ее снимке и видимые в текущем, поэтому
+# порядок фиксации транзакций учитывается точно, а общих строк-счетчиков,
+# которые сериализовали бы пишущие транзакции, нет. Триггеры уровня
+# оператора берут строки из переходных таблиц и ничего не пишут, если
+# оператор не изменил ни одной строки. Очистка журнала запоминает номер
+# последней удаленной транзакции: клиенты со снимком старше него
+# перечитывают данные полностью.
+SCHEMA_SQL = """
+    -- Журнал прежнего формата (со счетчиками версий) пересоздается
+    DROP TABLE IF EXISTS data_version;
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'data_change' AND column_name = 'version'
+        ) THEN
+            DROP TABLE data_change;
+        END IF;
+    END
+    $$;
+
+    CREATE TABLE IF NOT EXISTS data_change (
+        table_name text NOT NULL,
+        xid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+        row_id bigint NOT NULL,
+        equipmentid integer,
+        changed_at timestamptz NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS data_change_xid_idx ON data_change (xid, table_name);
+    CREATE INDEX IF NOT EXISTS data_change_changed_at_brin
+        ON data_change USING BRIN (changed_at);
+    CREATE TABLE IF NOT EXISTS data_change_pruned (
+        id boolean PRIMARY KEY DEFAULT true CHECK (id),
+        xid xid8 NOT NULL
+    );
+
+    CREATE OR REPLACE FUNCTION data_change_capture() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO data_change (table_name, row_id, equipmentid)
+            SELECT TG_ARGV[0], (to_jsonb(n) ->> TG_ARGV[1])::bigint,
+                   (to_jsonb(n) ->> TG_ARGV[2])::integer
+            FROM new_rows n;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO data_change (table_name, row_id, equipmentid)
+            SELECT TG_ARGV[0], (to_jsonb(o) ->> TG_ARGV[1])::bigint,
+                   (to_jsonb(o) ->> TG_ARGV[2])::integer
+            FROM old_rows o;
+        ELSIF EXISTS (SELECT 1 FROM new_rows) THEN
+            -- Старые значения нужны, если строка перешла к другому оборудованию
+            INSERT INTO data_change (table_name, row_id, equipmentid)
+            SELECT TG_ARGV[0], (to_jsonb(o) ->> TG_ARGV[1])::bigint,
+                   (to_jsonb(o) ->> TG_ARGV[2])::integer
+            FROM old_rows o
+            UNION
+            SELECT TG_ARGV[0], (to_jsonb(n) ->> TG_ARGV[1])::bigint,
+                   (to_jsonb(n) ->> TG_ARGV[2])::integer
+            FROM new_rows n;
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+"""
+
+# Строки журнала, зафиксированные после снимка since и видимые в снимке until
+CHANGES_SQL = """
+    SELECT table_name, row_id, equipmentid FROM data_change
+    WHERE xid >= pg_snapshot_xmin(%(since)s::pg_snapshot)
+      AND NOT pg_visible_in_snapshot(xid, %(since)s::pg_snapshot)
+      AND pg_visible_in_snapshot(xid, %(until)s::pg_snapshot)
+      AND table_name = ANY(%(tables)s)
+"""
+
+# Интервалы опроса, мс: после изменений опрос частый, в простое реже
+MIN_INTERVAL = 2000
+MAX_INTERVAL = 60000
+BACKOFF = 1.5
+
+# Измененные строки таблицы: их ключи и коды затронутого оборудования
+Changes = namedtuple('Changes', 'keys equipment')
+NO_CHANGES = Changes(frozenset(), frozenset())
+
+
+def install_trigger(cursor, table):
+    """Подключение триггеров учета изменений к таблице"""
+    pk, equipment = TABLES[table]
+    args = f"'{table}', '{pk}', '{equipment or ''}'"
+    for event, referencing in [('INSERT', "NEW TABLE AS new_rows"),
+                               ('UPDATE', "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                               ('DELETE', "OLD TABLE AS old_rows")]:
+        name = f"data_change_{event.lower()}"
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        cursor.execute(
+            f"CREATE TRIGGER {name} AFTER {event} ON {table} REFERENCING {referencing} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION data_change_capture({args})")
+
+
+def is_installed(cursor):
+    cursor.execute("SELECT to_regclass('data_change_pruned') IS NOT NULL")
+    return cursor.fetchone()[0]
+
+
+def ensure_schema(cursor):
+    """Создание журнала и триггеров на существующих таблицах, где их еще нет"""
+    if not is_installed(cursor):
+        cursor.execute(SCHEMA_SQL)
+    for table in database.missing_triggers(cursor, TABLES, 'data_change_update'):
+        install_trigger(cursor, table)
+
+
+def current_version(cursor):
+    """Версия данных для учета изменений - текущий снимок транзакций"""
+    cursor.execute("SELECT pg_current_snapshot()::text")
+    return cursor.fetchone()[0]
+
+
+def fetch_changes(cursor, tables, since, until):
+    """Изменения таблиц между версиями since и until: {таблица: Changes}.
+
+    В результате только таблицы с изменениями. Если since нет (None) или
+    журнал после него уже очищен, все таблицы - None: данные нужно
+    перечитать полностью.
+    """
+    if since is None:
+        return dict.fromkeys(tables)
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM data_change_pruned WHERE xid >= pg_snapshot_xmin(%s::pg_snapshot))",
+        (since,))
+    if cursor.fetchone()[0]:
+        return dict.fromkeys(tables)
+    cursor.execute(CHANGES_SQL, {'since': since, 'until': until, 'tables': list(tables)})
+    rows = {}
+    for table, row_id, equipment in cursor.fetchall():
+        keys, equipment_ids = rows.setdefault(table, (set(), set()))
+        keys.add(row_id)
+        if equipment is not None:
+            equipment_ids.add(equipment)
+    return {table: Changes(keys, equipment_ids) for table, (keys, equipment_ids) in rows.items()}
+
+
+def changed_equipment(cursor, tables, since, until):
+    """Коды оборудования, затронутого изменениями; None - нужен полный пересчет"""
+    changes = fetch_changes(cursor, tables, since, until)
+    if None in changes.values():
+        return None
+    result = set()
+    for table_changes in changes.values():
+        result |= table_changes.equipment
+    return result
+
+
+def prune(cursor, before):
+    """Удаление записей об изменениях старше before.
+
+    Клиенты, отставшие дальше очищенных записей, перечитывают данные полностью.
+    """
+    cursor.execute("""
+        WITH removed AS (
+            DELETE FROM data_change WHERE changed_at < %s
+            RETURNING xid
+        )
+        INSERT INTO data_change_pruned AS p (xid)
+        SELECT max(xid) FROM removed HAVING count(*) > 0
+        ON CONFLICT (id) DO UPDATE SET xid = greatest(p.xid, EXCLUDED.xid)
+    """, (before,))
+    return cursor.rowcount
+
+
+class AutoRefresh(QObject):
+    """Фоновое автообновление окна по таймеру.
+
+    Опрос - один запрос к журналу по индексу номеров транзакций: строки,
+    измененные после версии прошлого опроса, передаются окну
+    в apply_changes({таблица: Changes или None}). None означает, что журнал
+    изменений уже очищен и окно должно перечитать данные полностью.
+    Если применить изменения не удалось, они запрашиваются повторно.
+    Запросы идут через маршрутизатор чтения окна (window.reads, replicas.py).
+
+    Интервал опроса сбрасывается до минимального после любых изменений в
+    модели (своих или найденных опросом) и растет в простое. Пока открыт
+    модальный диалог или окно свернуто, опрос откладывается: диалоги
+    редактирования держат номер строки модели.
+    """
+
+    def __init__(self, window, tables, apply_changes, model=None,
+                 min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        super().__init__(window)
+        self.window = window
+        self.tables = tuple(tables)
+        self.apply_changes = apply_changes
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.enabled = True
+        self.version = None
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.poll)
+
+        if model is not None:
+            model.rowsInserted.connect(self.activity)
+            model.rowsRemoved.connect(self.activity)
+            model.dataChanged.connect(self.activity)
+
+    def sync(self, cursor):
+        """Запоминание версии перед полной загрузкой данных окна"""
+        self.version = current_version(cursor)
+        self.activity()
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self.activity()
+        else:
+            self.timer.stop()
+
+    def activity(self, *args):
+        """Ускорение опроса после изменений"""
+        self.interval = self.min_interval
+        if self.enabled and self.version is not None:
+            if not self.timer.isActive() or self.timer.remainingTime() > self.interval:
+                self.timer.start(self.interval)
+
+    def poll(self):
+        if not self.enabled or self.version is None:
+            return
+        window = self.window
+        if (window.isMinimized() or not window.isVisible()
+                or QApplication.activeModalWidget() is not None):
+            self.timer.start(self.interval)
+            return
+
+        # Опрос - чтение: идет на реплику, если окно ее использует
+        cursor = window.reads.cursor()
+        conn = cursor.connection
+        previous = self.version
+        try:
+            current = current_version(cursor)
+            changes = fetch_changes(cursor, self.tables, self.version, current)
+            if not conn.autocommit:
+                conn.commit()
+
+            # Версия запоминается до применения: полная перезагрузка окна
+            # сама запишет более свежую
+            self.version = current
+            if changes:
+                self.apply_changes(changes)
+                if not conn.autocommit:
+                    conn.commit()
+        except Exception as e:
+            # Изменения будут запрошены повторно при следующем опросе
+            print(f"Ошибка автообновления: {e}")
+            self.version = previous
+            if not conn.closed and not conn.autocommit:
+                conn.rollback()
+            self.interval = self.max_interval
+            self.timer.start(self.interval)
+            return
+
+        if changes:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(int(self.interval * BACKOFF), self.max_interval)
+        if self.enabled:
+            self.timer.start(self.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Учет изменений для автообновления окон")
+    sub = parser.add_subparsers(dest='command', required=True)
+    prune_parser = sub.add_parser('prune', help="Очистить старые записи об изменениях")
+    prune_parser.add_argument('--older-than-hours', type=int, default=24)
+    args = parser.parse_args()
+
+    conn = database.connect()
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            if args.command == 'prune':
+                before = datetime.now().astimezone() - timedelta(hours=args.older_than_hours)
+                print(f"Очищено таблиц: {prune(cursor, before)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import time
+from datetime import date
+from decimal import Decimal
+
+import archive
+import database
+import parts
+
+
+# Сохранение ремонта - несколько зависимых запросов. Код статуса ищется
+# подзапросом, а статус оборудования пересчитывается одним UPDATE по
+# текущим ремонтам, поэтому ни один запрос не ждет результата предыдущего
+# на клиенте. С psycopg 3 все запросы сохранения отправляются одним
+# конвейером (один обмен с сервером) как подготовленные запросы, с psycopg2 -
+# по очереди.
+INSERT_SQL = """
+    INSERT INTO repair (equipmentid, repairdate, repairprice, repairstatusid)
+    VALUES (%s, %s, %s, (SELECT repairstatusid FROM repairstatus WHERE statusname = %s))
+    RETURNING repairid
+"""
+
+UPDATE_SQL = """
+    UPDATE repair SET
+        equipmentid = %s,
+        repairdate = %s,
+        repairprice = %s,
+        repairstatusid = (SELECT repairstatusid FROM repairstatus WHERE statusname = %s)
+    WHERE repairid = %s
+"""
+
+# Статус оборудования по незавершенным ремонтам; строки без изменения
+# статуса не обновляются, чтобы не давать лишних записей в журналах
+EQUIPMENT_STATUS_SQL = """
+    UPDATE equipment e SET status = s.status
+    FROM (
+        SELECT x.equipmentid,
+               CASE WHEN EXISTS (
+                   SELECT 1 FROM repair r
+                   JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+                   WHERE r.equipmentid = x.equipmentid AND rs.statusname = 'В процессе'
+                     AND r.deleted_at IS NULL
+               ) THEN 'На ремонте' ELSE 'Исправен' END AS status
+        FROM unnest(%s::integer[]) AS x (equipmentid)
+    ) s
+    WHERE e.equipmentid = s.equipmentid AND e.status IS DISTINCT FROM s.status
+"""
+
+
+def run(conn, statements):
+    """Выполнение запросов сохранения [(sql, параметры)] одной транзакцией.
+
+    Возвращает первые строки результатов (None для запросов без результата).
+    """
+    if database.is_pipelined(conn):
+        cursors = []
+        with conn.pipeline(), conn.transaction():
+            for sql, params in statements:
+                cursor = conn.cursor()
+                cursor.execute(sql, params, prepare=True)
+                cursors.append(cursor)
+        return [cursor.fetchone() if cursor.description else None for cursor in cursors]
+
+    # В режиме autocommit транзакция открывается явно, иначе запросы
+    # выполняются в транзакции вызывающего кода
+    own = conn.autocommit
+    results = []
+    with conn.cursor() as cursor:
+        if own:
+            cursor.execute("BEGIN")
+        try:
+            for sql, params in statements:
+                cursor.execute(sql, params)
+                results.append(cursor.fetchone() if cursor.description else None)
+        except Exception:
+            if own:
+                cursor.execute("ROLLBACK")
+            raise
+        if own:
+            cursor.execute("COMMIT")
+    return results
+
+
+def add(conn, equipment_id, repair_date, price, status):
+    """Добавление ремонта с пересчетом статуса оборудования; код нового ремонта"""
+    results = run(conn, [
+        (INSERT_SQL, (equipment_id, repair_date, price, status)),
+        (EQUIPMENT_STATUS_SQL, ([equipment_id],)),
+    ])
+    return results[0][0]
+
+
+def update(conn, repair_id, equipment_id, repair_date, price, status, old_equipment_id=None):
+    """Изменение ремонта; статус пересчитывается и у прежнего оборудования.
+
+    При завершении ремонта зарезервированные запчасти списываются, при
+    отмене резерв снимается. Возвращает стоимость ремонта с запчастями.
+    """
+    equipment = sorted({equipment_id, old_equipment_id or equipment_id})
+    results = run(conn, [
+        (UPDATE_SQL, (equipment_id, repair_date, price, status, repair_id)),
+        *parts.finish_statements(repair_id, status),
+        (parts.ROLLUP_SQL, {'repairid': repair_id}),
+        (EQUIPMENT_STATUS_SQL, (equipment,)),
+    ])
+    rolled_up = results[-2]
+    return rolled_up[0] if rolled_up else price
+
+
+def delete(conn, repair_id, equipment_id):
+    """Мягкое удаление ремонта с пересчетом статуса оборудования и снятием резерва запчастей"""
+    run(conn, [
+        (archive.SOFT_DELETE_REPAIR_SQL, (repair_id,)),
+        *parts.finish_statements(repair_id, 'Отменён'),
+        (EQUIPMENT_STATUS_SQL, ([equipment_id],)),
+    ])
+
+
+def _legacy_cycle(conn, equipment_id):
+    """Прежний порядок запросов окна ремонтов: каждый ждет предыдущий"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT repairstatusid FROM repairstatus WHERE statusname = %s", ("В процессе",))
+        status_id = cursor.fetchone()[0]
+        cursor.execute(
+            "INSERT INTO repair (equipmentid, repairdate, repairprice, repairstatusid) "
+            "VALUES (%s, %s, %s, %s) RETURNING repairid",
+            (equipment_id, date.today(), Decimal("100.00"), status_id))
+        repair_id = cursor.fetchone()[0]
+        cursor.execute("UPDATE equipment SET status = %s WHERE equipmentid = %s", ("На ремонте", equipment_id))
+
+        cursor.execute("SELECT repairstatusid FROM repairstatus WHERE statusname = %s", ("Завершён",))
+        status_id = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT rs.statusname FROM repair r
+            JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+            WHERE r.repairid = %s
+        """, (repair_id,))
+        cursor.fetchone()
+        cursor.execute(
+            "UPDATE repair SET equipmentid = %s, repairdate = %s, repairprice = %s, repairstatusid = %s "
+            "WHERE repairid = %s",
+            (equipment_id, date.today(), Decimal("150.00"), status_id, repair_id))
+        cursor.execute("""
+            SELECT COUNT(*) FROM repair r
+            JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+            WHERE r.equipmentid = %s AND rs.statusname = 'В процессе' AND r.deleted_at IS NULL
+        """, (equipment_id,))
+        status = "На ремонте" if cursor.fetchone()[0] > 0 else "Исправен"
+        cursor.execute("UPDATE equipment SET status = %s WHERE equipmentid = %s", (status, equipment_id))
+
+        cursor.execute("""
+            SELECT rs.statusname FROM repair r
+            JOIN repairstatus rs ON r.repairstatusid = rs.repairstatusid
+            WHERE r.repairid = %s
+        """, (repair_id,))
+        cursor.fetchone()
+        archive.soft_delete_repair(cursor, repair_id)
+
+
+def _cycle(conn, equipment_id):
+    repair_id = add(conn, equipment_id, date.today(), Decimal("100.00"), "В процессе")
+    update(conn, repair_id, equipment_id, date.today(), Decimal("150.00"), "Завершён")
+    delete(conn, repair_id, equipment_id)
+
+
+def benchmark(conn, cycle, equipment_id, cycles, warmup):
+    """Среднее время цикла «добавление - изменение - удаление», мс.
+
+    Все изменения выполняются в одной транзакции и откатываются.
+    """
+    try:
+        for _ in range(warmup):
+            cycle(conn, equipment_id)
+        started = time.perf_counter()
+        for _ in range(cycles):
+            cycle(conn, equipment_id)
+        return (time.perf_counter() - started) / cycles * 1000
+    finally:
+        conn.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сохранение ремонтов: сравнение драйверов БД")
+    parser.add_argument('--cycles', type=int, default=200, help="Число циклов сохранения")
+    parser.add_argument('--warmup', type=int, default=10, help="Циклы прогрева (подготовка запросов)")
+    parser.add_argument('--host', help="Сервер БД (задержка сети сильнее всего влияет на результат)")
+    args = parser.parse_args()
+
+    overrides = {'host': args.host} if args.host else {}
+    conn = database.connect(**overrides)
+    try:
+        with conn.cursor() as cursor:
+            database.check_schema(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+    variants = [
+        ("psycopg2, прежние запросы окна", 'psycopg2', _legacy_cycle),
+        ("psycopg2", 'psycopg2', _cycle),
+        ("psycopg 3, конвейер и подготовка", 'psycopg', _cycle),
+    ]
+    results = []
+    for title, driver, cycle in variants:
+        try:
+            conn = database.connect(driver=driver, **overrides)
+        except ImportError:
+            print(f"{title}: драйвер не установлен")
+            continue
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT min(equipmentid) FROM equipment WHERE deleted_at IS NULL")
+                equipment_id = cursor.fetchone()[0]
+            if equipment_id is None:
+                print("Нет оборудования для проверки")
+                return
+            results.append((title, benchmark(conn, cycle, equipment_id, args.cycles, args.warmup)))
+        finally:
+            conn.close()
+
+    baseline = results[0][1] if results else None
+    for title, elapsed in results:
+        print(f"{title:<36}{elapsed:>10.2f} мс/цикл{baseline / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
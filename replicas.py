@@ -0,0 +1,159 @@
+import argparse
+import random
+import time
+
+import database
+
+
+# Пауза перед повторным подключением к недоступной реплике, с
+RETRY_INTERVAL = 30.0
+
+# Позиция WAL основного сервера после фиксации транзакции
+PRIMARY_LSN_SQL = "SELECT pg_current_wal_lsn()::text"
+# Воспроизвела ли реплика WAL до заданной позиции
+REPLAYED_SQL = "SELECT coalesce(pg_last_wal_replay_lsn() >= %s::pg_lsn, FALSE)"
+
+
+def replica_params(address):
+    """Параметры подключения к реплике по адресу host[:port]"""
+    host, _, port = address.partition(':')
+    return {'host': host, 'port': int(port)} if port else {'host': host}
+
+
+def connect_replica(driver=None):
+    """Подключение к одной из реплик (в случайном порядке, чтобы окна
+    распределялись по репликам); None, если ни одна не доступна"""
+    addresses = list(database.REPLICAS)
+    random.shuffle(addresses)
+    for address in addresses:
+        try:
+            conn = database.connect(driver, **replica_params(address))
+        except Exception as e:
+            print(f"Реплика {address} недоступна: {e}")
+            continue
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_is_in_recovery()")
+            in_recovery = cursor.fetchone()[0]
+        if in_recovery:
+            return conn
+        # Ожидание позиции WAL имеет смысл только на физической реплике
+        print(f"Сервер {address} не является репликой")
+        conn.close()
+    return None
+
+
+class ReadRouter:
+    """Маршрутизация чтения окна на реплику.
+
+    Списки, справочники и опрос автообновления читаются с реплики, запись
+    и чтение внутри транзакций записи идут через основное соединение окна.
+    После собственной записи (wrote()) запоминается позиция WAL основного
+    сервера, и перед следующим чтением реплика должна ее воспроизвести,
+    поэтому пользователь всегда видит свои изменения. Реплика проверяется
+    одним запросом без ожидания: если она еще не догнала или недоступна,
+    чтение сразу идет на основной сервер (окно не замирает в цикле опроса).
+    """
+
+    def __init__(self, primary_cursor):
+        self.primary_cursor = primary_cursor
+        self.replica = None
+        self.replica_cursor = None
+        self.target_lsn = None
+        self.retry_at = 0.0
+        self._connect()
+
+    def _connect(self):
+        if not database.REPLICAS:
+            return
+        driver = 'psycopg' if database.is_pipelined(self.primary_cursor.connection) else 'psycopg2'
+        self.replica = connect_replica(driver)
+        if self.replica is None:
+            self.retry_at = time.monotonic() + RETRY_INTERVAL
+        else:
+            self.replica_cursor = self.replica.cursor()
+
+    def wrote(self):
+        """Запоминание позиции WAL после фиксации собственной записи"""
+        if not database.REPLICAS:
+            return
+        conn = self.primary_cursor.connection
+        self.primary_cursor.execute(PRIMARY_LSN_SQL)
+        self.target_lsn = self.primary_cursor.fetchone()[0]
+        if not conn.autocommit:
+            conn.commit()
+
+    def cursor(self):
+        """Курсор для чтения: реплика, если она доступна и догнала запись пользователя"""
+        if self.replica is not None and self.replica.closed:
+            self.close()
+        if self.replica is None:
+            if not database.REPLICAS or time.monotonic() < self.retry_at:
+                return self.primary_cursor
+            self._connect()
+            if self.replica is None:
+                return self.primary_cursor
+
+        if self.target_lsn is not None:
+            try:
+                cursor = self.replica_cursor
+                cursor.execute(REPLAYED_SQL, (self.target_lsn,))
+                replayed = cursor.fetchone()[0]
+            except Exception as e:
+                print(f"Реплика недоступна: {e}")
+                self.close()
+                self.retry_at = time.monotonic() + RETRY_INTERVAL
+                return self.primary_cursor
+            if not replayed:
+                return self.primary_cursor
+            self.target_lsn = None
+        return self.replica_cursor
+
+    def close(self):
+        if self.replica is not None:
+            if not self.replica.closed:
+                self.replica.close()
+            self.replica = None
+            self.replica_cursor = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Состояние реплик для чтения")
+    parser.parse_args()
+
+    if not database.REPLICAS:
+        print("Реплики не заданы (KURS_DB_REPLICAS)")
+        return
+
+    primary = database.connect()
+    try:
+        with primary.cursor() as cursor:
+            cursor.execute(PRIMARY_LSN_SQL)
+            primary_lsn = cursor.fetchone()[0]
+        print(f"Основной сервер: {primary_lsn}")
+        for address in database.REPLICAS:
+            try:
+                conn = database.connect(**replica_params(address))
+            except Exception as e:
+                print(f"{address}: недоступна ({e})")
+                continue
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text,
+                               pg_wal_lsn_diff(%s::pg_lsn, pg_last_wal_replay_lsn()),
+                               now() - pg_last_xact_replay_timestamp()
+                    """, (primary_lsn,))
+                    in_recovery, replayed, lag_bytes, lag_time = cursor.fetchone()
+            finally:
+                conn.close()
+            if not in_recovery:
+                print(f"{address}: не является репликой")
+            else:
+                print(f"{address}: {replayed}, отставание {lag_bytes or 0:.0f} байт, {lag_time}")
+    finally:
+        primary.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+
+import archive
+import database
+
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS supplier_scorecard (
+        supplierid integer PRIMARY KEY REFERENCES supplier (supplierid) ON DELETE CASCADE,
+        assets_delivered integer NOT NULL,
+        repair_count integer NOT NULL,
+        repair_cost numeric(14, 2) NOT NULL,
+        writeoff_count integer NOT NULL,
+        writeoff_rate double precision,
+        refreshed_at timestamptz NOT NULL DEFAULT now()
+    );
+"""
+
+# Индексы для соединений расчета; строятся migrate.py без блокировки записи
+INDEXES = [
+    ('acceptancecertificate_supplier_equipment_idx', 'acceptancecertificate',
+     "(supplierid, equipmentid, dateofrecovery)"),
+    ('repair_equipmentid_idx', 'repair', "(equipmentid)"),
+    ('writeoffact_equipmentid_idx', 'writeoffact', "(equipmentid)"),
+]
+
+# Весь расчет одним запросом: поставки, ремонты после приемки и списания
+# агрегируются по индексированным ключам, результат заменяет сводку целиком.
+REFRESH_SQL = """
+    WITH delivered AS (
+        SELECT supplierid, equipmentid, min(dateofrecovery) AS accepted
+        FROM acceptancecertificate
+        WHERE supplierid IS NOT NULL AND equipmentid IS NOT NULL
+        GROUP BY supplierid, equipmentid
+    ),
+    repairs AS (
+        SELECT d.supplierid, count(*) AS repair_count,
+               coalesce(sum(r.repairprice), 0) AS repair_cost
+        FROM delivered d
+        JOIN repair r ON r.equipmentid = d.equipmentid
+                     AND (d.accepted IS NULL OR r.repairdate >= d.accepted)
+        JOIN repairstatus rs ON rs.repairstatusid = r.repairstatusid
+        WHERE rs.statusname <> 'Отменён' AND r.deleted_at IS NULL
+        GROUP BY d.supplierid
+    ),
+    writeoffs AS (
+        SELECT d.supplierid, count(DISTINCT d.equipmentid) AS writeoff_count
+        FROM delivered d
+        JOIN writeoffact w ON w.equipmentid = d.equipmentid
+        GROUP BY d.supplierid
+    ),
+    assets AS (
+        SELECT supplierid, count(*) AS assets_delivered
+        FROM delivered
+        GROUP BY supplierid
+    ),
+    fresh AS (
+        INSERT INTO supplier_scorecard
+            (supplierid, assets_delivered, repair_count, repair_cost,
+             writeoff_count, writeoff_rate, refreshed_at)
+        SELECT s.supplierid,
+               coalesce(a.assets_delivered, 0),
+               coalesce(r.repair_count, 0),
+               coalesce(r.repair_cost, 0),
+               coalesce(w.writeoff_count, 0),
+               w.writeoff_count::double precision / nullif(a.assets_delivered, 0),
+               now()
+        FROM supplier s
+        LEFT JOIN assets a ON a.supplierid = s.supplierid
+        LEFT JOIN repairs r ON r.supplierid = s.supplierid
+        LEFT JOIN writeoffs w ON w.supplierid = s.supplierid
+        ON CONFLICT (supplierid) DO UPDATE SET
+            assets_delivered = EXCLUDED.assets_delivered,
+            repair_count = EXCLUDED.repair_count,
+            repair_cost = EXCLUDED.repair_cost,
+            writeoff_count = EXCLUDED.writeoff_count,
+            writeoff_rate = EXCLUDED.writeoff_rate,
+            refreshed_at = EXCLUDED.refreshed_at
+        RETURNING 1
+    )
+    SELECT count(*) FROM fresh
+"""
+
+
+def ensure_schema(cursor):
+    """Создание сводной таблицы, если ее еще нет"""
+    archive.ensure_schema(cursor)
+    cursor.execute(SCHEMA_SQL)
+
+
+def refresh(cursor):
+    """Пересчет сводки показателей поставщиков, возвращает число записей.
+
+    Чтение идет из снимка MVCC и не блокирует рабочие таблицы; сводка
+    обновляется одной командой, читатели видят либо старую, либо новую версию.
+    """
+    cursor.execute(REFRESH_SQL)
+    return cursor.fetchone()[0]
+
+
+def main():
+    argparse.ArgumentParser(description="Пересчет показателей поставщиков").parse_args()
+
+    conn = database.connect()
+    try:
+        with conn, conn.cursor() as cursor:
+            database.check_schema(cursor)
+            print(f"Обновлено поставщиков: {refresh(cursor)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
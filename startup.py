@@ -0,0 +1,59 @@
+import os
+import time
+from datetime import datetime
+
+from PyQt6.QtCore import QEvent, QObject, QTimer
+
+
+# Начало отсчета: модуль импортируется первым в каждом окне
+STARTED = time.perf_counter()
+
+# Файл для накопления замеров запуска (по строке на запуск), если задан
+LOG_PATH = os.environ.get("KURS_STARTUP_LOG")
+
+_phases = []
+_last = STARTED
+
+
+def mark(phase):
+    """Отметка окончания фазы запуска"""
+    global _last
+    now = time.perf_counter()
+    _phases.append((phase, now - _last))
+    _last = now
+
+
+def report(name):
+    """Вывод разбивки времени запуска по фазам (один раз за процесс)"""
+    if not _phases:
+        return
+    total = _last - STARTED
+    parts = ", ".join(f"{phase} {seconds * 1000:.0f} мс" for phase, seconds in _phases)
+    print(f"Запуск {name}: {total * 1000:.0f} мс ({parts})")
+
+    if LOG_PATH:
+        fields = ";".join(f"{phase}={seconds * 1000:.1f}" for phase, seconds in _phases)
+        with open(LOG_PATH, "a", encoding="utf-8") as log:
+            log.write(f"{datetime.now():%Y-%m-%d %H:%M:%S};{name};total={total * 1000:.1f};{fields}\n")
+    _phases.clear()
+
+
+class _FirstPaintFilter(QObject):
+    """Вызов функции на следующей итерации цикла событий после первой отрисовки"""
+
+    def __init__(self, widget, callback):
+        super().__init__(widget)
+        self.callback = callback
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            mark("первая отрисовка")
+            QTimer.singleShot(0, self.callback)
+        return False
+
+
+def after_first_paint(widget, callback):
+    """Отложенный запуск callback, когда окно уже показано пользователю"""
+    _FirstPaintFilter(widget, callback)
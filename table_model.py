@@ -0,0 +1,458 @@
+import locale
+from array import array
+
+from PyQt6.QtCore import (
+    QAbstractProxyModel, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt, QTimer
+)
+
+
+# Начиная с такого числа отложенных строк вставка идет одним блоком
+# с пересортировкой вместо поштучного поиска позиции
+BULK_THRESHOLD = 32
+
+# Ключи для NULL: больше любых значений, поэтому NULL идут последними
+# при сортировке по возрастанию и первыми по убыванию, как в PostgreSQL
+NULL_INT_KEY = 2 ** 62
+NULL_TEXT_KEY = "\U0010ffff"
+
+try:
+    locale.setlocale(locale.LC_COLLATE, "")
+except locale.Error:
+    pass
+
+if locale.getlocale(locale.LC_COLLATE)[0] in (None, "C", "POSIX"):
+    def collation_key(text):
+        return text.casefold()
+else:
+    def collation_key(text):
+        return locale.strxfrm(text)
+
+
+def sort_key(value):
+    """Ключ сортировки, допускающий NULL (NULL после значений, как в PostgreSQL)"""
+    return (value is None, value)
+
+
+def date_key(value):
+    return value.toordinal() if value is not None else NULL_INT_KEY
+
+
+def money_key(value):
+    """Сумма в копейках целым числом"""
+    return round(value * 100) if value is not None else NULL_INT_KEY
+
+
+def int_key(value):
+    return int(value) if value is not None else NULL_INT_KEY
+
+
+def float_key(value):
+    return float(value) if value is not None else float("inf")
+
+
+def text_key(value):
+    return collation_key(value) if value is not None else NULL_TEXT_KEY
+
+
+# Типы ключей сортировки: функция вычисления и код типа массива для хранения
+KEY_TYPES = {
+    'date': (date_key, 'q'),
+    'money': (money_key, 'q'),
+    'int': (int_key, 'q'),
+    'float': (float_key, 'd'),
+    'text': (text_key, None),
+}
+
+
+def format_date(value):
+    """Дата для отображения в формате дд.мм.гггг"""
+    return value.strftime("%d.%m.%Y") if value is not None else ""
+
+
+def format_money(value):
+    """Сумма в рублях с копейками"""
+    return f"{value:.2f} ₽" if value is not None else ""
+
+
+def search_position(order, keys, key, descending=False):
+    """Двоичный поиск позиции вставки после всех равных ключей.
+
+    order - номера записей в порядке отображения, keys - ключи записей.
+    """
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        current = keys[order[mid]]
+        if (current < key) if descending else (key < current):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def selected_row(view):
+    """Номер выбранной строки модели или None"""
+    indexes = view.selectionModel().selectedIndexes()
+    if not indexes:
+        return None
+    index = indexes[0]
+    if isinstance(view.model(), QAbstractProxyModel):
+        index = view.model().mapToSource(index)
+    return index.row()
+
+
+def selected_rows(view):
+    """Номера всех выбранных строк модели в порядке отображения"""
+    rows = sorted({index.row() for index in view.selectionModel().selectedIndexes()})
+    model = view.model()
+    if isinstance(model, QAbstractProxyModel):
+        rows = [model.mapToSource(model.index(row, 0)).row() for row in rows]
+    return rows
+
+
+class RecordTableModel(QAbstractTableModel):
+    """Табличная модель над списком строк из БД.
+
+    Строки хранятся с исходными типами из БД (int, date, Decimal), обычно
+    как именованные кортежи без словаря атрибутов; в текст значения
+    переводятся только при отображении через formatters.
+
+    Записи хранятся в порядке поступления и не переставляются, порядок
+    отображения задается списком их номеров (order). Ключи сортировки
+    столбцов (key_types) вычисляются один раз на загрузку и хранятся
+    в массивах, выровненных по записям, поэтому пересортировка - это один
+    вызов sorted() по готовым ключам без разбора значений. Фильтр по
+    подстроке так же идет одним проходом по кэшу текстов строк.
+
+    Новые строки копятся и вставляются на следующей итерации цикла событий
+    на свое место двоичным поиском, так что представление перерисовывается
+    один раз на пачку изменений. Изменения, найденные автообновлением,
+    применяются по ключевому столбцу (key_column) без сброса модели.
+    """
+
+    def __init__(self, headers, sort_column=None, descending=False, formatters=None,
+                 key_types=None, key_column=0, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.key_column = key_column
+        self.formatters = formatters or {}
+        self.key_types = key_types or {}
+        self.roles = {}
+        self.sort_column = sort_column
+        self.descending = descending
+        self.records = []
+        self.order = []
+        self._key_cache = {}
+        self._filter_texts = []
+        self._needle = ""
+        self._removed = set()
+        self._pending = []
+        self._numbers = None
+
+    def _key_function(self, column):
+        if column in self.key_types:
+            return KEY_TYPES[self.key_types[column]]
+        return sort_key, None
+
+    def column_keys(self, column):
+        """Массив ключей сортировки столбца (вычисляется один раз на загрузку)"""
+        keys = self._key_cache.get(column)
+        if keys is None:
+            function, typecode = self._key_function(column)
+            values = [function(record[column]) for record in self.records]
+            keys = array(typecode, values) if typecode else values
+            self._key_cache[column] = keys
+        return keys
+
+    # --- интерфейс QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return None
+
+    def flags(self, index):
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.records[self.order[index.row()]]
+        column = index.column()
+        value = record[column]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.format_value(column, value)
+        if role in self.roles:
+            return self.roles[role](record, column)
+        return None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if column < 0:
+            return
+        self.sort_column = column
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self._resort()
+
+    # --- доступ к данным ---
+
+    def format_value(self, column, value):
+        """Текст значения для отображения"""
+        formatter = self.formatters.get(column)
+        if formatter is not None:
+            return formatter(value)
+        return str(value) if value is not None else ""
+
+    def filter_text(self, number):
+        """Текст всех столбцов записи в нижнем регистре для фильтра (кэшируется)"""
+        text = self._filter_texts[number]
+        if text is None:
+            record = self.records[number]
+            text = " ".join(self.format_value(c, v) for c, v in enumerate(record[:len(self.headers)]))
+            text = text.casefold()
+            self._filter_texts[number] = text
+        return text
+
+    def _build_filter_texts(self):
+        """Заполнение кэша текстов фильтра для всех записей одним проходом"""
+        formatters = [self.formatters.get(column) for column in range(len(self.headers))]
+        formatters = [f or (lambda v: str(v) if v is not None else "") for f in formatters]
+        texts = self._filter_texts
+        for number, record in enumerate(self.records):
+            if texts[number] is None:
+                texts[number] = " ".join([f(v) for f, v in zip(formatters, record)]).casefold()
+
+    def _matches(self, number):
+        return not self._needle or self._needle in self.filter_text(number)
+
+    def set_filter_text(self, text):
+        """Фильтр строк по подстроке в любом столбце без учета регистра"""
+        needle = text.strip().casefold()
+        if needle == self._needle:
+            return
+        self._needle = needle
+
+        self.beginResetModel()
+        if needle:
+            self._build_filter_texts()
+        order = [number for number in range(len(self.records))
+                 if number not in self._removed and self._matches(number)]
+        if self.sort_column is not None:
+            order.sort(key=self.column_keys(self.sort_column).__getitem__, reverse=self.descending)
+        self.order = order
+        self.endResetModel()
+
+    def row(self, index):
+        """Строка с исходными значениями из БД"""
+        return self.records[self.order[index]]
+
+    def key_numbers(self):
+        """Номера записей по значению ключевого столбца (строится один раз на загрузку)"""
+        if self._numbers is None:
+            key = self.key_column
+            self._numbers = {record[key]: number for number, record in enumerate(self.records)
+                             if number not in self._removed}
+        return self._numbers
+
+    def find(self, value):
+        """Номер видимой строки по значению ключевого столбца или None"""
+        self.flush()
+        number = self.key_numbers().get(value)
+        if number is None:
+            return None
+        try:
+            return self.order.index(number)
+        except ValueError:
+            return None
+
+    def set_rows(self, rows):
+        """Полная замена содержимого (строки уже упорядочены запросом)"""
+        self.beginResetModel()
+        self._pending.clear()
+        self.records = list(rows)
+        self.order = list(range(len(self.records)))
+        self._key_cache = {}
+        self._filter_texts = [None] * len(self.records)
+        self._removed = set()
+        self._numbers = None
+        if self._needle:
+            self.order = [number for number in self.order if self._matches(number)]
+        self.endResetModel()
+
+    # --- изменения ---
+
+    def insert_row(self, row):
+        """Добавление строки; вставка откладывается до конца текущего события"""
+        self.insert_rows([row])
+
+    def insert_rows(self, rows):
+        if not self._pending:
+            QTimer.singleShot(0, self.flush)
+        self._pending.extend(rows)
+
+    def _store(self, record, number=None):
+        """Запись строки в хранилище с обновлением вычисленных ключей"""
+        if number is None:
+            number = len(self.records)
+            self.records.append(record)
+            self._filter_texts.append(None)
+            if self._numbers is not None:
+                self._numbers[record[self.key_column]] = number
+            for column, keys in self._key_cache.items():
+                keys.append(self._key_function(column)[0](record[column]))
+        else:
+            self.records[number] = record
+            self._filter_texts[number] = None
+            for column, keys in self._key_cache.items():
+                keys[number] = self._key_function(column)[0](record[column])
+        return number
+
+    def flush(self):
+        """Применение отложенных вставок"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        numbers = [self._store(record) for record in pending]
+        numbers = [number for number in numbers if self._matches(number)]
+        if not numbers:
+            return
+
+        if self.sort_column is None or len(numbers) >= BULK_THRESHOLD:
+            start = len(self.order)
+            self.beginInsertRows(QModelIndex(), start, start + len(numbers) - 1)
+            self.order.extend(numbers)
+            self.endInsertRows()
+            if self.sort_column is not None:
+                self._resort()
+            return
+
+        for number in numbers:
+            self._show(number)
+
+    def _show(self, number):
+        """Вставка записи из хранилища в порядок отображения на свое место"""
+        if self.sort_column is None:
+            position = len(self.order)
+        else:
+            keys = self.column_keys(self.sort_column)
+            position = search_position(self.order, keys, keys[number], self.descending)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.order.insert(position, number)
+        self.endInsertRows()
+
+    def update_row(self, index, row):
+        """Замена строки; при смене ключа сортировки строка переезжает на свое место"""
+        number = self._store(row, self.order[index])
+        if not self._matches(number):
+            self.beginRemoveRows(QModelIndex(), index, index)
+            del self.order[index]
+            self.endRemoveRows()
+            return
+        self.dataChanged.emit(self.index(index, 0), self.index(index, len(self.headers) - 1))
+
+        if self.sort_column is None:
+            return
+        keys = self.column_keys(self.sort_column)
+        others = self.order[:index] + self.order[index + 1:]
+        position = search_position(others, keys, keys[number], self.descending)
+        if position == index:
+            return
+
+        # Для beginMoveRows позиция указывается в координатах до перемещения
+        destination = position + 1 if position > index else position
+        self.beginMoveRows(QModelIndex(), index, index, QModelIndex(), destination)
+        self.order.insert(position, self.order.pop(index))
+        self.endMoveRows()
+
+    def remove_row(self, index):
+        """Удаление строки (запись остается в хранилище до перезагрузки)"""
+        self.beginRemoveRows(QModelIndex(), index, index)
+        self._forget(self.order[index])
+        del self.order[index]
+        self.endRemoveRows()
+
+    def _forget(self, number):
+        self._removed.add(number)
+        if self._numbers is not None:
+            self._numbers.pop(self.records[number][self.key_column], None)
+
+    def merge_rows(self, rows, removed=()):
+        """Применение изменений по ключевому столбцу без сброса модели.
+
+        rows - новые и измененные строки, removed - ключи удаленных.
+        Совпадающие строки пропускаются, измененные заменяются на месте,
+        новые вставляются на свое место, поэтому выделение и прокрутка
+        представления сохраняются.
+        """
+        self.flush()
+        key = self.key_column
+        numbers = self.key_numbers()
+
+        new = []
+        for row in rows:
+            number = numbers.get(row[key])
+            if number is None:
+                new.append(row)
+            elif self.records[number] != row:
+                self._replace(number, row)
+
+        for value in removed:
+            number = numbers.get(value)
+            if number is None:
+                continue
+            try:
+                self.remove_row(self.order.index(number))
+            except ValueError:
+                self._forget(number)
+
+        if new:
+            self.insert_rows(new)
+
+    def _replace(self, number, row):
+        try:
+            index = self.order.index(number)
+        except ValueError:
+            # Строка скрыта фильтром и после изменения может стать видимой
+            self._store(row, number)
+            if self._matches(number):
+                self._show(number)
+            return
+        self.update_row(index, row)
+
+    def _resort(self):
+        """Пересортировка с сохранением выделения и текущей строки"""
+        keys = self.column_keys(self.sort_column)
+        self.layoutAboutToBeChanged.emit()
+        old_order = self.order
+        self.order = sorted(old_order, key=keys.__getitem__, reverse=self.descending)
+
+        old_indexes = self.persistentIndexList()
+        if old_indexes:
+            position = {number: row for row, number in enumerate(self.order)}
+            new_indexes = [self.index(position[old_order[i.row()]], i.column()) for i in old_indexes]
+            self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+
+class SortFilterProxyModel(QSortFilterProxyModel):
+    """Сортировка и фильтрация на клиенте без обращения к БД.
+
+    Сортировка и фильтр передаются исходной RecordTableModel: она упорядочивает
+    и отбирает строки по заранее вычисленным массивам ключей и кэшу текстов
+    за один проход, вместо вызова lessThan/filterAcceptsRow из Qt для каждой
+    пары или строки. Сам прокси лишь отражает порядок исходной модели.
+    """
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sourceModel().sort(column, order)
+
+    def set_filter_text(self, text):
+        """Фильтр строк по подстроке в любом столбце без учета регистра"""
+        self.sourceModel().set_filter_text(text)
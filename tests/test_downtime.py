@@ -0,0 +1,54 @@
+import math
+
+import pandas as pd
+
+from downtime import HISTORY_COLUMNS, compute_metrics
+
+HOUR = 3600.0
+
+
+def metrics(rows, period_hours=100):
+    history = pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+    result = compute_metrics(history, 0.0, period_hours * HOUR)
+    return result.set_index('equipmentid')
+
+
+def test_overlapping_repairs_are_one_failure():
+    result = metrics([
+        (1, 10 * HOUR, 20 * HOUR, False, math.nan),
+        (1, 15 * HOUR, 30 * HOUR, False, math.nan),
+        (1, 50 * HOUR, 55 * HOUR, False, math.nan),
+    ]).loc[1]
+    assert result.failures == 2
+    assert result.downtime_hours == 25
+    assert result.availability == 0.75
+    assert result.mtbf_hours == 37.5
+    assert result.mttr_hours == 12.5
+
+
+def test_adjacent_repairs_are_merged():
+    result = metrics([
+        (2, 0.0, 10 * HOUR, False, math.nan),
+        (2, 10 * HOUR, 20 * HOUR, False, math.nan),
+    ]).loc[2]
+    assert result.failures == 1
+    assert result.downtime_hours == 20
+
+
+def test_repair_before_period_is_ignored():
+    result = metrics([(3, -50 * HOUR, -10 * HOUR, False, math.nan)]).loc[3]
+    assert result.failures == 0
+    assert result.availability == 1
+    assert math.isnan(result.mtbf_hours)
+
+
+def test_open_repair_runs_until_write_off():
+    result = metrics([(4, 40 * HOUR, math.nan, True, 50 * HOUR)]).loc[4]
+    assert result.period_hours == 50
+    assert result.downtime_hours == 10
+    assert bool(result.open_repair)
+
+
+def test_finished_repair_without_stamp_uses_default_length():
+    result = metrics([(5, 10 * HOUR, math.nan, False, math.nan)]).loc[5]
+    assert result.downtime_hours == 24
@@ -0,0 +1,94 @@
+from datetime import date
+
+import pytest
+
+import federation
+
+QUERY = federation.QUERIES['repairs']
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        pass
+
+    def fetchmany(self, size):
+        batch = self.rows[self.position:self.position + size]
+        self.position += len(batch)
+        return batch
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, name=None):
+        return FakeCursor(self.rows)
+
+    def close(self):
+        pass
+
+
+def repairs(ids, day):
+    """Строки запроса ремонтов в порядке ORDER BY (дата, код по убыванию)"""
+    return [(repairid, f"Станок {repairid}", day, None, "Завершён") for repairid in sorted(ids, reverse=True)]
+
+
+@pytest.fixture
+def plants(monkeypatch):
+    data = {}
+
+    def connect(dsn):
+        if isinstance(data[dsn], Exception):
+            raise data[dsn]
+        return FakeConnection(data[dsn])
+
+    monkeypatch.setattr(federation.database, 'connect_dsn', connect)
+    return data
+
+
+def test_rows_merged_in_query_order(plants):
+    plants['a'] = repairs([5, 3], date(2026, 3, 2)) + repairs([9], date(2026, 3, 1))
+    plants['b'] = repairs([4], date(2026, 3, 2)) + repairs([8, 1], date(2026, 3, 1))
+    stats = {}
+
+    rows = list(federation.merged({'Завод A': 'a', 'Завод B': 'b'}, QUERY, stats))
+
+    assert [(row.plant, row.repairid) for row in rows] == [
+        ('Завод A', 5), ('Завод B', 4), ('Завод A', 3),
+        ('Завод A', 9), ('Завод B', 8), ('Завод B', 1),
+    ]
+    assert {plant: item.rows for plant, item in stats.items()} == {'Завод A': 3, 'Завод B': 3}
+
+
+def test_unavailable_plant_is_reported(plants):
+    plants['a'] = repairs([2, 1], date(2026, 3, 1))
+    plants['b'] = RuntimeError("нет связи")
+    stats = {}
+
+    rows = list(federation.merged({'Завод A': 'a', 'Завод B': 'b'}, QUERY, stats))
+
+    assert [row.repairid for row in rows] == [2, 1]
+    assert stats['Завод B'].error == "нет связи"
+    assert stats['Завод A'].error is None
+
+
+def test_closing_stops_reading(plants):
+    total = federation.BATCH_SIZE * (federation.QUEUE_BATCHES + 10)
+    plants['a'] = repairs(range(total), date(2026, 3, 1))
+    stats = {}
+
+    rows = federation.merged({'Завод A': 'a'}, QUERY, stats)
+    assert next(rows).repairid == total - 1
+    rows.close()
+
+    assert stats['Завод A'].rows < total
@@ -0,0 +1,79 @@
+from datetime import date
+
+import overdue
+import refresh
+from overdue import OpenRepair, OverdueTracker
+
+
+class FakeCursor:
+    """Курсор с заранее заданными результатами запросов по порядку"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+
+def repair(repairid, day, equipment_class=None):
+    return OpenRepair(repairid, repairid, f"Станок {repairid}", equipment_class, day)
+
+
+def tracker(*repairs):
+    result = OverdueTracker()
+    result.repairs = {row.repairid: row for row in repairs}
+    result.version = 'v1'
+    result.load_rules(FakeCursor([('', 2, 5), ('Пресс', 1, 3)]))
+    return result
+
+
+def test_thresholds_fire_once_in_date_order():
+    item = tracker(repair(1, date(2026, 3, 1)), repair(2, date(2026, 3, 1), 'Пресс'))
+
+    assert [(a.repair.repairid, a.level) for a in item.due(date(2026, 3, 2))] == [(2, 'warning')]
+    assert [(a.repair.repairid, a.level) for a in item.due(date(2026, 3, 6))] == [
+        (1, 'warning'), (2, 'overdue'), (1, 'overdue')]
+    assert item.due(date(2026, 3, 10)) == []
+
+
+def test_released_alerts_fire_again():
+    item = tracker(repair(1, date(2026, 3, 1)))
+    alerts = item.due(date(2026, 3, 3))
+    assert len(alerts) == 1
+
+    item.release(alerts)
+
+    assert item.due(date(2026, 3, 3)) == alerts
+
+
+def test_changed_repair_replaces_old_thresholds(monkeypatch):
+    item = tracker(repair(1, date(2026, 3, 1)))
+    monkeypatch.setattr(refresh, 'current_version', lambda cursor: 'v2')
+    monkeypatch.setattr(refresh, 'fetch_changes', lambda cursor, tables, since, until: {
+        'repair': refresh.Changes(frozenset({1}), frozenset({1}))})
+
+    # Дату ремонта перенесли: старые пороги в куче больше не срабатывают
+    assert item.apply(FakeCursor([tuple(repair(1, date(2026, 3, 10)))]))
+
+    assert item.due(date(2026, 3, 5)) == []
+    assert [a.deadline for a in item.due(date(2026, 3, 12))] == [date(2026, 3, 12)]
+
+
+def test_closed_repair_is_forgotten(monkeypatch):
+    item = tracker(repair(1, date(2026, 3, 1)))
+    monkeypatch.setattr(refresh, 'current_version', lambda cursor: 'v2')
+    monkeypatch.setattr(refresh, 'fetch_changes', lambda cursor, tables, since, until: {
+        'repair': refresh.Changes(frozenset({1}), frozenset({1}))})
+
+    assert item.apply(FakeCursor([]))
+
+    assert item.due(date(2026, 3, 31)) == []
+    assert item.overdue_count(date(2026, 3, 31)) == 0
+
+
+def test_describe():
+    alert = overdue.Alert('overdue', repair(7, date(2026, 3, 1)), 6, date(2026, 3, 6))
+    assert "ремонт №7" in overdue.describe(alert)
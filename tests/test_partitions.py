@@ -0,0 +1,24 @@
+from datetime import date
+
+from partitions import partition_bounds, partition_name, period_start
+
+
+def test_period_start():
+    assert period_start(0, date(2026, 3, 15)) == date(2026, 3, 1)
+    assert period_start(2, date(2026, 1, 10)) == date(2025, 11, 1)
+    assert period_start(12, date(2026, 1, 31)) == date(2025, 1, 1)
+
+
+def test_month_bounds():
+    assert partition_bounds(date(2026, 3, 15), 'month') == (date(2026, 3, 1), date(2026, 4, 1))
+    # Декабрь переходит в следующий год
+    assert partition_bounds(date(2025, 12, 31), 'month') == (date(2025, 12, 1), date(2026, 1, 1))
+
+
+def test_year_bounds():
+    assert partition_bounds(date(2025, 6, 1), 'year') == (date(2025, 1, 1), date(2026, 1, 1))
+
+
+def test_partition_name():
+    assert partition_name('repair', date(2026, 3, 1), 'month') == 'repair_y2026m03'
+    assert partition_name('writeoffact', date(2026, 1, 1), 'year') == 'writeoffact_y2026'
@@ -0,0 +1,81 @@
+from collections import namedtuple
+from decimal import Decimal
+
+import pytest
+from PyQt6.QtCore import QCoreApplication, Qt
+
+from table_model import RecordTableModel, format_money, search_position
+
+Row = namedtuple('Row', 'repairid name price')
+
+
+@pytest.fixture(scope='module')
+def app():
+    # Отложенная вставка строк идет через QTimer
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def model(app):
+    result = RecordTableModel(["ID", "Оборудование", "Стоимость"],
+                              formatters={2: format_money}, key_types={2: 'money'})
+    result.set_rows([Row(1, "Пресс", Decimal(100)), Row(2, "Станок", Decimal(300)),
+                     Row(3, "Кран", Decimal(200))])
+    result.sort(2, Qt.SortOrder.AscendingOrder)
+    return result
+
+
+def ids(model):
+    return [model.row(index).repairid for index in range(model.rowCount())]
+
+
+def test_search_position_after_equal_keys():
+    keys = [10, 20, 20, 30]
+    order = [0, 1, 2, 3]
+    assert search_position(order, keys, 20) == 3
+    assert search_position(order, keys, 5) == 0
+    assert search_position(order, keys, 40) == 4
+
+
+def test_search_position_descending():
+    keys = [30, 20, 20, 10]
+    order = [0, 1, 2, 3]
+    assert search_position(order, keys, 20, descending=True) == 3
+    assert search_position(order, keys, 40, descending=True) == 0
+
+
+def test_update_row_moves_row_to_sorted_place(model):
+    assert ids(model) == [1, 3, 2]
+
+    model.update_row(0, Row(1, "Пресс", Decimal(500)))
+
+    assert ids(model) == [3, 2, 1]
+    # После перемещения строку нужно искать по ключу, а не по прежнему номеру
+    assert model.find(1) == 2
+    assert model.row(model.find(1)).price == Decimal(500)
+
+
+def test_update_row_hides_row_outside_filter(model):
+    model.set_filter_text("пресс")
+    assert ids(model) == [1]
+
+    model.update_row(0, Row(1, "Ножницы", Decimal(100)))
+
+    assert ids(model) == []
+    assert model.find(1) is None
+
+
+def test_merge_rows(model):
+    model.merge_rows([Row(2, "Станок", Decimal(50)), Row(4, "Пила", Decimal(250)),
+                      Row(3, "Кран", Decimal(200))], removed=[1])
+    model.flush()
+
+    assert ids(model) == [2, 3, 4]
+    assert model.find(1) is None
+
+
+def test_merge_rows_shows_row_hidden_by_filter(model):
+    model.set_filter_text("кран")
+    model.merge_rows([Row(2, "Кран мостовой", Decimal(300))])
+
+    assert ids(model) == [3, 2]
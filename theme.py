@@ -0,0 +1,165 @@
+from functools import lru_cache
+
+from PyQt6.QtGui import QBrush, QColor, QPalette
+from PyQt6.QtWidgets import QApplication, QStyledItemDelegate
+
+
+# Промышленная цветовая схема, общая для всех окон
+BLUE = QColor(0, 90, 141)  # Основной синий цвет
+LIGHT = QColor(240, 244, 248)  # Светлый фон
+WHITE = QColor(255, 255, 255)  # Белый
+RED = QColor(200, 16, 46)  # Для предупреждений
+ACCENT_RED = QColor(220, 53, 69)  # Для акцента на списании
+GREEN = QColor(0, 128, 0)  # Для статуса "работает"
+GRAY = QColor(128, 128, 128)  # Для статуса "Списано"
+ALTERNATE = QColor(245, 245, 245)  # Фон четных строк таблиц
+BORDER = "#d1d8e0"
+
+# Цвета статусов в таблицах по названию статуса из БД
+EQUIPMENT_STATUS_FOREGROUND = {
+    "Исправен": GREEN,
+    "На ремонте": RED,
+    "Списано": GRAY,
+}
+REPAIR_STATUS_BACKGROUND = {
+    "Завершён": QColor(144, 238, 144),
+    "В процессе": QColor(255, 255, 153),
+    "Отменён": QColor(255, 182, 193),
+    "Запланирован": QColor(173, 216, 230),
+}
+
+# Высота строки таблиц вместо отступов QTableView::item: правило для
+# элементов заставляет Qt разбирать стиль при отрисовке каждой ячейки
+ROW_HEIGHT = 36
+
+_applied = False
+
+
+@lru_cache(maxsize=None)
+def stylesheet():
+    """Таблица стилей приложения (строится один раз)"""
+    return f"""
+        QMainWindow, QDialog {{
+            background-color: {LIGHT.name()};
+        }}
+        QLabel#title {{
+            font-size: 18px;
+            font-weight: bold;
+            color: {BLUE.name()};
+            padding: 10px;
+        }}
+        QTableView {{
+            background-color: {WHITE.name()};
+            border: 1px solid {BORDER};
+            border-radius: 5px;
+            gridline-color: {BORDER};
+            font-size: 14px;
+        }}
+        QHeaderView::section {{
+            background-color: {BLUE.name()};
+            color: white;
+            padding: 8px;
+            border: none;
+            font-weight: bold;
+        }}
+        QPushButton {{
+            background-color: {BLUE.name()};
+            color: white;
+            border: none;
+            border-radius: 5px;
+            padding: 10px 15px;
+            font-size: 14px;
+            min-width: 100px;
+        }}
+        QPushButton:hover {{
+            background-color: {BLUE.darker(110).name()};
+        }}
+        QPushButton:pressed {{
+            background-color: {BLUE.darker(120).name()};
+        }}
+        QPushButton:disabled {{
+            background-color: #cccccc;
+        }}
+        QPushButton#secondary {{
+            background-color: #cccccc;
+            color: black;
+        }}
+        QPushButton#secondary:hover {{
+            background-color: #bbbbbb;
+        }}
+        QLineEdit, QComboBox, QDateEdit, QDoubleSpinBox, QTextEdit {{
+            border: 1px solid {BORDER};
+            border-radius: 5px;
+            padding: 8px;
+            font-size: 14px;
+        }}
+        QLineEdit:focus {{
+            border-color: #4b7bec;
+        }}
+    """
+
+
+def palette(base):
+    """Палитра приложения на основе стандартной палитры стиля"""
+    result = QPalette(base)
+    result.setColor(QPalette.ColorRole.Window, LIGHT)
+    result.setColor(QPalette.ColorRole.Base, WHITE)
+    result.setColor(QPalette.ColorRole.AlternateBase, ALTERNATE)
+    result.setColor(QPalette.ColorRole.Highlight, BLUE)
+    return result
+
+
+def apply(app=None):
+    """Применение темы ко всему приложению (один раз за процесс).
+
+    Стиль задается на уровне QApplication, поэтому Qt разбирает его один
+    раз, а не для каждого окна и виджета со своей таблицей стилей.
+    """
+    global _applied
+    if _applied:
+        return
+    app = app or QApplication.instance()
+    app.setStyle("Fusion")
+    app.setPalette(palette(app.style().standardPalette()))
+    app.setStyleSheet(stylesheet())
+    _applied = True
+
+
+def setup_table(table):
+    """Общие настройки внешнего вида таблиц"""
+    table.verticalHeader().setVisible(False)
+    table.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
+    table.setShowGrid(True)
+    table.setAlternatingRowColors(True)
+
+
+class StatusDelegate(QStyledItemDelegate):
+    """Отрисовка ячеек статуса цветом из таблицы кистей.
+
+    Кисти создаются один раз при задании схемы, при отрисовке ячейки
+    выполняется только поиск по тексту статуса. Схему можно сменить
+    без перезагрузки данных.
+    """
+
+    def __init__(self, foreground=None, background=None, parent=None):
+        super().__init__(parent)
+        self.foreground = {}
+        self.background = {}
+        self.set_scheme(foreground, background)
+
+    def set_scheme(self, foreground=None, background=None):
+        """Смена цветов статусов: словари статус -> QColor"""
+        self.foreground = {status: QBrush(color) for status, color in (foreground or {}).items()}
+        self.background = {status: QBrush(color) for status, color in (background or {}).items()}
+        view = self.parent()
+        if view is not None and hasattr(view, 'viewport'):
+            view.viewport().update()
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        brush = self.foreground.get(option.text)
+        if brush is not None:
+            option.palette.setBrush(QPalette.ColorRole.Text, brush)
+        brush = self.background.get(option.text)
+        if brush is not None:
+            option.backgroundBrush = brush